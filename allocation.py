@@ -0,0 +1,37 @@
+import zlib
+
+import numpy as np
+
+
+DEFAULT_SEED = 2023
+
+
+def province_arrays(provinces):
+
+    names = np.array(list(provinces.keys()))
+    population = np.array([data['Population'] for data in provinces.values()], dtype=np.float64)
+    share = population / population.sum()
+
+    return names, population, share
+
+def allocation_seed(labels, base_seed=DEFAULT_SEED):
+
+    # crc32 rather than hash() so every worker process derives the same stream
+    return np.random.SeedSequence([base_seed, *(zlib.crc32(str(label).encode()) for label in labels)])
+
+def allocate_to_provinces(totals, share, low, high, seed):
+    """
+    Spread occupation totals over provinces in proportion to population.
+
+    ``totals`` has one entry per occupation, ``share`` one per province;
+    ``low`` and ``high`` broadcast to occupations x provinces. Returns an occupations x provinces int64 matrix
+    of ``floor(total * share * variation)`` with ``variation ~ U(low, high)``.
+    """
+
+    totals = np.asarray(totals, dtype=np.float64)
+    share = np.asarray(share, dtype=np.float64)
+
+    rng = np.random.default_rng(seed)
+    variation = rng.uniform(low, high, size=(totals.size, share.size))
+
+    return np.floor(totals[:, None] * share[None, :] * variation).astype(np.int64)
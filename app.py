@@ -1,600 +1,1135 @@
 
+import time
+
+# Import-to-ready time is measured from here; see metrics.startup_report
+STARTED = time.perf_counter()
+
+import os
+
 import dash
 from dash import dcc, html
-from dash.dependencies import Input, Output
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import numpy as np
 import dash_bootstrap_components as dbc
 
+from data import (
+    CATEGORY_FILTERS, ENGINEERING_TYPES, SERVICE_KEYWORDS, default_noc_selection, engineer_type,
+    select_category, select_engineering, select_essential_services, select_occupations
+)
+from dataset import DatasetManager
+import export_api
+from figure_cache import figure_cache_from_env
+from figures import (
+    OTHER_LABEL, RENDER_BUDGET, compact_values, figure, gender_figure, grouped_bars, hierarchy_figure, lean_template,
+    page_count, patch_sequence, reference_line, sequence_edits, top_n, with_other
+)
+import jobs
+from keyword_matcher import normalize_keyword
+import metrics
+from precompute import assemble_gender_figure, precomputed_from_env
+from province_matrix import province_table_from_env
+from store import extract_store_from_env
 
-def clean_data(filepath):
-   
-    df = pd.read_csv(filepath)
+metrics.startup_stage_seconds.set(time.perf_counter() - STARTED, stage='imports')
 
-    for col in ['Total', 'Men', 'Women']:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.replace(',', '').str.replace('"', '')
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+DATA_PATH = 'data.csv'
 
-    df = df.dropna(subset=['Total', 'Men', 'Women'])
-    
-    return df
+DATASET_POLL_INTERVAL = float(os.environ.get('DATASET_POLL_INTERVAL', 5))
+# How often open pages ask whether the dataset changed; every tick is a request per tab
+DATASET_BROWSER_POLL_INTERVAL = float(os.environ.get('DATASET_BROWSER_POLL_INTERVAL', 60))
+EXTRACT_CACHE_SIZE = int(os.environ.get('EXTRACT_CACHE_SIZE', 4))
 
-def get_essential_services_data(df):
+DEFAULT_EXTRACT = "default"
 
-    essential_services = [
-        'Police officers', 
-        'Firefighters',
-        'Registered nurses'
-    ]
-    
-    essential_df = df[df['Occupation'].str.contains('|'.join(essential_services), case=False, na=False)]
-    
-    return essential_df
+SEARCH_LIMIT = 20
 
-def get_noc_top_level_data(df):
+CATEGORY_OPTIONS = [
+    {"label": "Business & Finance", "value": "business"},
+    {"label": "Sciences & Engineering", "value": "science"},
+    {"label": "Health", "value": "health"},
+    {"label": "Education & Law", "value": "education"},
+    {"label": "Art & Culture", "value": "art"}
+]
 
-    pattern = r'^\d\s[A-Za-z]+'
-    top_level_df = df[df['Occupation'].str.match(pattern, na=False)]
-    
-    return top_level_df
-
-def get_engineering_data(df):
+# Selections changing by more items than this get a full figure rather than a Patch
+MAX_PATCH_CHANGES = 10
 
-    engineering_occupations = [
-        'Computer engineers', 
-        'Mechanical engineers',
-        'Electrical and electronics engineers'
-    ]
-    
-    engineering_df = df[df['Occupation'].str.contains('|'.join(engineering_occupations), case=False, na=False)]
-    
-    return engineering_df
+# NOC levels shown below the drilled-into group
+HIERARCHY_DEPTH = 2
+HIERARCHY_ROOT = "all"
+# colour option -> (rollup attribute, colour bar title, neutral value)
+HIERARCHY_COLORS = {
+    "women_share": ("women_share", "Women (% of Total)", 50),
+    "parity": ("parity", "Gender Parity Index", 1)
+}
 
-def normalize_by_population(df, population_data):
-   
+with metrics.startup_stage('dataset'):
+    datasets = DatasetManager(
+        DATA_PATH,
+        poll_interval=DATASET_POLL_INTERVAL,
+        store=extract_store_from_env(),
+        cache_size=EXTRACT_CACHE_SIZE,
+        province_table=province_table_from_env()
+    ).start()
 
-    normalized_df = df.copy()
+figure_cache = figure_cache_from_env()
+datasets.subscribe(lambda dataset: figure_cache.set_version(dataset.digest))
 
-    for col in ['Total', 'Men', 'Women']:
-        if col in normalized_df.columns:
-            normalized_df[f'{col}_per_10k'] = normalized_df[col] / (population_data / 10000)
-    
-    return normalized_df
-
-def get_gender_ratio(df):
-
-    gender_df = df.copy()
-    gender_df['GenderRatio'] = gender_df['Men'] / gender_df['Women']
-    return gender_df
-
-
-def get_province_data():
-
-    provinces = {
-        'Alberta': {'Population': 3375130	},
-        'British Columbia': {'Population': 4200425},
-        'Manitoba': {'Population': 1058410},
-        'New Brunswick': {'Population': 648250},
-        'Newfoundland and Labrador': {'Population': 433955},
-        'Northwest Territories': {'Population': 31915},
-        'Nova Scotia': {'Population': 31915},
-        'Nunavut': {'Population': 24540},
-        'Ontario': {'Population': 11782825},
-        'Prince Edward Island': {'Population': 126900},
-        'Quebec': {'Population': 93585},
-        'Saskatchewan': {'Population': 882760},
-        'Yukon': {'Population': 32775}
-    }
-    
-    return provinces
+precomputed = precomputed_from_env()
 
-df = clean_data('data.csv')
-provinces = get_province_data()
-
-
-essential_services_df = get_essential_services_data(df)
-noc_top_level_df = get_noc_top_level_data(df)
-engineering_df = get_engineering_data(df)
-
-province_populations = {prov: data['Population'] for prov, data in provinces.items()}
+# Heavy views run as background jobs; finished results are reused per dataset version
+background_manager = jobs.background_manager_from_env(cache_by=[lambda: datasets.current().digest])
 
 app = dash.Dash(
     __name__, 
+    compress=True,
+    # Tab contents are added by render_tab, so most callback components are not in the initial layout
+    suppress_callback_exceptions=True,
     external_stylesheets=[dbc.themes.BOOTSTRAP],
     meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}]
 )
 server = app.server
+metrics.init_app(server)
+export_api.init_app(server, datasets)
+
+
+def search_options(dataset, search_value, selected):
+    """Dropdown options for a typeahead: the current selection, then the best matches (top-level categories when empty)."""
+
+    selected = list(selected or [])
+    matches = dataset.search(search_value, SEARCH_LIMIT) if search_value else dataset.noc_categories()
+    return [{"label": occ, "value": occ} for occ in selected + [occ for occ in matches if occ not in set(selected)]]
+
+def extract_options():
+
+    options = [{"label": f"2023 · Canada ({DATA_PATH})", "value": DEFAULT_EXTRACT}]
+    options += [
+        {"label": f"{extract['year']} · {extract['geography']}", "value": extract['id']}
+        for extract in datasets.extracts()
+    ]
+    return options
+
+def pager_controls(view):
+    """Page links through a selection larger than the render budget; hidden until one is."""
+
+    return html.Div([
+        dbc.Pagination(id=f"{view}-page", max_value=1, active_page=1, previous_next=True, size="sm"),
+        html.Small(id=f"{view}-budget", className="text-muted")
+    ], id=f"{view}-pager", hidden=True)
+
+def bands_toggle(view):
+    """Switch between the matrix's estimate and the simulated mean with its 90% range."""
 
+    return dcc.Checklist(
+        id=f"{view}-bands",
+        options=[{"label": "Show simulated mean and 90% range of estimates", "value": "bands"}],
+        value=[],
+        inline=True
+    )
+
+def essential_services_tab(dataset):
 
-app.layout = dbc.Container([
-    dbc.Row([
-        dbc.Col([
-            html.H1("2023 Canadian Workforce and Employment Data Dashboard", className="text-center"),
-            html.P("Interactive visualization of essential services and employment statistics", className="text-center")
-        ], width=12)
-    ], className="mt-4 mb-4"),
-
-    dbc.Tabs([
-      
-        dbc.Tab(label="Essential Services Personnel by Province", children=[
-            dbc.Row([
-                dbc.Col([
-                    html.H3("Essential Services Personnel Distribution by Province", className="mt-3"),
-                    html.P("Distribution of essential services personnel (nurses, police, firefighters) across provinces")
-                ], width=12)
-            ]),
-            
-            dbc.Row([
-                dbc.Col([
-                    html.Label("Select Service Type:"),
-                    dcc.Dropdown(
-                        id="service-type-dropdown",
-                        options=[
-                            {"label": "All Essential Services", "value": "all"},
-                            {"label": "Police Officers", "value": "police"},
-                            {"label": "Firefighters", "value": "fire"},
-                            {"label": "Registered Nurses", "value": "nurse"}
-                        ],
-                        value="all",
-                        clearable=False
-                    )
-                ], width=4),
-                
-                dbc.Col([
-                    html.Label("Normalization Type:"),
-                    dcc.RadioItems(
-                        id="normalization-radio",
-                        options=[
-                            {"label": "Absolute Numbers", "value": "absolute"},
-                            {"label": "Per 10,000 Population", "value": "normalized"}
-                        ],
-                        value="absolute",
-                        inline=True
-                    )
-                ], width=4),
-                
-                dbc.Col([
-                    html.Label("Sort Data By:"),
-                    dcc.RadioItems(
-                        id="sort-radio",
-                        options=[
-                            {"label": "Province (A-Z)", "value": "province"},
-                            {"label": "Value (Descending)", "value": "value"}
-                        ],
-                        value="value",
-                        inline=True
-                    )
-                ], width=4)
-            ], className="mb-4"),
-            
-            dbc.Row([
-                dbc.Col([
-                    dcc.Graph(id="essential-services-graph")
-                ], width=12)
-            ])
+    return [
+        dbc.Row([
+            dbc.Col([
+                html.H3("Essential Services Personnel Distribution by Province", className="mt-3"),
+                html.P("Distribution of essential services personnel (nurses, police, firefighters) across provinces")
+            ], width=12)
         ]),
+    
+        dbc.Row([
+            dbc.Col([
+                html.Label("Select Service Type:"),
+                dcc.Dropdown(
+                    id="service-type-dropdown",
+                    options=[
+                        {"label": "All Essential Services", "value": "all"},
+                        {"label": "Police Officers", "value": "police"},
+                        {"label": "Firefighters", "value": "fire"},
+                        {"label": "Registered Nurses", "value": "nurse"}
+                    ],
+                    value="all",
+                    clearable=False
+                )
+            ], width=4),
+        
+            dbc.Col([
+                html.Label("Normalization Type:"),
+                dcc.RadioItems(
+                    id="normalization-radio",
+                    options=[
+                        {"label": "Absolute Numbers", "value": "absolute"},
+                        {"label": "Per 10,000 Population", "value": "normalized"}
+                    ],
+                    value="absolute",
+                    inline=True
+                )
+            ], width=4),
         
+            dbc.Col([
+                html.Label("Sort Data By:"),
+                dcc.RadioItems(
+                    id="sort-radio",
+                    options=[
+                        {"label": "Province (A-Z)", "value": "province"},
+                        {"label": "Value (Descending)", "value": "value"}
+                    ],
+                    value="value",
+                    inline=True
+                )
+            ], width=4)
+        ], className="mb-4"),
+    
+        dbc.Row([
+            dbc.Col([
+                bands_toggle("essential-services"),
+                dcc.Graph(id="essential-services-graph")
+            ], width=12)
+        ])
+    ]
 
-        dbc.Tab(label="Employment Statistics by Gender in NOC Categories", children=[
-            dbc.Row([
-                dbc.Col([
-                    html.H3("Employment Statistics by Gender in NOC Categories", className="mt-3"),
-                    html.P("Employment statistics by gender across top-level NOC categories")
-                ], width=12)
-            ]),
-            
-            dbc.Row([
-                dbc.Col([
-                    html.Label("Choose NOC Categories:"),
-                    dcc.Dropdown(
-                        id="noc-dropdown",
-                        options=[
-                            {"label": occ, "value": occ} 
-                            for occ in noc_top_level_df['Occupation'].unique()
-                        ],
-                        value=noc_top_level_df['Occupation'].unique()[:3].tolist(),
-                        multi=True
-                    )
-                ], width=6),
-                
-                dbc.Col([
-                    html.Label("Choose Chart Type:"),
-                    dcc.RadioItems(
-                        id="chart-type-radio",
-                        options=[
-                            {"label": "Stacked Bar", "value": "stack"},
-                            {"label": "Grouped Bar", "value": "group"},
-                            {"label": "Gender Ratio", "value": "ratio"}
-                        ],
-                        value="stack",
-                        inline=True
-                    )
-                ], width=6)
-            ], className="mb-4"),
-            
-            dbc.Row([
-                dbc.Col([
-                    dcc.Graph(id="gender-employment-graph")
-                ], width=12)
-            ])
+def gender_tab(dataset):
+
+    return [
+        dbc.Row([
+            dbc.Col([
+                html.H3("Employment Statistics by Gender in NOC Categories", className="mt-3"),
+                html.P("Employment statistics by gender across top-level NOC categories")
+            ], width=12)
         ]),
+    
+        dbc.Row([
+            dbc.Col([
+                html.Label("Choose NOC Categories or Search Any Occupation:"),
+                # Only the top-level categories ship with the layout; typing searches every occupation
+                dcc.Dropdown(
+                    id="noc-dropdown",
+                    options=[
+                        {"label": occ, "value": occ} 
+                        for occ in dataset.noc_categories()
+                    ],
+                    value=default_noc_selection(dataset),
+                    placeholder="Type an occupation or NOC code...",
+                    multi=True
+                )
+            ], width=6),
         
+            dbc.Col([
+                html.Label("Choose Chart Type:"),
+                dcc.RadioItems(
+                    id="chart-type-radio",
+                    options=[
+                        {"label": "Stacked Bar", "value": "stack"},
+                        {"label": "Grouped Bar", "value": "group"},
+                        {"label": "Gender Ratio", "value": "ratio"}
+                    ],
+                    value="stack",
+                    inline=True
+                )
+            ], width=6)
+        ], className="mb-4"),
+    
+        dbc.Row([
+            dbc.Col([
+                dcc.Graph(id="gender-employment-graph"),
+                pager_controls("gender-employment"),
+                # What the graph currently shows, so the next change can be sent as a Patch
+                dcc.Store(id="gender-employment-rendered")
+            ], width=12)
+        ])
+    ]
+
+def engineering_tab(dataset):
 
-        dbc.Tab(label="Engineering Talent Distribution by Province", children=[
-            dbc.Row([
-                dbc.Col([
-                    html.H3("Engineering Talent Distribution by Province", className="mt-3"),
-                    html.P("Analysis of available engineering talent (Computer, Mechanical, Electrical) by province")
-                ], width=12)
-            ]),
-            
-            dbc.Row([
-                dbc.Col([
-                    html.Label("Select Engineering Occupation Types:"),
-                    dcc.Checklist(
-                        id="engineering-checklist",
-                        options=[
-                            {"label": "Computer Engineers", "value": "computer"},
-                            {"label": "Mechanical Engineers", "value": "mechanical"},
-                            {"label": "Electrical Engineers", "value": "electrical"}
-                        ],
-                        value=["computer", "mechanical", "electrical"],
-                        inline=True
-                    )
-                ], width=6),
-                
-                dbc.Col([
-                    html.Label("View Data As:"),
-                    dcc.RadioItems(
-                        id="engineering-view-radio",
-                        options=[
-                            {"label": "Absolute Numbers", "value": "absolute"},
-                            {"label": "Percentage of Total", "value": "percentage"},
-                            {"label": "Per Capita", "value": "per_capita"}
-                        ],
-                        value="absolute",
-                        inline=True
-                    )
-                ], width=6)
-            ], className="mb-4"),
-            
-            dbc.Row([
-                dbc.Col([
-                    dcc.Graph(id="engineering-manpower-graph")
-                ], width=12)
-            ])
+    return [
+        dbc.Row([
+            dbc.Col([
+                html.H3("Engineering Talent Distribution by Province", className="mt-3"),
+                html.P("Analysis of available engineering talent (Computer, Mechanical, Electrical) by province")
+            ], width=12)
         ]),
+    
+        dbc.Row([
+            dbc.Col([
+                html.Label("Select Engineering Occupation Types:"),
+                dcc.Checklist(
+                    id="engineering-checklist",
+                    options=[
+                        {"label": "Computer Engineers", "value": "computer"},
+                        {"label": "Mechanical Engineers", "value": "mechanical"},
+                        {"label": "Electrical Engineers", "value": "electrical"}
+                    ],
+                    value=["computer", "mechanical", "electrical"],
+                    inline=True
+                )
+            ], width=6),
         
- 
-        dbc.Tab(label="Gender Distribution and Parity Across Occupation Categories", children=[
-            dbc.Row([
-                dbc.Col([
-                    html.H3("Gender Distribution and Parity Across Occupation Categories", className="mt-3"),
-                    html.P("Exploring gender distribution patterns across different occupation hierarchy levels")
-                ], width=12)
-            ]),
-            
-            dbc.Row([
-                dbc.Col([
-                    html.Label("Select Occupation Category for Analysis:"),
-                    dcc.Dropdown(
-                        id="occupation-category-dropdown",
-                        options=[
-                            {"label": "Business & Finance", "value": "business"},
-                            {"label": "Sciences & Engineering", "value": "science"},
-                            {"label": "Health", "value": "health"},
-                            {"label": "Education & Law", "value": "education"},
-                            {"label": "Art & Culture", "value": "art"}
-                        ],
-                        value="science",
-                        clearable=False
-                    )
-                ], width=6),
-                
-                dbc.Col([
-                    html.Label("Choose Analysis Type:"),
-                    dcc.RadioItems(
-                        id="analysis-type-radio",
-                        options=[
-                            {"label": "Hierarchy Level Analysis", "value": "hierarchy"},
-                            {"label": "Gender Parity Index", "value": "parity"}
-                        ],
-                        value="hierarchy",
-                        inline=True
-                    )
-                ], width=6)
-            ], className="mb-4"),
-            
-            dbc.Row([
-                dbc.Col([
-                    dcc.Graph(id="custom-insight-graph")
-                ], width=12)
-            ])
+            dbc.Col([
+                html.Label("View Data As:"),
+                dcc.RadioItems(
+                    id="engineering-view-radio",
+                    options=[
+                        {"label": "Absolute Numbers", "value": "absolute"},
+                        {"label": "Percentage of Total", "value": "percentage"},
+                        {"label": "Per Capita", "value": "per_capita"}
+                    ],
+                    value="absolute",
+                    inline=True
+                )
+            ], width=6)
+        ], className="mb-4"),
+    
+        dbc.Row([
+            dbc.Col([
+                bands_toggle("engineering"),
+                dcc.Graph(id="engineering-manpower-graph")
+            ], width=12)
         ])
-    ]),
+    ]
+
+def custom_insight_tab(dataset):
+
+    return [
+        dbc.Row([
+            dbc.Col([
+                html.H3("Gender Distribution and Parity Across Occupation Categories", className="mt-3"),
+                html.P("Exploring gender distribution patterns across different occupation hierarchy levels")
+            ], width=12)
+        ]),
     
-    html.Footer([
-        html.P("Data Source: 2023 Statistics Canada Census", className="text-center mt-4 text-muted")
-    ])
-], fluid=True)
+        dbc.Row([
+            dbc.Col([
+                html.Label("Select Occupation Category for Analysis:"),
+                dcc.Dropdown(
+                    id="occupation-category-dropdown",
+                    options=CATEGORY_OPTIONS,
+                    value="science",
+                    clearable=False
+                )
+            ], width=4),
+        
+            dbc.Col([
+                html.Label("Pin Occupations:"),
+                dcc.Dropdown(
+                    id="pin-occupations",
+                    options=[],
+                    value=[],
+                    placeholder="Type an occupation or NOC code...",
+                    multi=True
+                )
+            ], width=4),
+        
+            dbc.Col([
+                html.Label("Choose Analysis Type:"),
+                dcc.RadioItems(
+                    id="analysis-type-radio",
+                    options=[
+                        {"label": "Hierarchy Level Analysis", "value": "hierarchy"},
+                        {"label": "Gender Parity Index", "value": "parity"}
+                    ],
+                    value="hierarchy",
+                    inline=True
+                )
+            ], width=4)
+        ], className="mb-4"),
+    
+        dbc.Row([
+            dbc.Col([
+                html.Label("New Category Name:"),
+                dcc.Input(id="custom-category-name", type="text", placeholder="e.g. Dental", className="form-control")
+            ], width=3),
+        
+            dbc.Col([
+                html.Label("Keywords (comma-separated, matched at word starts):"),
+                dcc.Input(id="custom-category-keywords", type="text", placeholder="e.g. dental, dentists", className="form-control")
+            ], width=7),
+        
+            dbc.Col([
+                dbc.Button("Add Category", id="custom-category-add", size="sm", color="primary", className="mt-4")
+            ], width=2)
+        ], className="mb-4"),
+    
+        dbc.Row([
+            dbc.Col([
+                dbc.Progress(id="custom-insight-progress", value=0, max=1, striped=True, animated=True)
+            ], width=10),
+        
+            dbc.Col([
+                dbc.Button("Cancel", id="custom-insight-cancel", size="sm", color="secondary", disabled=True)
+            ], width=2)
+        ], id="custom-insight-status", className="mb-2", style={"visibility": "hidden"}),
+    
+        dbc.Row([
+            dbc.Col([
+                dcc.Graph(id="custom-insight-graph"),
+                pager_controls("custom-insight")
+            ], width=12)
+        ])
+    ]
 
+def hierarchy_tab(dataset):
+
+    return [
+        dbc.Row([
+            dbc.Col([
+                html.H3("NOC Hierarchy Drill-Down", className="mt-3"),
+                html.P("Employment rolled up through the five NOC levels; click an occupation group to drill into it, or its parent to go back up")
+            ], width=12)
+        ]),
+    
+        dbc.Row([
+            dbc.Col([
+                html.Label("Chart Type:"),
+                dcc.RadioItems(
+                    id="hierarchy-chart-radio",
+                    options=[
+                        {"label": "Treemap", "value": "treemap"},
+                        {"label": "Sunburst", "value": "sunburst"}
+                    ],
+                    value="treemap",
+                    inline=True
+                )
+            ], width=4),
+        
+            dbc.Col([
+                html.Label("Colour By:"),
+                dcc.RadioItems(
+                    id="hierarchy-color-radio",
+                    options=[
+                        {"label": "Women (% of Total)", "value": "women_share"},
+                        {"label": "Gender Parity Index", "value": "parity"}
+                    ],
+                    value="women_share",
+                    inline=True
+                )
+            ], width=4),
+        
+            dbc.Col([
+                dbc.Button("All Occupations", id="hierarchy-reset", size="sm", color="secondary")
+            ], width=4)
+        ], className="mb-4"),
+    
+        dbc.Row([
+            dbc.Col([
+                dcc.Graph(id="hierarchy-graph")
+            ], width=12)
+        ]),
+
+        dcc.Store(id="hierarchy-root", data="")
+    ]
+
+
+# tab id -> (label, content builder); a tab's content is built the first time it is opened
+TABS = {
+    "essential-services": ("Essential Services Personnel by Province", essential_services_tab),
+    "gender": ("Employment Statistics by Gender in NOC Categories", gender_tab),
+    "engineering": ("Engineering Talent Distribution by Province", engineering_tab),
+    "custom-insight": ("Gender Distribution and Parity Across Occupation Categories", custom_insight_tab),
+    "hierarchy": ("NOC Hierarchy Drill-Down", hierarchy_tab)
+}
+DEFAULT_TAB = "essential-services"
+
+def serve_layout(rendered=(DEFAULT_TAB,)):
+    """
+    Page layout with only the ``rendered`` tabs built; ``render_tab`` builds the others when opened.
+
+    Tools that enumerate the controls of every view pass ``rendered=TABS``.
+    """
+
+    dataset = datasets.current()
+    timer = metrics.PhaseTimer("layout")
+
+    layout = dbc.Container([
+        dbc.Row([
+            dbc.Col([
+                html.H1("2023 Canadian Workforce and Employment Data Dashboard", className="text-center"),
+                html.P("Interactive visualization of essential services and employment statistics", className="text-center")
+            ], width=12)
+        ], className="mt-4 mb-4"),
+
+        dbc.Row([
+            dbc.Col([
+                html.Label("Census Extract:"),
+                dcc.Dropdown(
+                    id="extract-dropdown",
+                    options=extract_options(),
+                    value=DEFAULT_EXTRACT,
+                    clearable=False
+                )
+            ], width=4)
+        ], className="mb-4"),
+
+        dbc.Tabs([
+            dbc.Tab(
+                html.Div(builder(dataset) if tab_id in rendered else None, id=f"{tab_id}-tab"),
+                label=label,
+                tab_id=tab_id
+            )
+            for tab_id, (label, builder) in TABS.items()
+        ], id="tabs", active_tab=DEFAULT_TAB),
+    
+        html.Footer([
+            html.P("Data Source: 2023 Statistics Canada Census", className="text-center mt-4 text-muted")
+        ]),
+
+        dcc.Store(id="rendered-tabs", data=list(rendered)),
+        # User-defined categories, name -> keywords; kept in the browser, so every worker sees them
+        dcc.Store(id="custom-categories", data={}, storage_type="session"),
+        dcc.Store(id="dataset-version", data=dataset.digest),
+        dcc.Store(id="essential-services-data"),
+        dcc.Store(id="engineering-data"),
+        dcc.Store(id="engineering-rendered"),
+        dcc.Store(id="figure-template", data=lean_template()),
+        dcc.Interval(
+            id="dataset-poll",
+            interval=DATASET_BROWSER_POLL_INTERVAL * 1000,
+            disabled=not (DATASET_POLL_INTERVAL and DATASET_BROWSER_POLL_INTERVAL)
+        )
+    ], fluid=True)
+    timer.lap("build")
+
+    return layout
+
+
+app.layout = serve_layout
 
 
 @app.callback(
-    Output("essential-services-graph", "figure"),
+    [Output(f"{tab_id}-tab", "children") for tab_id in TABS] + [Output("rendered-tabs", "data")],
+    Input("tabs", "active_tab"),
+    [
+        State("rendered-tabs", "data"),
+        State("extract-dropdown", "value")
+    ],
+    prevent_initial_call=True
+)
+@metrics.instrument("render-tab")
+def render_tab(active_tab, rendered, extract):
+
+    # Opened tabs stay in the page (hidden when inactive), so their controls keep their state
+    if active_tab not in TABS or active_tab in rendered:
+        return [dash.no_update] * (len(TABS) + 1)
+
+    dataset = datasets.get(extract)
+    children = [builder(dataset) if tab_id == active_tab else dash.no_update for tab_id, (_, builder) in TABS.items()]
+    return children + [rendered + [active_tab]]
+
+
+
+@app.callback(
+    Output("dataset-version", "data"),
+    Input("dataset-poll", "n_intervals"),
+    State("dataset-version", "data")
+)
+def poll_dataset_version(n_intervals, data_version):
+
+    digest = datasets.current().digest
+    return dash.no_update if digest == data_version else digest
+
+@app.callback(
+    [
+        Output("noc-dropdown", "options"),
+        Output("noc-dropdown", "value")
+    ],
+    [
+        Input("noc-dropdown", "search_value"),
+        Input("extract-dropdown", "value"),
+        Input("dataset-version", "data")
+    ],
+    State("noc-dropdown", "value"),
+    prevent_initial_call=True
+)
+@metrics.instrument("noc-search")
+def refresh_noc_options(search_value, extract, data_version, selected_nocs):
+
+    dataset = datasets.get(extract)
+    if dash.ctx.triggered_id == "noc-dropdown":
+        return search_options(dataset, search_value, selected_nocs), dash.no_update
+
+    # The extract or its data changed: keep only selections that still exist
+    labels = dataset.df['Occupation'].array.categories
+    selected = [occ for occ in (selected_nocs or []) if occ in labels]
+    selected = selected or default_noc_selection(dataset)
+    
+    return search_options(dataset, None, selected), selected
+
+@app.callback(
+    [
+        Output("custom-categories", "data"),
+        Output("occupation-category-dropdown", "value")
+    ],
+    Input("custom-category-add", "n_clicks"),
+    [
+        State("custom-category-name", "value"),
+        State("custom-category-keywords", "value"),
+        State("custom-categories", "data")
+    ],
+    prevent_initial_call=True
+)
+def add_custom_category(n_clicks, name, keywords, custom_categories):
+
+    name = (name or "").strip()
+    keywords = [keyword.strip() for keyword in (keywords or "").split(",") if keyword.strip()]
+    if not name or not keywords or name in CATEGORY_FILTERS:
+        return dash.no_update, dash.no_update
+
+    # Keywords are indexed by the keyword matrix the first time the category is drawn
+    return {**(custom_categories or {}), name: keywords}, name
+
+@app.callback(
+    Output("occupation-category-dropdown", "options"),
+    Input("custom-categories", "data")
+)
+def custom_category_options(custom_categories):
+
+    return CATEGORY_OPTIONS + [
+        {"label": f"{name} (custom)", "value": name}
+        for name in (custom_categories or {})
+    ]
+
+@app.callback(
+    Output("pin-occupations", "options"),
+    Input("pin-occupations", "search_value"),
+    [
+        State("pin-occupations", "value"),
+        State("extract-dropdown", "value")
+    ],
+    prevent_initial_call=True
+)
+@metrics.instrument("pin-search")
+def search_pin_options(search_value, pinned, extract):
+
+    if not search_value:
+        return dash.no_update
+    return search_options(datasets.get(extract), search_value, pinned)
+
+
+# Keys start with the digest of the selected extract, so each extract caches separately
+def essential_services_key(service_type, extract=None, data_version=None):
+
+    return [datasets.get(extract).digest, service_type if service_type in SERVICE_KEYWORDS else "all"]
+
+def gender_employment_key(selected_nocs, chart_type, page=1, extract=None, data_version=None):
+
+    dataset = datasets.get(extract)
+    return [dataset.digest, sorted(selected_nocs or default_noc_selection(dataset)), chart_type, page or 1]
+
+def engineering_key(selected_types, extract=None, data_version=None):
+
+    return [datasets.get(extract).digest, sorted(selected_types or ENGINEERING_TYPES)]
+
+def custom_insight_key(category, analysis_type, pinned=None, custom_categories=None, page=1, extract=None, data_version=None):
+
+    custom_categories = custom_categories or {}
+    if category in custom_categories:
+        # Cached by keywords, so redefining a category never serves the old figure
+        category = ["custom", sorted(normalize_keyword(keyword) for keyword in custom_categories[category])]
+    elif category not in CATEGORY_FILTERS:
+        category = "business"
+
+    return [datasets.get(extract).digest, category, analysis_type, sorted(pinned or []), page or 1]
+
+
+def band_values(bands):
+    """Per group, the simulated ``mean``, ``low`` and ``high`` counts as whole people."""
+
+    # Converted in one go rather than per group, as selections can have hundreds
+    mean, low, high = (np.rint(values).astype(np.int64).tolist() for values in bands)
+    return [{'mean': m, 'low': l, 'high': h} for m, l, h in zip(mean, low, high)]
+
+
+@app.callback(
+    Output("essential-services-data", "data"),
     [
         Input("service-type-dropdown", "value"),
-        Input("normalization-radio", "value"),
-        Input("sort-radio", "value")
+        Input("extract-dropdown", "value"),
+        Input("dataset-version", "data")
     ]
 )
-def update_essential_services_graph(service_type, normalization, sort_by):
+@metrics.instrument("essential-services")
+@precomputed.serve("essential-services", normalize=essential_services_key)
+@figure_cache.cached("essential-services", normalize=essential_services_key)
+def update_essential_services_data(service_type, extract=None, data_version=None):
+
+    dataset = datasets.get(extract)
+    timer = metrics.PhaseTimer("essential-services")
  
-    if service_type == "all":
-        filtered_df = essential_services_df.copy()
-    elif service_type == "police":
-        filtered_df = essential_services_df[essential_services_df['Occupation'].str.contains('Police', case=False, na=False)]
-    elif service_type == "fire":
-        filtered_df = essential_services_df[essential_services_df['Occupation'].str.contains('Fire', case=False, na=False)]
-    elif service_type == "nurse":
-        filtered_df = essential_services_df[essential_services_df['Occupation'].str.contains('Nurse', case=False, na=False)]
-    
+    service_type, rows = select_essential_services(dataset, service_type)
+    timer.lap("filter")
 
-    provinces_list = list(provinces.keys())
-    
+    occupations = dataset.df.iloc[rows].drop_duplicates('Occupation')
+    matrix = dataset.province_matrix
+    counts = matrix.counts[occupations.index]
+    per_10k = matrix.per_10k[occupations.index]
+    timer.lap("slice")
 
-    province_data = []
-    for occ in filtered_df['Occupation'].unique():
-        total = filtered_df[filtered_df['Occupation'] == occ]['Total'].iloc[0]
-
-        for province in provinces_list:
-            pop_proportion = provinces[province]['Population'] / sum([p['Population'] for p in provinces.values()])
-
-            variation = np.random.uniform(0.7, 1.3)
-            province_value = int(total * pop_proportion * variation)
-            
-            province_data.append({
-                'Province': province,
-                'Occupation': occ,
-                'Count': province_value,
-                'Population': provinces[province]['Population'],
-                'Per10K': (province_value / provinces[province]['Population']) * 10000
-            })
+    if service_type == "all":
+        series = [{
+            'name': 'All Essential Services',
+            'counts': compact_values(counts.sum(axis=0)),
+            'per_10k': compact_values(per_10k.sum(axis=0))
+        }]
+        groups = np.zeros(len(occupations), dtype=np.intp)
+    else:
+        series = [
+            {'name': occ, 'counts': compact_values(occ_counts), 'per_10k': compact_values(occ_per_10k)}
+            for occ, occ_counts, occ_per_10k in zip(occupations['Occupation'], counts, per_10k)
+        ]
+        groups = None
+
+    bands = matrix.bands(occupations.index, groups, seed=["essential-services", service_type])
+    for item, band in zip(series, band_values(bands)):
+        item['bands'] = band
+    timer.lap("simulate")
     
-    province_df = pd.DataFrame(province_data)
+    # Sorting, the choice of absolute or per-10k values and the bands toggle happen in the browser (assets/dashboard.js)
+    payload = {
+        'title': service_type.title(),
+        'provinces': matrix.names.tolist(),
+        'population': compact_values(matrix.population),
+        'series': series
+    }
+    timer.lap("payload")
     
+    return payload
 
-    if service_type == "all":
-        province_df = province_df.groupby('Province').agg({
-            'Count': 'sum',
-            'Population': 'first',
-            'Per10K': 'sum'
-        }).reset_index()
-    
+app.clientside_callback(
+    ClientsideFunction(namespace="workforce", function_name="essentialServicesFigure"),
+    Output("essential-services-graph", "figure"),
+    [
+        Input("essential-services-data", "data"),
+        Input("normalization-radio", "value"),
+        Input("sort-radio", "value"),
+        Input("essential-services-bands", "value")
+    ],
+    State("figure-template", "data")
+)
 
-    y_column = 'Per10K' if normalization == 'normalized' else 'Count'
-    y_title = 'Personnel per 10,000 Population' if normalization == 'normalized' else 'Number of Personnel'
 
-    if sort_by == 'province':
-        province_df = province_df.sort_values('Province')
-    else: 
-        province_df = province_df.sort_values(y_column, ascending=False)
-    
+@precomputed.serve("gender-employment", normalize=gender_employment_key, assemble=assemble_gender_figure)
+@figure_cache.cached("gender-employment", normalize=gender_employment_key)
+def update_gender_employment_graph(selected_nocs, chart_type, page=1, extract=None, data_version=None):
 
-    fig = px.bar(
-        province_df,
-        x='Province',
-        y=y_column,
-        color='Province',
-        title=f'Essential Services Personnel Distribution by Province ({service_type.title()})',
-        labels={'Province': 'Province/Territory', y_column: y_title}
-    )
-    
-    fig.update_layout(
-        xaxis_tickangle=-45,
-        legend_title="Province/Territory",
-        height=600
+    dataset = datasets.get(extract)
+    timer = metrics.PhaseTimer("gender-employment")
+
+    filtered_df = dataset.df.iloc[select_occupations(dataset, selected_nocs)]
+    timer.lap("filter")
+
+    shown, rest, _ = top_n(filtered_df['Total'].to_numpy(), RENDER_BUDGET, page)
+    labels, (men, women) = with_other(
+        filtered_df['Occupation'].tolist(),
+        [filtered_df['Men'].to_numpy(), filtered_df['Women'].to_numpy()],
+        shown,
+        rest
     )
-    
+    timer.lap("budget")
+
+    fig = gender_figure(labels, men, women, chart_type)
+    timer.lap("figure")
     return fig
 
+def gender_employment_patch(dataset, rendered, selected_nocs, chart_type):
+    """
+    ``dash.Patch`` from the ``rendered`` figure to the one for these inputs, or None for a full render.
+
+    Bars of added or removed occupations are inserted or deleted where a full
+    render would put them, and stack/group only changes ``barmode``.
+    """
+
+    if not rendered or rendered['digest'] != dataset.digest or (rendered['chart_type'] == "ratio") != (chart_type == "ratio"):
+        return None
+
+    old_rows = select_occupations(dataset, rendered['selected'])
+    new_rows = select_occupations(dataset, selected_nocs)
+    # Over the render budget the bars are a page plus "Other", which a full render works out
+    if max(len(old_rows), len(new_rows)) > RENDER_BUDGET:
+        return None
+
+    removed, inserted = sequence_edits(old_rows.tolist(), new_rows.tolist())
+    if len(removed) + len(inserted) > MAX_PATCH_CHANGES:
+        return None
+
+    added_df = dataset.df.iloc[new_rows[inserted]]
+    added = gender_figure(added_df['Occupation'], added_df['Men'].to_numpy(), added_df['Women'].to_numpy(), chart_type)
+
+    patch = dash.Patch()
+    if chart_type == "ratio":
+        # One trace per occupation
+        patch_sequence(patch['data'], removed, inserted, added['data'])
+        if removed or inserted:
+            patch['layout']['shapes'][0]['x1'] = len(new_rows) - 0.5
+    else:
+        for position, trace in enumerate(added['data']):
+            patch_sequence(patch['data'][position]['x'], removed, inserted, trace['x'])
+            patch_sequence(patch['data'][position]['y'], removed, inserted, trace['y'])
+        if chart_type != rendered['chart_type']:
+            patch['layout']['barmode'] = added['layout']['barmode']
+    return patch
 
 @app.callback(
-    Output("gender-employment-graph", "figure"),
+    [
+        Output("gender-employment-graph", "figure"),
+        Output("gender-employment-rendered", "data")
+    ],
     [
         Input("noc-dropdown", "value"),
-        Input("chart-type-radio", "value")
+        Input("chart-type-radio", "value"),
+        Input("gender-employment-page", "active_page"),
+        Input("extract-dropdown", "value"),
+        Input("dataset-version", "data")
+    ],
+    State("gender-employment-rendered", "data")
+)
+@metrics.instrument("gender-employment")
+def gender_employment_graph(selected_nocs, chart_type, page=1, extract=None, data_version=None, rendered=None):
+
+    dataset = datasets.get(extract)
+    selected_nocs = selected_nocs or default_noc_selection(dataset)
+    state = {'digest': dataset.digest, 'selected': selected_nocs, 'chart_type': chart_type}
+
+    patch = gender_employment_patch(dataset, rendered, selected_nocs, chart_type)
+    if patch is None:
+        metrics.figure_updates.inc(callback="gender-employment", update="full")
+        return update_gender_employment_graph(selected_nocs, chart_type, page, extract, data_version), state
+    metrics.figure_updates.inc(callback="gender-employment", update="patch")
+    return patch, state
+
+def pager_outputs(n, page, noun):
+    """``hidden``, page count, active page and summary of a pager over ``n`` budgeted rows."""
+
+    pages = page_count(n, RENDER_BUDGET)
+    active_page = min(max(page or 1, 1), pages)
+    first = (active_page - 1) * RENDER_BUDGET + 1
+    summary = (
+        f"{noun.capitalize()} ranked {first}-{min(first + RENDER_BUDGET - 1, n)} of {n} by employment; "
+        f"the rest are summed as {OTHER_LABEL}."
+    )
+    # Only moved when a smaller selection leaves the page out of range
+    return pages == 1, pages, active_page if active_page != page else dash.no_update, summary
+
+@app.callback(
+    [
+        Output("gender-employment-pager", "hidden"),
+        Output("gender-employment-page", "max_value"),
+        Output("gender-employment-page", "active_page"),
+        Output("gender-employment-budget", "children")
+    ],
+    [
+        Input("noc-dropdown", "value"),
+        Input("gender-employment-page", "active_page"),
+        Input("extract-dropdown", "value"),
+        Input("dataset-version", "data")
     ]
 )
-def update_gender_employment_graph(selected_nocs, chart_type):
+@metrics.instrument("gender-employment-pager")
+def gender_employment_pager(selected_nocs, page, extract=None, data_version=None):
 
-    if not selected_nocs or len(selected_nocs) == 0:
-        selected_nocs = noc_top_level_df['Occupation'].unique()[:3].tolist()
-    
+    dataset = datasets.get(extract)
+    return pager_outputs(len(select_occupations(dataset, selected_nocs)), page, "occupations")
 
-    filtered_df = noc_top_level_df[noc_top_level_df['Occupation'].isin(selected_nocs)]
-    
+def engineering_occupation_rows(dataset, selected_types):
+    """Rows of the selected engineering occupations, each occupation once."""
 
-    if chart_type == "ratio":
+    rows = select_engineering(dataset, selected_types)
+    _, first = np.unique(dataset.df['Occupation'].array.codes[rows], return_index=True)
+    return rows[np.sort(first)]
 
-        filtered_df = filtered_df.copy()  
-        filtered_df['Ratio'] = filtered_df['Men'] / filtered_df['Women']
-        
-        fig = px.bar(
-            filtered_df,
-            x='Occupation',
-            y='Ratio',
-            color='Occupation',
-            title='Gender Ratio in NOC Categories',
-            labels={'Occupation': 'NOC Category', 'Ratio': 'Men/Women Ratio'}
-        )
-        
+def engineering_series(dataset, rows):
 
-        fig.add_shape(
-            type="line",
-            x0=-0.5,
-            y0=1,
-            x1=len(filtered_df) - 0.5,
-            y1=1,
-            line=dict(color="red", width=2, dash="dash"),
-        )
-        
-        fig.update_layout(height=600)
-        
-    else: 
-        # Prepare data in long format
-        df_long = pd.melt(
-            filtered_df,
-            id_vars=['Occupation'],
-            value_vars=['Men', 'Women'],
-            var_name='Gender',
-            value_name='Count'
-        )
-        
+    matrix = dataset.province_matrix
+    labels = dataset.df['Occupation'].array[rows]
+    return [
+        {'type': engineer_type(str(label)), 'counts': compact_values(counts), 'per_10k': compact_values(per_10k)}
+        for label, counts, per_10k in zip(labels, matrix.counts[rows], matrix.per_10k[rows])
+    ]
 
-        barmode = chart_type if chart_type in ['stack', 'group'] else 'stack'
-        
-        fig = px.bar(
-            df_long,
-            x='Occupation',
-            y='Count',
-            color='Gender',
-            barmode=barmode,
-            title='Employment by Gender in NOC Categories',
-            labels={'Occupation': 'NOC Category', 'Count': 'Number of Employed Persons', 'Gender': 'Gender'}
-        )
-        
-        fig.update_layout(height=600)
+def engineering_bands(dataset, rows, selected_types):
+    """Simulated bands of each series, drawn together for the whole selection."""
+
+    seed = ["engineering", *sorted(selected_types or ENGINEERING_TYPES)]
+    return band_values(dataset.province_matrix.bands(rows, seed=seed))
+
+@precomputed.serve("engineering", normalize=engineering_key)
+@figure_cache.cached("engineering", normalize=engineering_key)
+def update_engineering_data(selected_types, extract=None, data_version=None):
+
+    dataset = datasets.get(extract)
+    timer = metrics.PhaseTimer("engineering")
+
+    rows = engineering_occupation_rows(dataset, selected_types)
+    timer.lap("filter")
+
+    series = engineering_series(dataset, rows)
+    bands = engineering_bands(dataset, rows, selected_types)
+    timer.lap("simulate")
+
+    # Absolute, percentage and per-capita views are computed in the browser (assets/dashboard.js)
+    payload = {
+        'provinces': dataset.province_matrix.names.tolist(),
+        'population': compact_values(dataset.province_matrix.population),
+        'series': series,
+        'bands': bands
+    }
+    timer.lap("payload")
     
-    return fig
+    return payload
+
+def engineering_patch(dataset, rendered, selected_types):
+    """
+    ``dash.Patch`` adding or removing the series of ticked or unticked types, or None for a full payload.
+
+    The bands are drawn for the selection as a whole, so they are replaced outright.
+    """
+
+    if not rendered or rendered['digest'] != dataset.digest:
+        return None
+
+    new_rows = engineering_occupation_rows(dataset, selected_types)
+    removed, inserted = sequence_edits(engineering_occupation_rows(dataset, rendered['types']).tolist(), new_rows.tolist())
+    if len(removed) + len(inserted) > MAX_PATCH_CHANGES:
+        return None
+
+    patch = dash.Patch()
+    patch_sequence(patch['series'], removed, inserted, engineering_series(dataset, new_rows[inserted]))
+    patch['bands'] = engineering_bands(dataset, new_rows, selected_types)
+    return patch
 
 @app.callback(
-    Output("engineering-manpower-graph", "figure"),
+    [
+        Output("engineering-data", "data"),
+        Output("engineering-rendered", "data")
+    ],
     [
         Input("engineering-checklist", "value"),
-        Input("engineering-view-radio", "value")
+        Input("extract-dropdown", "value"),
+        Input("dataset-version", "data")
+    ],
+    State("engineering-rendered", "data")
+)
+@metrics.instrument("engineering")
+def engineering_data(selected_types, extract=None, data_version=None, rendered=None):
+
+    dataset = datasets.get(extract)
+    state = {'digest': dataset.digest, 'types': selected_types}
+
+    patch = engineering_patch(dataset, rendered, selected_types)
+    if patch is None:
+        metrics.figure_updates.inc(callback="engineering", update="full")
+        return update_engineering_data(selected_types, extract, data_version), state
+    metrics.figure_updates.inc(callback="engineering", update="patch")
+    return patch, state
+
+app.clientside_callback(
+    ClientsideFunction(namespace="workforce", function_name="engineeringFigure"),
+    Output("engineering-manpower-graph", "figure"),
+    [
+        Input("engineering-data", "data"),
+        Input("engineering-view-radio", "value"),
+        Input("engineering-bands", "value")
+    ],
+    State("figure-template", "data")
+)
+
+@jobs.callback(
+    app,
+    background_manager,
+    Output("custom-insight-graph", "figure"),
+    [
+        Input("occupation-category-dropdown", "value"),
+        Input("analysis-type-radio", "value"),
+        Input("pin-occupations", "value"),
+        Input("custom-categories", "data"),
+        Input("custom-insight-page", "active_page"),
+        Input("extract-dropdown", "value"),
+        Input("dataset-version", "data")
+    ],
+    progress=[Output("custom-insight-progress", "value"), Output("custom-insight-progress", "max")],
+    # Changing any input also cancels the running job; the button cancels it outright
+    cancel=[Input("custom-insight-cancel", "n_clicks")],
+    running=[
+        (Output("custom-insight-status", "style"), {"visibility": "visible"}, {"visibility": "hidden"}),
+        (Output("custom-insight-cancel", "disabled"), False, True)
     ]
 )
-def update_engineering_manpower_graph(selected_types, view_type):
+@metrics.instrument("custom-insight")
+@precomputed.serve("custom-insight", normalize=custom_insight_key)
+@figure_cache.cached("custom-insight", normalize=custom_insight_key)
+def update_custom_insight_graph(
+    category, analysis_type, pinned=None, custom_categories=None, page=1, extract=None, data_version=None
+):
 
-    if not selected_types or len(selected_types) == 0:
-        selected_types = ["computer", "mechanical", "electrical"]
-    
+    dataset = datasets.get(extract)
+    timer = metrics.PhaseTimer("custom-insight")
 
-    engineering_filters = []
-    if "computer" in selected_types:
-        engineering_filters.append("Computer")
-    if "mechanical" in selected_types:
-        engineering_filters.append("Mechanical")
-    if "electrical" in selected_types:
-        engineering_filters.append("Electrical")
+    category, rows, pinned_rows = select_category(dataset, category, pinned, custom_categories)
+    noc_index = dataset.noc_index
+    timer.lap("filter")
+    jobs.report_progress(1, 3)
 
-    if not engineering_filters:
-        engineering_filters = ["Computer"]
-    
-    filtered_df = engineering_df[
-        engineering_df['Occupation'].str.contains('|'.join(engineering_filters), case=False, na=False)
+    if not len(rows) and not len(pinned_rows):
+        return figure([], f"No data matching selected category: {category}")
+
+    # The category's rows are budgeted; pinned occupations come last, as their own legend group
+    category_df = dataset.df.iloc[rows]
+    pinned_df = dataset.df.iloc[pinned_rows]
+    shown, rest, _ = top_n(category_df['Total'].to_numpy(), RENDER_BUDGET, page)
+    labels, columns = with_other(
+        category_df['Occupation'].tolist(),
+        [category_df[column].to_numpy() for column in ['Men', 'Women', 'Total']],
+        shown,
+        rest
+    )
+    labels += pinned_df['Occupation'].tolist()
+    men, women, total = [
+        np.concatenate([values, pinned_df[column].to_numpy()])
+        for values, column in zip(columns, ['Men', 'Women', 'Total'])
     ]
-    
+    levels = [
+        f"Level {noc_index.node_at(row).level}" if noc_index.node_at(row) else "Aggregate"
+        for row in rows[shown]
+    ] + [OTHER_LABEL] * (len(rest) > 0) + ["Pinned"] * len(pinned_rows)
+    timer.lap("prepare")
+    jobs.report_progress(2, 3)
 
-    if filtered_df.empty:
-        fig = px.bar(
-            title="No data matching selected engineering types",
+    if analysis_type == "parity":
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            parity_index = women / men
+        
+        fig = figure(
+            grouped_bars(levels, labels, parity_index),
+            f'Gender Parity Index (Women/Men) in {category.title()} Occupations',
+            x_title='Occupation',
+            y_title='Gender Parity Index',
+            legend_title='NOC Level',
+            shapes=[reference_line(1, len(labels))]
         )
-        fig.update_layout(height=600)
-        return fig
-    
-    provinces_list = list(provinces.keys())
-    province_data = []
-    
-    for occ in filtered_df['Occupation'].unique():
-        total = filtered_df[filtered_df['Occupation'] == occ]['Total'].iloc[0]
         
-        for province in provinces_list:
-            pop_proportion = provinces[province]['Population'] / sum([p['Population'] for p in provinces.values()])
-
-            if province in ['Ontario', 'British Columbia', 'Quebec']:
-                variation = np.random.uniform(1.2, 1.8)  # Tech hubs with more engineers
-            else:
-                variation = np.random.uniform(0.5, 1.1)
-                
-            province_value = int(total * pop_proportion * variation)
-            
-            engineer_type = "Computer" if "Computer" in occ else "Mechanical" if "Mechanical" in occ else "Electrical"
-            
-            province_data.append({
-                'Province': province,
-                'EngineerType': engineer_type,
-                'Count': province_value,
-                'Population': provinces[province]['Population'],
-                'Per10K': (province_value / provinces[province]['Population']) * 10000
-            })
-    
-    province_df = pd.DataFrame(province_data)
-
-    if view_type == "absolute":
-        y_column = 'Count'
-        y_title = 'Number of Engineers'
-    elif view_type == "percentage":
-   
-        province_df = province_df.copy()
-    
-        province_totals = province_df.groupby('Province')['Count'].transform('sum')
-        province_df['Percentage'] = (province_df['Count'] / province_totals) * 100
-        y_column = 'Percentage'
-        y_title = 'Percentage of Total Engineers (%)'
-    else:  
-        y_column = 'Per10K'
-        y_title = 'Engineers per 10,000 Population'
-
-    fig = px.bar(
-        province_df,
-        x='Province',
-        y=y_column,
-        color='EngineerType',
-        barmode='group',
-        title=f'Engineering Manpower by Province and Type',
-        labels={'Province': 'Province/Territory', y_column: y_title, 'EngineerType': 'Engineer Type'}
-    )
-    
-    fig.update_layout(
-        xaxis_tickangle=-45,
-        height=600
-    )
+    else:
+        # Share of women at each NOC hierarchy level
+        with np.errstate(divide='ignore', invalid='ignore'):
+            women_share = women / total * 100
+        
+        fig = figure(
+            grouped_bars(levels, labels, women_share),
+            f'Gender Distribution by Hierarchy Level in {category.title()} Occupations',
+            x_title='Occupation',
+            y_title='Women (% of Total)',
+            legend_title='NOC Level'
+        )
+
+    fig['layout'].update(barmode='relative')
+    fig['layout']['xaxis'].update(tickangle=-45, showticklabels=False)
+    timer.lap("figure")
     
     return fig
 
 @app.callback(
-    Output("custom-insight-graph", "figure"),
+    [
+        Output("custom-insight-pager", "hidden"),
+        Output("custom-insight-page", "max_value"),
+        Output("custom-insight-page", "active_page"),
+        Output("custom-insight-budget", "children")
+    ],
     [
         Input("occupation-category-dropdown", "value"),
-        Input("analysis-type-radio", "value")
+        Input("pin-occupations", "value"),
+        Input("custom-categories", "data"),
+        Input("custom-insight-page", "active_page"),
+        Input("extract-dropdown", "value"),
+        Input("dataset-version", "data")
     ]
 )
-def update_custom_insight_graph(category, analysis_type):
-
-    category_filters = {
-        "business": ["Business", "finance", "administration"],
-        "science": ["Natural", "applied sciences", "engineering"],
-        "health": ["Health", "nurse", "medical"],
-        "education": ["Education", "law", "social"],
-        "art": ["Art", "culture", "recreation"]
-    }
-    
- 
-    if category not in category_filters:
-        category = "business"  
-    
+@metrics.instrument("custom-insight-pager")
+def custom_insight_pager(category, pinned, custom_categories, page, extract=None, data_version=None):
+
+    _, rows, _ = select_category(datasets.get(extract), category, pinned, custom_categories)
+    return pager_outputs(len(rows), page, "occupations")
+
+@app.callback(
+    Output("hierarchy-root", "data"),
+    [
+        Input("hierarchy-graph", "clickData"),
+        Input("hierarchy-reset", "n_clicks"),
+        Input("extract-dropdown", "value")
+    ],
+    State("hierarchy-root", "data"),
+    prevent_initial_call=True
+)
+def drill_hierarchy(click_data, n_clicks, extract, root):
+
+    if dash.ctx.triggered_id != "hierarchy-graph" or not click_data:
+        return ""
 
-    filtered_df = df[
-        df['Occupation'].str.contains('|'.join(category_filters[category]), case=False, na=False)
+    rollup = datasets.get(extract).rollup
+    code = click_data['points'][0].get('id', "")
+    # Clicking the group being shown goes back up to its parent
+    if code == (root or HIERARCHY_ROOT):
+        return rollup.parent_code(root)
+    return code if rollup.position(code) is not None else root
+
+@app.callback(
+    Output("hierarchy-graph", "figure"),
+    [
+        Input("hierarchy-root", "data"),
+        Input("hierarchy-chart-radio", "value"),
+        Input("hierarchy-color-radio", "value"),
+        Input("extract-dropdown", "value"),
+        Input("dataset-version", "data")
     ]
-    
+)
+@metrics.instrument("hierarchy")
+def update_hierarchy_graph(root, chart_type, color, extract=None, data_version=None):
 
-    if filtered_df.empty:
-        fig = px.bar(
-            title=f"No data matching selected category: {category}",
-        )
+    rollup = datasets.get(extract).rollup
+    timer = metrics.PhaseTimer("hierarchy")
+
+    # Everything below comes from the precomputed node arrays; nothing is re-aggregated
+    position = rollup.position(root) if root else None
+    positions = rollup.subtree(root if position is not None else None, HIERARCHY_DEPTH)
+    attribute, color_title, color_mid = HIERARCHY_COLORS.get(color, HIERARCHY_COLORS["women_share"])
+    ids = rollup.codes[positions].tolist()
+    parent_positions = rollup.parents[positions]
+    parents = [rollup.codes[parent] if parent >= 0 else HIERARCHY_ROOT for parent in parent_positions.tolist()]
+    labels = rollup.labels[positions].tolist()
+    values, men, women = rollup.values[positions].T
+    colors = getattr(rollup, attribute)[positions]
+    timer.lap("lookup")
+
+    drilled = position is not None
+    path = []
+    while position is not None and position >= 0:
+        path.insert(0, f"{rollup.codes[position]} {rollup.labels[position]}")
+        position = rollup.parents[position]
+
+    if drilled:
+        # The drilled-into group is the root of the chart
+        parents[0] = ""
+    else:
+        top = rollup.levels[positions] == 1
+        ids.insert(0, HIERARCHY_ROOT)
+        parents.insert(0, "")
+        labels.insert(0, "All occupations")
+        values, men, women = (np.insert(column, 0, column[top].sum()) for column in (values, men, women))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            root_color = women[0] / values[0] * 100 if attribute == "women_share" else women[0] / men[0]
+        colors = np.insert(colors, 0, root_color)
+
+    fig = hierarchy_figure(
+        ids, parents, labels, values, men, women, colors, chart_type,
+        " › ".join(["All occupations"] + path),
+        color_title,
+        color_mid,
+        # The root and the levels below it that the subtree holds
+        maxdepth=HIERARCHY_DEPTH + 1
+    )
+    timer.lap("figure")
+    return fig
+
+
+metrics.startup_report(STARTED)
+
+
+if __name__ == '__main__':
+    app.run_server(debug=True)
@@ -0,0 +1,183 @@
+// Clientside figure builders for views whose toggles only re-sort or re-scale data
+// already in the browser. The server ships counts and per-10k values per province once,
+// sliced from the dataset's province matrix (see update_essential_services_data /
+// update_engineering_data in app.py), along with simulated bands of each estimate.
+
+// Plotly error bars for a band around the values of a series, scaled like them
+function bandErrors(band, scale) {
+    return {
+        type: 'data',
+        symmetric: false,
+        array: band.high.map(function(high, i) { return scale(high, i) - scale(band.mean[i], i); }),
+        arrayminus: band.low.map(function(low, i) { return scale(band.mean[i], i) - scale(low, i); })
+    };
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    workforce: {
+        essentialServicesFigure: function(payload, normalization, sortBy, bandsShown, template) {
+            if (!payload) {
+                return window.dash_clientside.no_update;
+            }
+
+            var normalized = normalization === 'normalized';
+            var showBands = (bandsShown || []).indexOf('bands') >= 0 && payload.series.every(function(series) {
+                return series.bands;
+            });
+            var provinces = payload.provinces;
+            var scale = function(count, i) {
+                return normalized ? count / payload.population[i] * 10000 : count;
+            };
+
+            var rows = [];
+            payload.series.forEach(function(series) {
+                var values = normalized ? series.per_10k : series.counts;
+                var errors = showBands ? bandErrors(series.bands, scale) : null;
+                values.forEach(function(value, i) {
+                    rows.push({
+                        province: provinces[i],
+                        occupation: series.name,
+                        value: showBands ? scale(series.bands.mean[i], i) : value,
+                        plus: errors ? errors.array[i] : null,
+                        minus: errors ? errors.arrayminus[i] : null
+                    });
+                });
+            });
+
+            if (sortBy === 'province') {
+                rows.sort(function(a, b) { return a.province.localeCompare(b.province); });
+            } else {
+                rows.sort(function(a, b) { return b.value - a.value; });
+            }
+
+            // One trace per province in order of first appearance, like px.bar(color='Province')
+            var traces = {};
+            var order = [];
+            rows.forEach(function(row) {
+                var trace = traces[row.province];
+                if (!trace) {
+                    trace = traces[row.province] = {
+                        type: 'bar',
+                        name: row.province,
+                        legendgroup: row.province,
+                        showlegend: true,
+                        x: [],
+                        y: [],
+                        hovertext: []
+                    };
+                    order.push(row.province);
+                }
+                trace.x.push(row.province);
+                trace.y.push(row.value);
+                trace.hovertext.push(row.occupation);
+                if (showBands) {
+                    trace.error_y = trace.error_y || {type: 'data', symmetric: false, array: [], arrayminus: []};
+                    trace.error_y.array.push(row.plus);
+                    trace.error_y.arrayminus.push(row.minus);
+                }
+            });
+
+            return {
+                data: order.map(function(province) { return traces[province]; }),
+                layout: {
+                    template: template,
+                    title: {text: 'Essential Services Personnel Distribution by Province (' + payload.title + ')' +
+                        (showBands ? ', simulated mean and 90% range' : '')},
+                    xaxis: {title: {text: 'Province/Territory'}, tickangle: -45},
+                    yaxis: {title: {text: normalized ? 'Personnel per 10,000 Population' : 'Number of Personnel'}},
+                    legend: {title: {text: 'Province/Territory'}},
+                    barmode: 'relative',
+                    height: 600
+                }
+            };
+        },
+
+        engineeringFigure: function(payload, viewType, bandsShown, template) {
+            if (!payload) {
+                return window.dash_clientside.no_update;
+            }
+
+            if (!payload.series.length) {
+                return {
+                    data: [],
+                    layout: {
+                        template: template,
+                        title: {text: 'No data matching selected engineering types'},
+                        height: 600
+                    }
+                };
+            }
+
+            var provinces = payload.provinces;
+
+            var provinceTotals = provinces.map(function(_, i) {
+                return payload.series.reduce(function(total, series) { return total + series.counts[i]; }, 0);
+            });
+
+            var yTitle;
+            var scale;
+            if (viewType === 'percentage') {
+                yTitle = 'Percentage of Total Engineers (%)';
+                scale = function(count, i) { return provinceTotals[i] ? count / provinceTotals[i] * 100 : null; };
+            } else if (viewType === 'absolute') {
+                yTitle = 'Number of Engineers';
+                scale = function(count) { return count; };
+            } else {
+                yTitle = 'Engineers per 10,000 Population';
+                scale = null;
+            }
+
+            // A share's range is not the share of the ranges, so percentages keep the plain estimate
+            var showBands = (bandsShown || []).indexOf('bands') >= 0 && viewType !== 'percentage' &&
+                payload.bands && payload.bands.length === payload.series.length;
+            var bandScale = viewType === 'absolute' ?
+                function(count) { return count; } :
+                function(count, i) { return count / payload.population[i] * 10000; };
+
+            // One trace per engineer type, like px.bar(color='EngineerType')
+            var traces = {};
+            var order = [];
+            payload.series.forEach(function(series, position) {
+                var trace = traces[series.type];
+                if (!trace) {
+                    trace = traces[series.type] = {
+                        type: 'bar',
+                        name: series.type,
+                        legendgroup: series.type,
+                        x: [],
+                        y: []
+                    };
+                    if (showBands) {
+                        trace.error_y = {type: 'data', symmetric: false, array: [], arrayminus: []};
+                    }
+                    order.push(series.type);
+                }
+                var band = showBands ? payload.bands[position] : null;
+                var errors = band ? bandErrors(band, bandScale) : null;
+                series.counts.forEach(function(count, i) {
+                    trace.x.push(provinces[i]);
+                    if (band) {
+                        trace.y.push(bandScale(band.mean[i], i));
+                        trace.error_y.array.push(errors.array[i]);
+                        trace.error_y.arrayminus.push(errors.arrayminus[i]);
+                    } else {
+                        trace.y.push(scale ? scale(count, i) : series.per_10k[i]);
+                    }
+                });
+            });
+
+            return {
+                data: order.map(function(type) { return traces[type]; }),
+                layout: {
+                    template: template,
+                    title: {text: 'Engineering Manpower by Province and Type' + (showBands ? ', simulated mean and 90% range' : '')},
+                    xaxis: {title: {text: 'Province/Territory'}, tickangle: -45},
+                    yaxis: {title: {text: yTitle}},
+                    legend: {title: {text: 'Engineer Type'}},
+                    barmode: 'group',
+                    height: 600
+                }
+            };
+        }
+    }
+});
@@ -0,0 +1,229 @@
+import argparse
+import inspect
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+# Keep benchmark runs away from the shared figure cache and the dataset watcher
+WORKDIR = tempfile.mkdtemp(prefix='dashboard-bench-')
+os.environ['FIGURE_CACHE_PATH'] = os.path.join(WORKDIR, 'figures.sqlite')
+os.environ['DATASET_POLL_INTERVAL'] = '0'
+os.environ.pop('PRECOMPUTED_DIR', None)
+# Time the callbacks themselves, not background job polling
+os.environ['BACKGROUND_CALLBACKS'] = '0'
+
+import numpy as np
+
+import app
+from dataset import DatasetManager
+from precompute import FIGURE_VIEWS, component_values, serialize
+from synthetic import scale_csv
+
+
+MAX_SINGLE_SELECTIONS = 10
+
+
+def input_grid(view, dataset, layout):
+    """
+    Every argument tuple the view's callback can receive.
+
+    The NOC multi-select cannot be enumerated, so it contributes up to
+    MAX_SINGLE_SELECTIONS evenly spaced single categories, the default
+    selection and the full category list. Only the benchmarked dataset is
+    selected in the extract dropdown.
+    """
+
+    _, _, component_ids = FIGURE_VIEWS[view]
+
+    grids = []
+    for component_id in component_ids:
+        if component_id == 'noc-dropdown':
+            categories = dataset.noc_categories()
+            step = max(1, len(categories) // MAX_SINGLE_SELECTIONS)
+            selections = [[category] for category in categories[::step][:MAX_SINGLE_SELECTIONS]]
+            selections += [app.default_noc_selection(dataset), categories]
+            grids.append([[selection] for selection in selections])
+        elif component_id == 'extract-dropdown':
+            grids.append([[app.DEFAULT_EXTRACT]])
+        else:
+            grids.append(component_values(layout, component_id))
+
+    return [
+        [value for values in combination for value in values]
+        for combination in itertools.product(*grids)
+    ]
+
+def summarize(latencies, peaks, sizes):
+
+    latencies = np.asarray(latencies) * 1000
+    return {
+        'calls': int(latencies.size),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'peak_kib': float(max(peaks) / 1024) if peaks else None,
+        'payload_kib': float(np.mean(sizes) / 1024) if sizes else None
+    }
+
+def bench_direct(view, grid, repeat):
+    """Time the undecorated callback, so neither the figure cache nor precomputed files answer."""
+
+    render = inspect.unwrap(getattr(app, FIGURE_VIEWS[view][0]))
+
+    latencies = []
+    sizes = []
+    for args in grid:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fig = render(*args)
+            latencies.append(time.perf_counter() - start)
+        sizes.append(len(serialize(fig)))
+
+    peaks = []
+    for args in grid:
+        tracemalloc.start()
+        render(*args)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return summarize(latencies, peaks, sizes)
+
+def callback_spec(view):
+    """The registered callback the view's controls drive; it may wrap the render function, e.g. to send patches."""
+
+    component_ids = FIGURE_VIEWS[view][2] + ['dataset-version']
+    for output, spec in app.app.callback_map.items():
+        if [dependency['id'] for dependency in spec['inputs']] == component_ids:
+            return output, spec
+    raise LookupError(f"No callback of {view} is registered on the app")
+
+def update_request(output, spec, args):
+
+    if output.startswith('..'):
+        outputs = [
+            dict(zip(('id', 'property'), part.rsplit('.', 1)))
+            for part in output[2:-2].split('...')
+        ]
+    else:
+        outputs = dict(zip(('id', 'property'), output.rsplit('.', 1)))
+    inputs = [
+        {'id': dependency['id'], 'property': dependency['property'], 'value': value}
+        for dependency, value in zip(spec['inputs'], args)
+    ]
+
+    # No state, so patching callbacks answer with a full render, as on first load
+    return {
+        'output': output,
+        'outputs': outputs,
+        'inputs': inputs,
+        'changedPropIds': [f"{inputs[0]['id']}.{inputs[0]['property']}"],
+        'state': [
+            {'id': dependency['id'], 'property': dependency['property'], 'value': None}
+            for dependency in spec.get('state', [])
+        ]
+    }
+
+def bench_endpoint(view, grid, repeat, cold):
+    """Drive /_dash-update-component through the Flask test client, serialization included."""
+
+    client = app.server.test_client()
+    output, spec = callback_spec(view)
+    digest = app.datasets.current().digest
+
+    bodies = [update_request(output, spec, [*args, digest]) for args in grid]
+    if not cold:
+        for body in bodies:
+            client.post('/_dash-update-component', json=body)
+
+    latencies = []
+    sizes = []
+    for body in bodies:
+        for _ in range(repeat):
+            if cold:
+                app.figure_cache.clear()
+            start = time.perf_counter()
+            response = client.post('/_dash-update-component', json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"{output} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        sizes.append(len(response.get_data()))
+
+    return summarize(latencies, [], sizes)
+
+def use_dataset(path):
+
+    app.datasets = DatasetManager(path, poll_interval=0)
+    app.figure_cache.set_version(app.datasets.current().digest)
+    return app.datasets.current()
+
+def run(scales, views, repeat, endpoint=True):
+
+    results = []
+    for scale in scales:
+        if scale == 1:
+            path = app.DATA_PATH
+        else:
+            path = scale_csv(app.DATA_PATH, scale, os.path.join(WORKDIR, f'x{scale}', 'data.csv'))
+
+        start = time.perf_counter()
+        dataset = use_dataset(path)
+        load_s = time.perf_counter() - start
+        layout = app.serve_layout(rendered=app.TABS)
+
+        for view in views:
+            grid = input_grid(view, dataset, layout)
+            modes = [('direct', lambda: bench_direct(view, grid, repeat))]
+            if endpoint:
+                modes.append(('endpoint-cold', lambda: bench_endpoint(view, grid, repeat, cold=True)))
+                modes.append(('endpoint-warm', lambda: bench_endpoint(view, grid, repeat, cold=False)))
+
+            for mode, measure in modes:
+                result = {'scale': scale, 'rows': len(dataset.df), 'load_s': load_s, 'view': view, 'mode': mode}
+                result.update(measure())
+                results.append(result)
+                print(format_row(result), flush=True)
+
+    return results
+
+HEADER = f"{'scale':>5} {'rows':>7} {'view':<20} {'mode':<14} {'calls':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak KiB':>9} {'size KiB':>9}"
+
+def format_row(result):
+
+    def fmt(value, width, digits=2):
+        return f"{value:>{width}.{digits}f}" if value is not None else f"{'-':>{width}}"
+
+    return (
+        f"{result['scale']:>5} {result['rows']:>7} {result['view']:<20} {result['mode']:<14} {result['calls']:>5} "
+        f"{fmt(result['p50_ms'], 8)} {fmt(result['p95_ms'], 8)} {fmt(result['p99_ms'], 8)} "
+        f"{fmt(result['peak_kib'], 9, 1)} {fmt(result['payload_kib'], 9, 1)}"
+    )
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard callbacks over their full input grids.")
+    parser.add_argument('--scale', type=int, action='append', help="dataset scale factors (default: 1 10 100)")
+    parser.add_argument('--view', action='append', choices=sorted(FIGURE_VIEWS), help="limit to these views")
+    parser.add_argument('--repeat', type=int, default=3, help="timed calls per input combination")
+    parser.add_argument('--no-endpoint', action='store_true', help="skip the /_dash-update-component runs")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    print(HEADER)
+    results = run(args.scale or [1, 10, 100], args.view or list(FIGURE_VIEWS), args.repeat, endpoint=not args.no_endpoint)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+import ingest
+from synthetic import scale_csv
+
+
+def damage_csv(source, target):
+    """
+    Rewrite ``source`` the way hand-edited or re-exported census files arrive:
+    labels with commas unquoted, counts unquoted without separators, CRLF line
+    ends and a byte order mark.
+    """
+
+    with open(source, newline='') as f:
+        rows = list(csv.reader(f))
+
+    with open(target, 'w', encoding='utf-8-sig', newline='') as f:
+        for position, row in enumerate(rows):
+            if position and len(row) == 4 and row[1]:
+                counts = [value.replace(',', '') for value in row[1:]] if position % 2 else [f'"{value}"' for value in row[1:]]
+                f.write(','.join([row[0], *counts]) + '\r\n')
+            else:
+                f.write(','.join(f'"{value}"' if ',' in value else value for value in row) + '\r\n')
+    return target
+
+def pandas_baseline(path):
+    """What loading was before the ingestion stage: ``read_csv`` and numeric coercion."""
+
+    df = pd.read_csv(path, thousands=',')
+    for column in ingest.COUNT_COLUMNS:
+        if df[column].dtype == object:
+            df[column] = pd.to_numeric(df[column].astype(str).str.replace(',', '').str.replace('"', ''), errors='coerce')
+    return df.dropna(subset=ingest.COUNT_COLUMNS), None
+
+def time_parser(parse, path, repeat):
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            rows, rejects = parse(path)
+        except Exception as error:
+            return {'error': f'{type(error).__name__}: {str(error).splitlines()[0]}'}
+        timings.append(time.perf_counter() - start)
+
+    seconds = float(np.median(timings))
+    return {
+        'seconds': seconds,
+        'rows': len(rows),
+        'rows_per_s': len(rows) / seconds,
+        'rejects': None if rejects is None else len(rejects)
+    }
+
+def run(scales, repeat):
+
+    workdir = tempfile.mkdtemp(prefix='dashboard-ingest-')
+    parsers = {'pandas': pandas_baseline, 'ingest': ingest.read_census_csv}
+
+    results = []
+    for scale in scales:
+        clean = scale_csv(os.path.join(ROOT, 'data.csv'), scale, os.path.join(workdir, f'x{scale}', 'data.csv'))
+        damaged = damage_csv(clean, os.path.join(workdir, f'x{scale}', 'damaged.csv'))
+        for variant, path in (('clean', clean), ('damaged', damaged)):
+            for name, parse in parsers.items():
+                results.append({'scale': scale, 'input': variant, 'parser': name, **time_parser(parse, path, repeat)})
+
+    print(f"{'scale':>5} {'input':<8} {'parser':<7} {'rows':>8} {'rejects':>7} {'s':>7} {'rows/s':>11}")
+    for result in results:
+        prefix = f"{result['scale']:>5} {result['input']:<8} {result['parser']:<7}"
+        if 'error' in result:
+            print(f"{prefix} failed: {result['error']}")
+            continue
+        rejects = '' if result['rejects'] is None else result['rejects']
+        print(f"{prefix} {result['rows']:>8} {rejects:>7} {result['seconds']:>7.3f} {result['rows_per_s']:>11,.0f}")
+
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Measure census CSV parsing throughput on synthetic extracts.")
+    parser.add_argument('--scale', type=int, action='append', help="dataset scale factors (default: 1 100)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed parses per input")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.scale or [1, 100], args.repeat)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
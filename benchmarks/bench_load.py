@@ -0,0 +1,709 @@
+import argparse
+import collections
+import csv
+import gzip
+import http.client
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from synthetic import scale_csv
+
+
+DEFAULT_CONFIGS = ['1x1', '2x1', '2x4']
+DEFAULT_USERS = [1, 4, 16]
+REQUEST_TIMEOUT = 60
+READY_TIMEOUT = 300
+
+# A level whose throughput is less than this much above the previous one's marks saturation
+SATURATION_GAIN = 0.1
+# Relative throughput drop or p95 rise against a baseline that counts as a regression
+REGRESSION_TOLERANCE = 0.2
+
+SEARCH_QUERIES = ['eng', 'nurse', 'manag', 'teach', 'tech', 'police', '2123']
+
+# Scripted sessions: every one starts with a page load, then runs its steps in order.
+# ("pick", id) changes a control to another of its options, ("search", id) types
+# into a typeahead, ("tab", tab_id) opens a tab and ("poll",) is a tick of the
+# dataset version poll, which picks up reloads.
+SESSIONS = {
+    'essential-services': [
+        ('pick', 'service-type-dropdown'),
+        ('pick', 'service-type-dropdown'),
+        ('poll',),
+        ('pick', 'service-type-dropdown')
+    ],
+    'gender': [
+        ('tab', 'gender'),
+        ('pick', 'noc-dropdown'),
+        ('pick', 'chart-type-radio'),
+        ('search', 'noc-dropdown'),
+        ('pick', 'noc-dropdown'),
+        ('pick', 'gender-employment-page'),
+        ('poll',)
+    ],
+    'engineering': [
+        ('tab', 'engineering'),
+        ('pick', 'engineering-checklist'),
+        ('pick', 'engineering-checklist'),
+        ('poll',),
+        ('pick', 'engineering-checklist')
+    ],
+    'custom-insight': [
+        ('tab', 'custom-insight'),
+        ('pick', 'occupation-category-dropdown'),
+        ('pick', 'analysis-type-radio'),
+        ('pick', 'occupation-category-dropdown'),
+        ('poll',)
+    ],
+    'tour': [
+        ('pick', 'service-type-dropdown'),
+        ('tab', 'gender'),
+        ('pick', 'noc-dropdown'),
+        ('tab', 'engineering'),
+        ('pick', 'engineering-checklist'),
+        ('tab', 'custom-insight'),
+        ('pick', 'analysis-type-radio'),
+        ('tab', 'hierarchy'),
+        ('poll',)
+    ]
+}
+
+
+def parse_config(config):
+    """``(workers, threads)`` of a ``<workers>x<threads>`` gunicorn config; None for ``inprocess``."""
+
+    if config == 'inprocess':
+        return None
+    workers, _, threads = config.partition('x')
+    return int(workers), int(threads or 1)
+
+def free_port():
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def revise_csv(source, target, revision):
+    """
+    Write ``source`` to ``target`` with a trailing note naming ``revision``.
+
+    The note changes the dataset digest, so every worker reloads, without
+    changing any occupation the views show.
+    """
+
+    with open(source, newline='') as f:
+        rows = list(csv.reader(f))
+
+    partial = f'{target}.tmp'
+    with open(partial, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerows(rows)
+        writer.writerow([f'Load test revision {revision}', '', '', ''])
+    # Replaced in one step, so a worker never reads half a file
+    os.replace(partial, target)
+
+def server_env(workdir, reload_every):
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])),
+        DATASET_POLL_INTERVAL='1' if reload_every else '0',
+        FIGURE_CACHE_PATH=os.path.join(workdir, 'figures.sqlite'),
+        BACKGROUND_CACHE_PATH=os.path.join(workdir, 'jobs')
+    )
+    env.pop('PRECOMPUTED_DIR', None)
+    return env
+
+
+def wait_ready(port, process=None):
+
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with {process.returncode} before it was ready")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/_dash-layout')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server on port {port} not ready after {READY_TIMEOUT}s")
+
+def start_gunicorn(workdir, workers, threads, reload_every):
+    """Run ``app:server`` under gunicorn with the repository's config; returns ``(port, stop)``."""
+
+    port = free_port()
+    command = [
+        sys.executable, '-m', 'gunicorn',
+        '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--threads', str(threads),
+        '--log-level', 'warning',
+        'app:server'
+    ]
+    log = open(os.path.join(workdir, 'gunicorn.log'), 'w')
+    process = subprocess.Popen(
+        command, cwd=workdir, env=server_env(workdir, reload_every), stdout=log, stderr=subprocess.STDOUT
+    )
+
+    def stop():
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+
+    try:
+        wait_ready(port, process)
+    except Exception:
+        stop()
+        raise
+    return port, stop
+
+def start_inprocess(workdir, reload_every):
+    """
+    Serve ``app.server`` from a thread of this process with werkzeug's threaded server.
+
+    Quick to start and easy to profile, but the load generator shares the GIL
+    with the app, so use gunicorn configs for sizing. The app is imported
+    once, so a run can have only one in-process config.
+    """
+
+    from werkzeug.serving import make_server
+
+    # One line per request would drown the report
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    os.environ.update(server_env(workdir, reload_every))
+    os.chdir(workdir)
+    import app
+
+    port = free_port()
+    server = make_server('127.0.0.1', port, app.server, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True)
+    thread.start()
+    wait_ready(port)
+
+    def stop():
+        server.shutdown()
+        app.datasets.stop()
+
+    return port, stop
+
+
+def collect_props(node, props, ids=None):
+    """Record the props of every component with an id in a layout (sub)tree, as the browser holds them."""
+
+    if isinstance(node, list):
+        for child in node:
+            collect_props(child, props, ids)
+    elif isinstance(node, dict) and 'props' in node:
+        component_props = node['props']
+        component_id = component_props.get('id')
+        if isinstance(component_id, str):
+            if ids is not None:
+                ids.add(component_id)
+            for name, value in component_props.items():
+                if name not in ('id', 'children'):
+                    props[(component_id, name)] = value
+        collect_props(component_props.get('children'), props, ids)
+    return props
+
+def split_outputs(output):
+    """``[(id, property), ...]`` of a callback's output string."""
+
+    parts = output[2:-2].split('...') if output.startswith('..') else [output]
+    return [tuple(part.rsplit('.', 1)) for part in parts]
+
+def option_values(options):
+
+    return [option['value'] if isinstance(option, dict) else option for option in options or []]
+
+
+class Callback:
+    """A server callback from ``/_dash-dependencies``, named in reports by its first output."""
+
+    def __init__(self, spec):
+        self.output = spec['output']
+        self.outputs = split_outputs(self.output)
+        self.name = '.'.join(self.outputs[0]) + (f' (+{len(self.outputs) - 1})' if len(self.outputs) > 1 else '')
+        self.inputs = [(dependency['id'], dependency['property']) for dependency in spec['inputs']]
+        self.state = [(dependency['id'], dependency['property']) for dependency in spec['state']]
+        self.prevent_initial_call = spec.get('prevent_initial_call', False)
+        self.poll_interval = (spec.get('long') or {}).get('interval', 1000) / 1000
+
+    def body(self, props, changed):
+
+        outputs = [{'id': component_id, 'property': prop} for component_id, prop in self.outputs]
+        return {
+            'output': self.output,
+            'outputs': outputs if self.output.startswith('..') else outputs[0],
+            'inputs': [
+                {'id': component_id, 'property': prop, 'value': props.get((component_id, prop))}
+                for component_id, prop in self.inputs
+            ],
+            'changedPropIds': [f'{component_id}.{prop}' for component_id, prop in changed],
+            'state': [
+                {'id': component_id, 'property': prop, 'value': props.get((component_id, prop))}
+                for component_id, prop in self.state
+            ]
+        }
+
+
+class Browser:
+    """
+    One simulated user: a keep-alive connection and the component props a browser tab would hold.
+
+    Changing a prop fires every server callback with it as an input, and the
+    props those callbacks return fire the next ones, in dependency order, as
+    the Dash renderer does. Clientside callbacks are skipped. Each callback
+    records one sample, background jobs including their polling.
+    """
+
+    def __init__(self, port, callbacks, rng):
+        self.port = port
+        self.callbacks = callbacks
+        self.rng = rng
+        self.conn = None
+        self.props = {}
+        self.ids = set()
+        # Callbacks whose components are on the page, so their first call has happened
+        self.initialized = set()
+        self.samples = []
+        self.requests = 0
+
+    def request(self, method, path, body=None):
+
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=REQUEST_TIMEOUT)
+        headers = {'Accept-Encoding': 'gzip'}
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        self.requests += 1
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+        if response.getheader('Content-Encoding') == 'gzip':
+            data = gzip.decompress(data)
+        return response.status, data
+
+    def timed(self, name, func):
+        """Run one request (or a background job's requests) as a ``(name, started, seconds, error, requests)`` sample."""
+
+        started, start, requests = time.time(), time.perf_counter(), self.requests
+        try:
+            error = func()
+        except (OSError, http.client.HTTPException, ValueError) as exc:
+            error = type(exc).__name__
+        self.samples.append((name, started, time.perf_counter() - start, error, self.requests - requests))
+        return error is None
+
+    def load_page(self):
+        """A fresh page view: index, layout, dependencies, then the initial callbacks."""
+
+        self.props = {}
+        self.ids = set()
+        self.initialized = set()
+        layout = {}
+
+        def get(path, store=None):
+            status, data = self.request('GET', path)
+            if status != 200:
+                return f'HTTP {status}'
+            if store is not None:
+                store['layout'] = json.loads(data)
+
+        self.timed('GET /', lambda: get('/'))
+        if self.timed('GET /_dash-layout', lambda: get('/_dash-layout', layout)):
+            collect_props(layout['layout'], self.props, self.ids)
+        self.timed('GET /_dash-dependencies', lambda: get('/_dash-dependencies'))
+
+        self.run(self.newly_ready(), changed=set())
+
+    def newly_ready(self):
+        """Callbacks whose components just arrived on the page and that fire on their first render."""
+
+        ready = [
+            callback for callback in self.callbacks
+            if callback not in self.initialized and self.ready(callback)
+        ]
+        self.initialized.update(ready)
+        return [callback for callback in ready if not callback.prevent_initial_call]
+
+    def ready(self, callback):
+
+        return all(component_id in self.ids for component_id, _ in callback.inputs + callback.outputs)
+
+    def set(self, component_id, prop, value):
+
+        self.props[(component_id, prop)] = value
+        self.run(self.triggered({(component_id, prop)}), changed={(component_id, prop)})
+
+    def triggered(self, changed, source=None):
+
+        return [
+            callback for callback in self.callbacks
+            if callback is not source and self.ready(callback) and changed.intersection(callback.inputs)
+        ]
+
+    def run(self, pending, changed):
+        """Fire ``pending`` callbacks, each only once none of its inputs waits on another pending one."""
+
+        pending = list(dict.fromkeys(pending))
+        changed_by = {callback: changed for callback in pending}
+        while pending:
+            waiting = {output for callback in pending for output in callback.outputs}
+            callback = next(
+                (callback for callback in pending if not waiting.intersection(callback.inputs)), pending[0]
+            )
+            pending.remove(callback)
+            updated = self.fire(callback, changed_by.pop(callback))
+            # New components (an opened tab) fire their own callbacks, as on first render
+            added = self.newly_ready() if any(prop == 'children' for _, prop in updated) else []
+            for following in self.triggered(updated, source=callback) + added:
+                changed_by[following] = changed_by.get(following, set()) | (updated if following not in added else set())
+                if following not in pending:
+                    pending.append(following)
+
+    def fire(self, callback, changed):
+        """POST one callback (polling a background job to its result); returns the props it updated."""
+
+        body = callback.body(self.props, changed)
+        updated = set()
+
+        def post():
+            path = '/_dash-update-component'
+            while True:
+                status, data = self.request('POST', path, body)
+                if status == 204:
+                    return None
+                if status != 200:
+                    return f'HTTP {status}'
+                payload = json.loads(data)
+                if 'cacheKey' in payload and 'response' not in payload:
+                    path = f"/_dash-update-component?cacheKey={payload.get('cacheKey')}&job={payload.get('job')}"
+                if 'response' in payload:
+                    break
+                time.sleep(callback.poll_interval)
+
+            for component_id, values in payload['response'].items():
+                for prop, value in values.items():
+                    if prop == 'children':
+                        collect_props(value, self.props, self.ids)
+                    # Patched figures stay as they were; no callback reads them back
+                    if not (isinstance(value, dict) and '__dash_patch_update' in value):
+                        self.props[(component_id, prop)] = value
+                    updated.add((component_id, prop))
+
+        self.timed(callback.name, post)
+        return updated
+
+    def step(self, step):
+
+        action, *args = step
+        if action == 'tab':
+            self.set('tabs', 'active_tab', args[0])
+        elif action == 'poll':
+            self.set('dataset-poll', 'n_intervals', (self.props.get(('dataset-poll', 'n_intervals')) or 0) + 1)
+        elif action == 'search':
+            self.set(args[0], 'search_value', self.rng.choice(SEARCH_QUERIES))
+        elif action == 'pick':
+            value = self.pick(args[0])
+            if value is not None:
+                prop = 'active_page' if (args[0], 'max_value') in self.props else 'value'
+                self.set(args[0], prop, value)
+
+    def pick(self, component_id):
+        """Another value for a control: a different option, a subset for multi-value controls, or a page."""
+
+        max_value = self.props.get((component_id, 'max_value'))
+        if max_value is not None:
+            pages = [page for page in range(1, int(max_value) + 1) if page != self.props.get((component_id, 'active_page'))]
+            return self.rng.choice(pages) if pages else None
+
+        current = self.props.get((component_id, 'value'))
+        values = option_values(self.props.get((component_id, 'options')))
+        if isinstance(current, list):
+            if not values:
+                return None
+            return self.rng.sample(values, self.rng.randint(1, min(4, len(values))))
+        values = [value for value in values if value != current]
+        return self.rng.choice(values) if values else None
+
+    def session(self, steps, deadline, think):
+
+        self.load_page()
+        for step in steps:
+            if time.monotonic() >= deadline:
+                break
+            if think:
+                time.sleep(self.rng.expovariate(1 / think))
+            self.step(step)
+
+
+def user_loop(browser, deadline, think, sessions):
+
+    while time.monotonic() < deadline:
+        name = browser.rng.choice(sessions)
+        browser.session(SESSIONS[name], deadline, think)
+
+def percentiles(latencies):
+
+    latencies = np.asarray(latencies) * 1000
+    if not latencies.size:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99)}
+
+def summarize(samples, seconds):
+    """Per callback and in total: calls, throughput, tail latency and error rate of ``samples``."""
+
+    by_name = collections.defaultdict(list)
+    for name, _, latency, error, _ in samples:
+        by_name[name].append((latency, error))
+
+    def stats(entries):
+        errors = [error for _, error in entries if error is not None]
+        return {
+            'calls': len(entries),
+            'per_s': len(entries) / seconds,
+            'errors': len(errors),
+            'error_rate': len(errors) / len(entries) if entries else 0.0,
+            'error_kinds': dict(collections.Counter(errors)),
+            **percentiles([latency for latency, error in entries if error is None])
+        }
+
+    total = stats([entry for entries in by_name.values() for entry in entries])
+    total['http_per_s'] = sum(sample[4] for sample in samples) / seconds
+    return {name: stats(entries) for name, entries in sorted(by_name.items())}, total
+
+def run_level(port, callbacks, users, duration, warmup, think, sessions, seed):
+    """``users`` concurrent sessions for ``warmup + duration`` seconds; only the last ``duration`` count."""
+
+    browsers = [Browser(port, callbacks, random.Random(seed * 1000 + user)) for user in range(users)]
+    measured_from = time.time() + warmup
+    deadline = time.monotonic() + warmup + duration
+
+    threads = [
+        threading.Thread(target=user_loop, args=(browser, deadline, think, sessions), daemon=True)
+        for browser in browsers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Steps running at the deadline finish, but only what started inside the window counts
+    samples = [
+        sample for browser in browsers for sample in browser.samples
+        if measured_from <= sample[1] < measured_from + duration
+    ]
+    return summarize(samples, duration)
+
+def reload_loop(source, target, interval, stop, counter):
+
+    while not stop.wait(interval):
+        counter[0] += 1
+        revise_csv(source, target, counter[0])
+
+def fetch_callbacks(port):
+
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=REQUEST_TIMEOUT)
+    conn.request('GET', '/_dash-dependencies')
+    specs = json.loads(conn.getresponse().read())
+    return [Callback(spec) for spec in specs if not spec.get('clientside_function')]
+
+def run_config(config, source, users_levels, args):
+
+    workdir = tempfile.mkdtemp(prefix=f'dashboard-load-{config}-')
+    data_path = os.path.join(workdir, 'data.csv')
+    revise_csv(source, data_path, 0)
+
+    parsed = parse_config(config)
+    if parsed is None:
+        port, stop = start_inprocess(workdir, args.reload_every)
+    else:
+        port, stop = start_gunicorn(workdir, *parsed, args.reload_every)
+
+    results = []
+    try:
+        callbacks = fetch_callbacks(port)
+        for users in users_levels:
+            reloads = [0]
+            stop_reloads = threading.Event()
+            reloader = None
+            if args.reload_every:
+                reloader = threading.Thread(
+                    target=reload_loop, args=(source, data_path, args.reload_every, stop_reloads, reloads), daemon=True
+                )
+                reloader.start()
+
+            per_callback, total = run_level(
+                port, callbacks, users, args.duration, args.warmup, args.think, args.session or list(SESSIONS), args.seed
+            )
+            stop_reloads.set()
+            if reloader is not None:
+                reloader.join()
+
+            result = {'config': config, 'users': users, 'reloads': reloads[0], 'total': total, 'callbacks': per_callback}
+            results.append(result)
+            print(format_total(result), flush=True)
+    finally:
+        stop()
+    return results
+
+
+HEADER = (
+    f"{'config':<10} {'users':>5} {'calls':>7} {'calls/s':>8} {'http/s':>8} "
+    f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'reloads':>7}"
+)
+CALLBACK_HEADER = f"  {'callback':<42} {'calls':>6} {'calls/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+
+
+def milliseconds(value):
+
+    return f"{value:>8.1f}" if value is not None else f"{'-':>8}"
+
+def format_total(result):
+
+    total = result['total']
+    return (
+        f"{result['config']:<10} {result['users']:>5} {total['calls']:>7} {total['per_s']:>8.1f} {total['http_per_s']:>8.1f} "
+        f"{milliseconds(total['p50_ms'])} {milliseconds(total['p95_ms'])} {milliseconds(total['p99_ms'])} "
+        f"{total['error_rate']:>7.1%} {result['reloads']:>7}"
+    )
+
+def format_callbacks(result):
+
+    lines = [f"{result['config']} with {result['users']} users", CALLBACK_HEADER]
+    for name, stats in result['callbacks'].items():
+        lines.append(
+            f"  {name[:42]:<42} {stats['calls']:>6} {stats['per_s']:>8.1f} "
+            f"{milliseconds(stats['p50_ms'])} {milliseconds(stats['p95_ms'])} {milliseconds(stats['p99_ms'])} "
+            f"{stats['error_rate']:>7.1%}"
+        )
+        if stats['error_kinds']:
+            lines.append(f"    errors: {', '.join(f'{count} {kind}' for kind, count in stats['error_kinds'].items())}")
+    return '\n'.join(lines)
+
+def saturation(levels):
+    """The level after which more users stop adding throughput, and whether any later level showed it."""
+
+    best = levels[0]
+    for level in levels[1:]:
+        if level['total']['per_s'] < best['total']['per_s'] * (1 + SATURATION_GAIN):
+            return best, True
+        best = level
+    return best, False
+
+def regressions(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Levels of ``results`` whose throughput fell or p95 rose by more than ``tolerance`` against ``baseline``."""
+
+    previous = {(result['config'], result['users']): result['total'] for result in baseline}
+    found = []
+    for result in results:
+        before = previous.get((result['config'], result['users']))
+        if before is None:
+            continue
+        after = result['total']
+        label = f"{result['config']} with {result['users']} users"
+        if after['per_s'] < before['per_s'] * (1 - tolerance):
+            found.append(f"{label}: {before['per_s']:.1f} -> {after['per_s']:.1f} calls/s")
+        if before['p95_ms'] and after['p95_ms'] and after['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            found.append(f"{label}: p95 {before['p95_ms']:.1f} -> {after['p95_ms']:.1f} ms")
+        if after['error_rate'] > before['error_rate']:
+            found.append(f"{label}: error rate {before['error_rate']:.1%} -> {after['error_rate']:.1%}")
+    return found
+
+def report(results):
+
+    print()
+    for result in results:
+        print(format_callbacks(result))
+        print()
+
+    print("Saturation")
+    for config in dict.fromkeys(result['config'] for result in results):
+        levels = [result for result in results if result['config'] == config]
+        best, saturated = saturation(levels)
+        total = best['total']
+        if saturated:
+            print(f"  {config:<10} saturates at {best['users']} users: {total['per_s']:.1f} calls/s, p95 {milliseconds(total['p95_ms']).strip()} ms")
+        else:
+            print(f"  {config:<10} still scaling at {best['users']} users: {total['per_s']:.1f} calls/s")
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Replay scripted dashboard sessions against the app at rising concurrency, for each server config."
+    )
+    parser.add_argument(
+        '--config', action='append',
+        help=f"'<workers>x<threads>' under gunicorn, or 'inprocess' (default: {' '.join(DEFAULT_CONFIGS)})"
+    )
+    parser.add_argument('--users', type=int, action='append', help=f"concurrent users per level (default: {' '.join(map(str, DEFAULT_USERS))})")
+    parser.add_argument('--duration', type=float, default=20, help="measured seconds per level")
+    parser.add_argument('--warmup', type=float, default=5, help="unmeasured seconds before each level")
+    parser.add_argument('--think', type=float, default=0, help="mean think time between steps in seconds; 0 replays back to back")
+    parser.add_argument('--session', action='append', choices=sorted(SESSIONS), help="limit the replayed sessions")
+    parser.add_argument('--reload-every', type=float, default=0, help="rewrite the data file every so many seconds")
+    parser.add_argument('--scale', type=int, default=1, help="dataset scale factor")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="also write the results to this file")
+    parser.add_argument('--baseline', help="results of an earlier run to check for regressions; exits 1 on any")
+    args = parser.parse_args()
+
+    source = os.path.join(ROOT, 'data.csv')
+    if args.scale > 1:
+        source = scale_csv(source, args.scale, os.path.join(tempfile.mkdtemp(prefix='dashboard-load-'), 'data.csv'))
+
+    configs = args.config or DEFAULT_CONFIGS
+    if configs.count('inprocess') > 1:
+        parser.error("only one in-process config per run")
+
+    print(HEADER)
+    results = []
+    for config in configs:
+        results.extend(run_config(config, source, sorted(args.users or DEFAULT_USERS), args))
+    report(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f))
+        print()
+        print(f"Regressions against {args.baseline}: {len(found) or 'none'}")
+        for line in found:
+            print(f"  {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+
+PROBE = "import json, app, metrics; print(json.dumps(metrics.startup_stages()))"
+
+
+def cold_start(env, importtime=False):
+    """Import the app in a fresh interpreter: ``(wall seconds, startup stages, import log)``."""
+
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', PROBE]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    return wall, json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+def slowest_imports(log, top):
+    """Top-level modules by cumulative import time, from ``-X importtime`` output."""
+
+    modules = []
+    for line in log.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Only direct imports of the app's own modules and third-party packages, not their internals
+        if cumulative.strip().isdigit() and name.count('  ') <= 1:
+            modules.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+def run(repeat, importtime_top=0):
+
+    workdir = tempfile.mkdtemp(prefix='dashboard-startup-')
+    env = dict(
+        os.environ,
+        DATASET_POLL_INTERVAL='0',
+        FIGURE_CACHE_PATH=os.path.join(workdir, 'figures.sqlite'),
+        BACKGROUND_CACHE_PATH=os.path.join(workdir, 'jobs')
+    )
+    env.pop('PRECOMPUTED_DIR', None)
+
+    # The first run builds the dataset snapshot; later runs are the cold starts a new worker sees
+    cold_start(env)
+
+    walls, stages = [], {}
+    for _ in range(repeat):
+        wall, run_stages, _ = cold_start(env)
+        walls.append(wall)
+        for stage, seconds in run_stages.items():
+            stages.setdefault(stage, []).append(seconds)
+
+    print(f"{'stage':<16} {'p50 s':>8} {'max s':>8}")
+    print(f"{'process':<16} {np.median(walls):>8.3f} {max(walls):>8.3f}")
+    for stage, values in sorted(stages.items(), key=lambda item: -np.median(item[1])):
+        print(f"{stage:<16} {np.median(values):>8.3f} {max(values):>8.3f}")
+
+    if importtime_top:
+        _, _, log = cold_start(env, importtime=True)
+        print(f"\n{'module':<40} {'import s':>8}")
+        for seconds, name in slowest_imports(log, importtime_top):
+            print(f"{name:<40} {seconds:>8.3f}")
+
+    return {'process': walls, 'stages': stages}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Measure dashboard import-to-ready time in fresh interpreters.")
+    parser.add_argument('--repeat', type=int, default=5, help="cold starts to time")
+    parser.add_argument('--imports', type=int, default=0, metavar='N', help="also list the N slowest imports")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.repeat, importtime_top=args.imports)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
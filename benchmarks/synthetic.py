@@ -0,0 +1,32 @@
+import csv
+import os
+
+
+def scale_csv(source, factor, target):
+    """
+    Write ``target`` with every occupation row of ``source`` repeated ``factor`` times.
+
+    Copies keep their NOC code and get a ``(synthetic n)`` suffix so labels stay
+    unique; the trailing notes and footnotes are written once, as in the source.
+    """
+
+    with open(source, newline='') as f:
+        rows = list(csv.reader(f))
+
+    header, body = rows[0], rows[1:]
+    data_rows = [row for row in body if len(row) >= 4 and row[1].strip()]
+    notes = [row for row in body if not (len(row) >= 4 and row[1].strip())]
+
+    directory = os.path.dirname(os.path.abspath(target))
+    os.makedirs(directory, exist_ok=True)
+
+    with open(target, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for copy in range(factor):
+            for row in data_rows:
+                label = row[0] if copy == 0 else f'{row[0]} (synthetic {copy})'
+                writer.writerow([label, *row[1:]])
+        writer.writerows(notes)
+
+    return target
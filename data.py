@@ -0,0 +1,272 @@
+import numpy as np
+import pandas as pd
+
+import ingest
+from ingest import COUNT_COLUMNS
+from keyword_matcher import KeywordMatrix
+import metrics
+from noc_index import NocIndex
+from search_index import SearchIndex
+from snapshot import load_or_build
+
+
+CHUNK_SIZE = 100_000
+
+INT32_MAX = np.iinfo(np.int32).max
+
+
+def clean_data(filepath):
+    """The occupation rows of a census CSV; the lines that are not are logged."""
+
+    df, rejects = ingest.read_census_csv(filepath, CHUNK_SIZE)
+    ingest.log_rejects(filepath, rejects)
+    return df
+
+def clean_chunks(filepath, chunksize=CHUNK_SIZE):
+    """Yield the cleaned rows of ``filepath`` ``chunksize`` source lines at a time."""
+
+    for df, rejects in ingest.read_chunks(filepath, chunksize):
+        ingest.log_rejects(filepath, rejects)
+        yield df
+
+def compact_counts(values):
+
+    values = values.to_numpy()
+    if np.all(values == np.round(values)) and np.abs(values).max(initial=0) <= INT32_MAX:
+        return values.astype(np.int32)
+    return values.astype(np.float64)
+
+def compact_frame(df):
+    """
+    The cleaned frame with categorical labels, footnotes and kinds, int32 counts and integer NOC code and level columns.
+
+    Apart from the label categories nothing is a Python object, so forked
+    workers reading the frame do not touch refcounts and keep sharing pages.
+    """
+
+    labels = df['Occupation'].astype(str)
+    codes = labels.str.extract(r'^(\d{1,5})\s', expand=False)
+
+    compact = pd.DataFrame({
+        'Occupation': pd.Categorical(labels),
+        # '0' and '00' share an integer code; Level tells them apart
+        'Code': codes.fillna(-1).astype(np.int32),
+        'Level': codes.str.len().fillna(0).astype(np.int8),
+        # Frames from the extract store carry neither; their labels are clean already
+        'Footnotes': pd.Categorical(df['Footnotes'] if 'Footnotes' in df else np.full(len(df), '')),
+        'Kind': pd.Categorical(df['Kind'] if 'Kind' in df else ingest.classify(labels), categories=ingest.KINDS)
+    })
+    for col in COUNT_COLUMNS:
+        compact[col] = compact_counts(df[col])
+
+    return compact
+
+ESSENTIAL_SERVICES = [
+    'Police officers', 
+    'Firefighters',
+    'Registered nurses'
+]
+
+ENGINEERING_OCCUPATIONS = [
+    'Computer engineers', 
+    'Mechanical engineers',
+    'Electrical and electronics engineers'
+]
+
+def build_noc_index(df):
+
+    return NocIndex(df['Occupation'])
+
+def build_keyword_matrix(df):
+
+    occupations = df['Occupation'].array
+    # Totals and other aggregates belong to no category, whatever their labels say
+    codes = np.where(df['Kind'].to_numpy() == ingest.OCCUPATION, occupations.codes, -1)
+    return KeywordMatrix(occupations.categories, codes, categories=filter_categories())
+
+def essential_services_rows(keyword_matrix):
+
+    return keyword_matrix.rows(['essential_services'])
+
+def noc_top_level_rows(noc_index):
+
+    return np.asarray([
+        row for row in noc_index.level_rows(1)
+        if noc_index.labels[row][2:3].isalpha()
+    ], dtype=np.intp)
+
+def engineering_rows(keyword_matrix):
+
+    return keyword_matrix.rows(['engineering'])
+
+
+# Selections behind each dashboard view, shared by the callbacks and the export API.
+# They take a dataset.Dataset and return row positions into its frame.
+
+SERVICE_KEYWORDS = {
+    "police": ['Police'],
+    "fire": ['Fire'],
+    "nurse": ['Nurse']
+}
+
+ENGINEERING_TYPES = ["computer", "mechanical", "electrical"]
+
+CATEGORY_FILTERS = {
+    "business": ["Business", "finance", "administration"],
+    "science": ["Natural", "applied sciences", "engineering"],
+    "health": ["Health", "nurse", "medical"],
+    "education": ["Education", "law", "social"],
+    "art": ["Art", "culture", "recreation"]
+}
+
+def filter_categories():
+    """Every built-in filter as a named keyword category of the keyword matrix."""
+
+    categories = {
+        'essential_services': ESSENTIAL_SERVICES,
+        'engineering': ENGINEERING_OCCUPATIONS
+    }
+    categories.update({f'service:{name}': keywords for name, keywords in SERVICE_KEYWORDS.items()})
+    categories.update({f'engineering:{name}': [name.title()] for name in ENGINEERING_TYPES})
+    categories.update({f'category:{name}': keywords for name, keywords in CATEGORY_FILTERS.items()})
+    return categories
+
+def default_noc_selection(dataset):
+
+    return dataset.noc_categories()[:3]
+
+def select_essential_services(dataset, service_type):
+    """``(service_type, rows)``; unknown service types select all essential services."""
+
+    if service_type in SERVICE_KEYWORDS:
+        return service_type, dataset.keyword_matrix.rows(
+            all_of=[f'service:{service_type}'], within=dataset.essential_services_rows
+        )
+    return "all", dataset.essential_services_rows
+
+def select_occupations(dataset, selected):
+
+    return dataset.label_rows(None, selected or default_noc_selection(dataset))
+
+def select_engineering(dataset, selected_types):
+
+    selected_types = selected_types or ENGINEERING_TYPES
+    types = [engineer_type for engineer_type in ENGINEERING_TYPES if engineer_type in selected_types] or ["computer"]
+    return dataset.keyword_matrix.rows(
+        any_of=[f'engineering:{engineer_type}' for engineer_type in types],
+        within=dataset.engineering_rows
+    )
+
+def engineer_type(label):
+
+    return "Computer" if "Computer" in label else "Mechanical" if "Mechanical" in label else "Electrical"
+
+def select_category(dataset, category, pinned=None, custom_categories=None):
+    """
+    ``(category, rows, pinned_rows)``; pinned occupations are kept apart from the category's own rows.
+
+    ``custom_categories`` maps user-defined category names to keyword lists;
+    their keywords are indexed the first time they are used.
+    """
+
+    custom_categories = custom_categories or {}
+    if category in custom_categories:
+        rows = dataset.keyword_matrix.rows(keywords=custom_categories[category])
+    else:
+        if category not in CATEGORY_FILTERS:
+            category = "business"
+        rows = dataset.keyword_matrix.rows([f'category:{category}'])
+
+    pinned_rows = dataset.label_rows(None, pinned or [])
+    return category, np.setdiff1d(rows, pinned_rows), pinned_rows
+
+def get_province_data():
+
+    provinces = {
+        'Alberta': {'Population': 3375130	},
+        'British Columbia': {'Population': 4200425},
+        'Manitoba': {'Population': 1058410},
+        'New Brunswick': {'Population': 648250},
+        'Newfoundland and Labrador': {'Population': 433955},
+        'Northwest Territories': {'Population': 31915},
+        'Nova Scotia': {'Population': 31915},
+        'Nunavut': {'Population': 24540},
+        'Ontario': {'Population': 11782825},
+        'Prince Edward Island': {'Population': 126900},
+        'Quebec': {'Population': 93585},
+        'Saskatchewan': {'Population': 882760},
+        'Yukon': {'Population': 32775}
+    }
+    
+    return provinces
+
+def build_indexes(df):
+
+    with metrics.startup_stage('noc_index'):
+        noc_index = build_noc_index(df)
+    with metrics.startup_stage('keyword_matrix'):
+        keyword_matrix = build_keyword_matrix(df)
+
+    return noc_index, keyword_matrix
+
+def derive_subsets(noc_index, keyword_matrix):
+
+    return {
+        'essential_services': essential_services_rows(keyword_matrix),
+        'noc_top_level': noc_top_level_rows(noc_index),
+        'engineering': engineering_rows(keyword_matrix)
+    }
+
+def build_indexed_tables(filepath):
+
+    with metrics.startup_stage('clean_data'):
+        df = compact_frame(clean_data(filepath))
+    indexes = build_indexes(df)
+    with metrics.startup_stage('derived_subsets'):
+        subsets = derive_subsets(*indexes)
+
+    return df, subsets, indexes
+
+def build_tables(filepath):
+
+    df, subsets, _ = build_indexed_tables(filepath)
+    return df, subsets
+
+def assemble_tables(df, subsets, version, indexes=None):
+
+    noc_index, keyword_matrix = indexes or build_indexes(df)
+    with metrics.startup_stage('search_index'):
+        search_index = SearchIndex(df['Occupation'], df['Code'], df['Level'])
+
+    # Subsets stay row positions into df rather than copies of it
+    return (
+        df,
+        noc_index,
+        search_index,
+        keyword_matrix,
+        subsets['essential_services'],
+        subsets['noc_top_level'],
+        subsets['engineering'],
+        version
+    )
+
+def load_tables(filepath):
+
+    built = {}
+
+    def build(source):
+        df, subsets, built['indexes'] = build_indexed_tables(source)
+        return df, subsets
+
+    with metrics.startup_stage('load_snapshot'):
+        df, subsets, version = load_or_build(filepath, build)
+
+    # The snapshot keeps label categories and codes as written, so indexes of the frame it was written from apply
+    return assemble_tables(df, subsets, version, built.get('indexes'))
+
+def tables_from_frame(df, version):
+    """Tables for a cleaned frame that did not come from a snapshot (e.g. an extract store query)."""
+
+    df = compact_frame(df.reset_index(drop=True))
+    indexes = build_indexes(df)
+    return assemble_tables(df, derive_subsets(*indexes), version, indexes)
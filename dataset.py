@@ -0,0 +1,270 @@
+import collections
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from data import load_tables, tables_from_frame
+from province_matrix import build_province_matrix
+from rollup import build_rollup
+from snapshot import file_digest, source_fingerprint
+
+
+logger = logging.getLogger(__name__)
+
+
+class Dataset:
+    """
+    One immutable generation of the cleaned data and everything derived from it.
+
+    Callbacks take a reference once per request and use only that, so a
+    reload swapping in a newer generation never mixes data mid-request.
+    """
+
+    __slots__ = (
+        'source', 'digest', 'generation', 'loaded_at',
+        'df', 'noc_index', 'search_index', 'essential_services_rows', 'noc_top_level_rows', 'engineering_rows',
+        'keyword_matrix', 'province_matrix', 'rollup'
+    )
+
+    def __init__(self, source, generation, tables=None, province_table=None):
+        tables = tables or load_tables(source)
+        set_attr = object.__setattr__
+
+        set_attr(self, 'source', source)
+        set_attr(self, 'generation', generation)
+        set_attr(self, 'loaded_at', time.time())
+        for name, value in zip(
+            (
+                'df', 'noc_index', 'search_index', 'keyword_matrix',
+                'essential_services_rows', 'noc_top_level_rows', 'engineering_rows', 'digest'
+            ),
+            tables
+        ):
+            set_attr(self, name, value)
+
+        set_attr(self, 'province_matrix', build_province_matrix(
+            self.df, self.noc_index, self.engineering_rows, table_path=province_table
+        ))
+        set_attr(self, 'rollup', build_rollup(self.df, self.noc_index))
+        if province_table:
+            # Cached province views depend on the table too
+            set_attr(self, 'digest', f"{self.digest}-p{file_digest(province_table)[:8]}")
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Dataset is immutable, cannot set {name!r}")
+
+    @property
+    def version(self):
+        return self.digest
+
+    def noc_categories(self):
+        return self.df['Occupation'].iloc[self.noc_top_level_rows].unique().tolist()
+
+    def label_rows(self, rows, labels):
+        """The subset of ``rows`` (all rows for None) whose label is one of ``labels``, compared on category codes."""
+
+        column = self.df['Occupation'].array
+        if rows is None:
+            return np.flatnonzero(np.isin(column.codes, column.categories.get_indexer(labels)))
+        return rows[np.isin(column.codes[rows], column.categories.get_indexer(labels))]
+
+    def search(self, query, limit):
+        return [self.search_index.labels[row] for row in self.search_index.search(query, limit)]
+
+    def __repr__(self):
+        return f'Dataset({self.source!r}, digest={self.digest!r}, generation={self.generation})'
+
+
+def extract_digest(extract):
+
+    return f"{extract['digest']}-e{extract['id']}"
+
+def extract_id(extract):
+    """The store id ``extract`` names, or None when it is not an integer."""
+
+    try:
+        return int(extract)
+    except (TypeError, ValueError):
+        return None
+
+
+class DatasetManager:
+    """
+    Owns the current ``Dataset`` and swaps in a rebuilt one when the source changes.
+
+    A daemon thread polls the source's size and mtime; rebuilding happens on
+    that thread and the swap is a single reference assignment. Listeners
+    registered with ``subscribe`` run after every swap.
+
+    Extracts from an ``ExtractStore`` are loaded whole, on demand, by ``get``
+    and kept in a small LRU, so a worker holds at most ``cache_size`` of them
+    no matter how many the store contains; concurrent first requests for an
+    extract wait for a single build. The store's extract list is read once
+    and re-read only after an ingest changes the store file. Observed
+    province counts from ``province_table`` apply to the source dataset only.
+    """
+
+    def __init__(self, source, poll_interval=5.0, store=None, cache_size=4, province_table=None):
+        self.source = source
+        self.poll_interval = poll_interval
+        self.province_table = province_table
+        self.store = store
+        self.cache_size = cache_size
+        self._extracts = collections.OrderedDict()
+        self._extract_metadata = None
+        self._store_fingerprint = None
+        self._builds = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._current = Dataset(source, generation=1, province_table=province_table)
+        self._fingerprint = source_fingerprint(source)
+        self._watcher = None
+        self._watcher_pid = None
+        self._stop = threading.Event()
+
+    def current(self):
+        if self._watcher is not None and self._watcher_pid != os.getpid():
+            # Threads do not survive a fork (gunicorn preload), so restart the watcher in the worker
+            self._start_watcher()
+        return self._current
+
+    def extracts(self):
+        return list(self._extract_table().values())
+
+    def _extract_table(self):
+        # Store rows by id, read once and kept until an ingest changes the store file
+        self._refresh_extracts()
+        table = self._extract_metadata
+        if table is None and self.store is not None:
+            table = {extract['id']: extract for extract in self.store.extracts()}
+            self._extract_metadata = table
+        return table or {}
+
+    def has_extract(self, extract):
+        """Whether ``get`` would serve ``extract`` itself rather than fall back to the source dataset."""
+
+        if extract in (None, 'default'):
+            return True
+        return self._metadata(extract) is not None
+
+    def _metadata(self, extract):
+
+        return self._extract_table().get(extract_id(extract))
+
+    def get(self, extract=None):
+        """
+        The dataset for a store extract id, or the current source dataset for None/"default".
+
+        Ids that are malformed or not in the store also get the source dataset.
+        """
+
+        if extract in (None, 'default'):
+            return self.current()
+
+        metadata = self._metadata(extract)
+        if metadata is None:
+            return self.current()
+
+        key = extract_digest(metadata)
+        with self._lock:
+            dataset = self._cached_extract(key)
+            if dataset is not None:
+                return dataset
+            build = self._builds.setdefault(key, threading.Lock())
+
+        with build:
+            with self._lock:
+                dataset = self._cached_extract(key)
+            if dataset is not None:
+                return dataset
+
+            try:
+                source = f"{self.store.path}#{metadata['year']}/{metadata['geography']}"
+                dataset = Dataset(source, generation=1, tables=tables_from_frame(self.store.frame(metadata['id']), key))
+            finally:
+                with self._lock:
+                    self._builds.pop(key, None)
+                    if dataset is not None:
+                        self._extracts[key] = dataset
+                        while len(self._extracts) > self.cache_size:
+                            self._extracts.popitem(last=False)
+        return dataset
+
+    def _cached_extract(self, key):
+
+        dataset = self._extracts.get(key)
+        if dataset is not None:
+            self._extracts.move_to_end(key)
+        return dataset
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+        listener(self._current)
+
+    def reload(self, force=False):
+        """Rebuild from the source if it changed on disk; returns True when a new dataset was swapped in."""
+
+        self._refresh_extracts(force)
+        with self._lock:
+            try:
+                fingerprint = source_fingerprint(self.source)
+            except OSError:
+                logger.exception("Dataset source %s is not readable, keeping %r", self.source, self._current)
+                return False
+
+            if not force and fingerprint == self._fingerprint:
+                return False
+
+            try:
+                dataset = Dataset(
+                    self.source, generation=self._current.generation + 1, province_table=self.province_table
+                )
+            except Exception:
+                logger.exception("Rebuilding dataset from %s failed, keeping %r", self.source, self._current)
+                return False
+
+            self._fingerprint = fingerprint
+            if dataset.digest == self._current.digest and not force:
+                return False
+
+            self._current = dataset
+
+        logger.info("Swapped in %r", dataset)
+        for listener in self._listeners:
+            listener(dataset)
+        return True
+
+    def _refresh_extracts(self, force=False):
+        """Forget the cached extract metadata when the store has been ingested into since it was read."""
+
+        if self.store is None:
+            return
+        try:
+            fingerprint = self.store.fingerprint()
+        except OSError:
+            logger.exception("Extract store %s is not readable", self.store.path)
+            return
+        if force or fingerprint != self._store_fingerprint:
+            self._store_fingerprint = fingerprint
+            self._extract_metadata = None
+
+    def start(self):
+        if self.poll_interval and self.poll_interval > 0:
+            self._start_watcher()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _start_watcher(self):
+        self._stop.clear()
+        self._watcher_pid = os.getpid()
+        self._watcher = threading.Thread(target=self._watch, name='dataset-watcher', daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload()
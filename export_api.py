@@ -0,0 +1,223 @@
+import hashlib
+import importlib.util
+import io
+
+import numpy as np
+import pandas as pd
+
+from data import (
+    engineer_type,
+    select_category,
+    select_engineering,
+    select_essential_services,
+    select_occupations
+)
+
+
+# Occupations per streamed chunk; province views emit one row per province for each
+CHUNK_ROWS = 10_000
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+
+def code_strings(codes, levels):
+    """NOC codes as zero-padded strings, empty for rows without a code."""
+
+    return np.array([
+        f'{code:0{level}d}' if level > 0 else ''
+        for code, level in zip(codes.tolist(), levels.tolist())
+    ], dtype=object)
+
+def occupation_columns(dataset, rows):
+
+    subset = dataset.df.iloc[rows]
+    return {
+        'Occupation': subset['Occupation'].astype(str).to_numpy(),
+        'Code': code_strings(subset['Code'].to_numpy(), subset['Level'].to_numpy())
+    }
+
+def province_frame(dataset, rows, group):
+    """Long ``Province x Occupation`` frame of the province matrix at ``rows``."""
+
+    matrix = dataset.province_matrix
+    columns = occupation_columns(dataset, rows)
+    n_provinces = len(matrix.names)
+
+    return pd.DataFrame({
+        'Group': np.repeat(np.asarray(group, dtype=object), n_provinces),
+        'Occupation': np.repeat(columns['Occupation'], n_provinces),
+        'Code': np.repeat(columns['Code'], n_provinces),
+        'Province': np.tile(matrix.names, len(rows)),
+        'Count': matrix.counts[rows].ravel(),
+        'Population': np.tile(matrix.population, len(rows)),
+        'Per10K': matrix.per_10k[rows].ravel(),
+        'Estimated': matrix.estimated[rows].ravel()
+    })
+
+def gender_frame(dataset, rows, group):
+
+    subset = dataset.df.iloc[rows]
+    total = subset['Total'].to_numpy()
+    women = subset['Women'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        women_share = women / total * 100
+
+    return pd.DataFrame({
+        'Group': group,
+        **occupation_columns(dataset, rows),
+        'Total': total,
+        'Men': subset['Men'].to_numpy(),
+        'Women': women,
+        'WomenShare': women_share
+    })
+
+def parity_frame(dataset, rows, group):
+
+    frame = gender_frame(dataset, rows, group)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frame['ParityIndex'] = frame['Women'].to_numpy() / frame['Men'].to_numpy()
+    return frame
+
+
+# Each view turns query arguments into ``(rows, groups)`` with the same
+# selection functions as the dashboard callbacks, and rows into a frame
+def essential_services_selection(dataset, args):
+
+    service_type, rows = select_essential_services(dataset, args.get('service'))
+    # The chart shows each occupation once
+    labels = dataset.df['Occupation'].to_numpy()[rows]
+    _, first = np.unique(labels, return_index=True)
+    rows = rows[np.sort(first)]
+    return rows, np.full(len(rows), service_type, dtype=object)
+
+def gender_selection(dataset, args):
+
+    rows = select_occupations(dataset, args.getlist('noc'))
+    return rows, np.full(len(rows), 'selected', dtype=object)
+
+def engineering_selection(dataset, args):
+
+    rows = select_engineering(dataset, args.getlist('types'))
+    labels = dataset.df['Occupation'].to_numpy()[rows]
+    return rows, np.array([engineer_type(str(label)) for label in labels], dtype=object)
+
+def parity_selection(dataset, args):
+
+    category, keywords = args.get('category'), args.getlist('keywords')
+    custom_categories = None
+    if keywords:
+        # ``keywords`` defines the category on the fly, as a user-defined category does in the dashboard
+        category = category or 'custom'
+        custom_categories = {category: keywords}
+
+    category, rows, pinned_rows = select_category(dataset, category, args.getlist('pinned'), custom_categories)
+    groups = np.array([category] * len(rows) + ['pinned'] * len(pinned_rows), dtype=object)
+    return np.concatenate([rows, pinned_rows]).astype(np.intp), groups
+
+
+VIEWS = {
+    'essential-services': (essential_services_selection, province_frame, ['service']),
+    'gender': (gender_selection, gender_frame, ['noc']),
+    'engineering': (engineering_selection, province_frame, ['types']),
+    'parity': (parity_selection, parity_frame, ['category', 'pinned', 'keywords'])
+}
+
+
+def frame_chunks(dataset, view, args, chunk_rows=CHUNK_ROWS):
+    """Yield the export of ``view`` as frames of at most ``chunk_rows`` occupations."""
+
+    select, build, _ = VIEWS[view]
+    rows, groups = select(dataset, args)
+    rows = np.asarray(rows, dtype=np.intp)
+
+    # An empty selection still yields one frame, so the header is written
+    for start in range(0, max(len(rows), 1), chunk_rows):
+        yield build(dataset, rows[start:start + chunk_rows], groups[start:start + chunk_rows])
+
+def csv_stream(chunks):
+
+    for position, chunk in enumerate(chunks):
+        yield chunk.to_csv(index=False, header=position == 0)
+
+def arrow_stream(chunks):
+    """Arrow IPC stream of ``chunks``, one record batch each; pyarrow is imported lazily."""
+
+    import pyarrow as pa
+
+    sink = io.BytesIO()
+    writer = None
+    for chunk in chunks:
+        batch = pa.RecordBatch.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, batch.schema)
+        writer.write_batch(batch)
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    if writer is not None:
+        writer.close()
+        yield sink.getvalue()
+
+def arrow_available():
+
+    return importlib.util.find_spec('pyarrow') is not None
+
+def export_etag(dataset, view, fmt, args):
+    """Entity tag of an export: the dataset version plus the normalized query."""
+
+    params = sorted((key, sorted(args.getlist(key))) for key in VIEWS[view][2] + ['extract'])
+    return hashlib.sha1(repr((dataset.digest, view, fmt, params)).encode()).hexdigest()
+
+
+def init_app(server, datasets, prefix='/api/export'):
+    """
+    Register the export routes on ``server``.
+
+    ``GET <prefix>/<view>.<csv|arrow>`` streams the numbers behind a chart,
+    selected by the same query values as the dashboard controls. Responses
+    carry an ETag of the dataset version and query, so a repeat request with
+    ``If-None-Match`` gets an empty 304 until the data is reloaded.
+    """
+
+    from flask import Response, jsonify, request, stream_with_context
+
+    @server.route(prefix)
+    def export_index():
+        return jsonify({
+            'formats': sorted(FORMATS),
+            'views': {view: params + ['extract'] for view, (_, _, params) in VIEWS.items()},
+            'extracts': [extract['id'] for extract in datasets.extracts()]
+        })
+
+    @server.route(f'{prefix}/<view>.<fmt>')
+    def export_view(view, fmt):
+        if view not in VIEWS or fmt not in FORMATS:
+            return jsonify({'error': f'unknown export {view}.{fmt}'}), 404
+        if fmt == 'arrow' and not arrow_available():
+            return jsonify({'error': 'Arrow export requires pyarrow'}), 406
+
+        extract = request.args.get('extract')
+        if not datasets.has_extract(extract):
+            return jsonify({'error': f'unknown extract {extract}'}), 404
+
+        dataset = datasets.get(extract)
+        etag = export_etag(dataset, view, fmt, request.args)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            chunks = frame_chunks(dataset, view, request.args)
+            stream = csv_stream(chunks) if fmt == 'csv' else arrow_stream(chunks)
+            response = Response(stream_with_context(stream), mimetype=FORMATS[fmt])
+            response.headers['Content-Disposition'] = (
+                f'attachment; filename="{view}-{dataset.digest[:12]}.{fmt}"'
+            )
+
+        response.set_etag(etag)
+        # Clients may keep exports but must revalidate, which is the cheap 304
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    return server
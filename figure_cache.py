@@ -0,0 +1,159 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from figures import serialize
+import metrics
+
+
+DEFAULT_PATH = os.path.join('.cache', 'figures.sqlite')
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Seconds between last_used updates of an entry; each update takes SQLite's write lock
+TOUCH_INTERVAL = 60
+
+
+class FigureCache:
+    """
+    Serialized figure JSON keyed on callback inputs and dataset version.
+
+    Entries live in a SQLite file on local disk so every gunicorn worker on
+    the host shares them; eviction is least-recently-used, bounded by entry
+    count and total payload bytes.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = None
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS figures (
+                    key TEXT PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS figures_last_used ON figures (last_used)")
+
+    def _connect(self):
+        # sqlite connections must not cross a fork, so keep one per process and thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def make_key(self, name, inputs):
+
+        raw = json.dumps([name, self.version, inputs], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get(self, key):
+
+        conn = self._connect()
+        row = conn.execute("SELECT payload, last_used FROM figures WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        payload, last_used = row
+        now = time.time()
+        # LRU order only needs to be roughly right, so most hits stay read-only
+        if now - last_used > TOUCH_INTERVAL:
+            conn.execute("UPDATE figures SET last_used = ? WHERE key = ?", (now, key))
+        return payload
+
+    def set(self, key, payload):
+
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO figures (key, version, payload, size, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, self.version or '', payload, len(payload), time.time())
+        )
+        self._evict(conn)
+
+    def _evict(self, conn):
+
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM figures").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        freed = 0
+        removed = 0
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM figures ORDER BY last_used"):
+            if count - removed <= self.max_entries and total - freed <= self.max_bytes:
+                break
+            stale.append((key,))
+            removed += 1
+            freed += size
+        conn.executemany("DELETE FROM figures WHERE key = ?", stale)
+
+    def set_version(self, version):
+        """Switch to a new dataset version and drop figures built from any other."""
+
+        self.version = version
+        self._connect().execute("DELETE FROM figures WHERE version != ?", (version,))
+
+    def clear(self):
+
+        self._connect().execute("DELETE FROM figures")
+
+    def cached(self, name, normalize=None):
+        """
+        Decorate a figure callback so identical normalized inputs are served from the cache.
+
+        ``normalize`` maps the raw callback arguments to a JSON-able value that is
+        equal for inputs which render the same figure. A hit skips building the
+        figure, not serializing it: Dash wants the figure back as objects, so
+        the stored JSON is parsed and Dash serializes it again.
+        """
+
+        def decorator(func):
+
+            @functools.wraps(func)
+            def wrapper(*args):
+                inputs = normalize(*args) if normalize else list(args)
+                key = self.make_key(name, inputs)
+
+                payload = self.get(key)
+                if payload is not None:
+                    metrics.cache_lookups.inc(callback=name, cache='figure', result='hit')
+                    return json.loads(payload)
+                metrics.cache_lookups.inc(callback=name, cache='figure', result='miss')
+
+                fig = func(*args)
+                timer = metrics.PhaseTimer(name)
+                payload = serialize(fig)
+                timer.lap('serialize')
+                self.set(key, payload)
+                timer.lap('cache_store')
+                return fig
+
+            return wrapper
+
+        return decorator
+
+
+def figure_cache_from_env():
+
+    return FigureCache(
+        path=os.environ.get('FIGURE_CACHE_PATH', DEFAULT_PATH),
+        max_entries=int(os.environ.get('FIGURE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)),
+        max_bytes=int(os.environ.get('FIGURE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+    )
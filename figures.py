@@ -0,0 +1,244 @@
+import functools
+import json
+import os
+
+import numpy as np
+
+
+DEFAULT_DECIMALS = 4
+DEFAULT_HEIGHT = 600
+# Bars a chart of a selection shows at most; the rest are summed into one "Other" bar
+RENDER_BUDGET = int(os.environ.get('RENDER_BUDGET', 30))
+OTHER_LABEL = "Other"
+
+# The parts of the default plotly template a 2D bar chart actually uses
+TEMPLATE_LAYOUT_KEYS = (
+    'autotypenumbers', 'colorway', 'font', 'hoverlabel', 'hovermode',
+    'paper_bgcolor', 'plot_bgcolor', 'shapedefaults', 'title', 'xaxis', 'yaxis'
+)
+
+
+@functools.lru_cache(maxsize=None)
+def lean_template(name='plotly'):
+    """
+    Bar-chart subset of a plotly template.
+
+    Full templates carry defaults for every trace type and ship with every
+    figure; this keeps the look of the default template at a fraction of
+    the payload. Built on first use, so importing this module does not load plotly.
+    """
+
+    import plotly.io as pio
+
+    template = pio.templates[name].to_plotly_json()
+    return {
+        'layout': {key: template['layout'][key] for key in TEMPLATE_LAYOUT_KEYS if key in template['layout']},
+        'data': {'bar': template['data'].get('bar', [])}
+    }
+
+
+def compact_values(values, decimals=DEFAULT_DECIMALS):
+    """
+    Plain JSON list for a numeric array: ints stay ints, floats are rounded, NaN becomes null.
+
+    The bundled plotly.js predates typed-array (``bdata``) support, so rounding
+    is what keeps float arrays short on the wire.
+    """
+
+    array = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(array)
+
+    if finite.all() and np.array_equal(array, np.round(array)):
+        return array.astype(np.int64).tolist()
+
+    rounded = np.round(array, decimals).astype(object)
+    rounded[~finite] = None
+    return rounded.tolist()
+
+def bar(x, y, name=None, decimals=DEFAULT_DECIMALS, **attrs):
+
+    trace = {'type': 'bar', 'x': list(x), 'y': compact_values(y, decimals)}
+    if name is not None:
+        trace.update(name=name, legendgroup=name, showlegend=True)
+    trace.update(attrs)
+    return trace
+
+def grouped_bars(groups, x, y, decimals=DEFAULT_DECIMALS):
+    """One bar trace per distinct group label, in order of first appearance (as ``px.bar(color=...)``)."""
+
+    groups = np.asarray(groups, dtype=object)
+    x = np.asarray(x, dtype=object)
+    y = np.asarray(y, dtype=np.float64)
+
+    labels, first = np.unique(groups, return_index=True)
+    return [
+        bar(x[groups == label], y[groups == label], name=label, decimals=decimals)
+        for label in labels[np.argsort(first)]
+    ]
+
+def reference_line(y, n_categories, color="red"):
+
+    return {
+        'type': 'line', 'x0': -0.5, 'y0': y, 'x1': n_categories - 0.5, 'y1': y,
+        'line': {'color': color, 'width': 2, 'dash': 'dash'}
+    }
+
+def figure(traces, title, x_title=None, y_title=None, legend_title=None, height=DEFAULT_HEIGHT, **layout):
+    """A figure dict ready for dcc.Graph, without graph_objects validation."""
+
+    base = {
+        'template': lean_template(),
+        'title': {'text': title},
+        'height': height
+    }
+    if x_title is not None:
+        base['xaxis'] = {'title': {'text': x_title}}
+    if y_title is not None:
+        base['yaxis'] = {'title': {'text': y_title}}
+    if legend_title is not None:
+        base['legend'] = {'title': {'text': legend_title}}
+
+    for key, value in layout.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            base[key] = {**base[key], **value}
+        else:
+            base[key] = value
+
+    return {'data': list(traces), 'layout': base}
+
+def page_count(n, limit=RENDER_BUDGET):
+
+    return max(1, -(-n // limit))
+
+def top_n(values, limit=RENDER_BUDGET, page=1):
+    """
+    ``(shown, rest, page)``: positions of the ``page``-th ``limit`` largest ``values`` and of all the others.
+
+    Both are in their original order and NaN ranks last. ``page`` is clamped
+    to the pages there are; with ``limit`` values or fewer all are shown.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    page = min(max(page or 1, 1), page_count(len(values), limit))
+    if len(values) <= limit:
+        return np.arange(len(values)), np.empty(0, dtype=np.intp), page
+
+    # Stable, so ties keep their original order on every page
+    ranked = np.argsort(np.where(np.isnan(values), np.inf, -values), kind='stable')
+    shown = np.zeros(len(values), dtype=bool)
+    shown[ranked[(page - 1) * limit:page * limit]] = True
+    return np.flatnonzero(shown), np.flatnonzero(~shown), page
+
+def with_other(labels, columns, shown, rest, label=OTHER_LABEL):
+    """
+    ``labels`` and each of ``columns`` at ``shown``, plus one entry summing the columns over ``rest``.
+
+    Nothing is added when ``rest`` is empty.
+    """
+
+    labels = [labels[position] for position in shown.tolist()]
+    columns = [np.asarray(column, dtype=np.float64) for column in columns]
+    if not len(rest):
+        return labels, [column[shown] for column in columns]
+
+    return (
+        labels + [f"{label} ({len(rest)})"],
+        [np.append(column[shown], np.nansum(column[rest])) for column in columns]
+    )
+
+def sequence_edits(old_keys, new_keys):
+    """
+    ``(removed, inserted)`` positions that turn a list keyed by ``old_keys`` into one keyed by ``new_keys``.
+
+    Deleting ``removed`` (highest first) from the old list and then inserting
+    the new items at ``inserted`` (lowest first) gives the new list, provided
+    the keys both lists share are in the same order, as sorted row positions are.
+    """
+
+    old_set, new_set = set(old_keys), set(new_keys)
+    removed = [position for position, key in enumerate(old_keys) if key not in new_set]
+    inserted = [position for position, key in enumerate(new_keys) if key not in old_set]
+    return removed[::-1], inserted
+
+def patch_sequence(target, removed, inserted, items):
+    """Apply ``sequence_edits`` to ``target``, a ``dash.Patch`` of a list; ``items`` go to ``inserted``."""
+
+    for position in removed:
+        del target[position]
+    for position, item in zip(inserted, items):
+        target.insert(position, item)
+
+def gender_figure(labels, men, women, chart_type):
+    """Employment by gender for NOC categories: stacked/grouped Men and Women bars, or the Men/Women ratio."""
+
+    labels = list(labels)
+
+    if chart_type == "ratio":
+        men = np.asarray(men, dtype=np.float64)
+        women = np.asarray(women, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = men / women
+
+        return figure(
+            [bar([label], [value], name=label) for label, value in zip(labels, ratio)],
+            'Gender Ratio in NOC Categories',
+            x_title='NOC Category',
+            y_title='Men/Women Ratio',
+            legend_title='Occupation',
+            barmode='relative',
+            shapes=[reference_line(1, len(labels))]
+        )
+
+    return figure(
+        [bar(labels, men, name='Men'), bar(labels, women, name='Women')],
+        'Employment by Gender in NOC Categories',
+        x_title='NOC Category',
+        y_title='Number of Employed Persons',
+        legend_title='Gender',
+        barmode=chart_type if chart_type in ['stack', 'group'] else 'stack'
+    )
+
+def hierarchy_figure(
+    ids, parents, labels, values, men, women, colors, chart_type, title, color_title, color_mid, maxdepth=-1
+):
+    """
+    Treemap or sunburst of a NOC subtree, coloured by a gender measure.
+
+    ``values`` must already add up from the leaves (``branchvalues='total'``),
+    otherwise plotly drops the inconsistent branches. The chart is pinned to
+    its first id as root, so a browser-side click zoom never outlives the
+    server's drill-down figure.
+    """
+
+    trace = {
+        'type': chart_type if chart_type in ['treemap', 'sunburst'] else 'treemap',
+        'ids': list(ids),
+        'parents': list(parents),
+        'labels': list(labels),
+        'values': compact_values(values, 0),
+        'branchvalues': 'total',
+        'level': ids[0] if len(ids) else '',
+        'maxdepth': maxdepth,
+        'customdata': list(zip(compact_values(men, 0), compact_values(women, 0), compact_values(colors, 3))),
+        'marker': {
+            'colors': compact_values(colors, 3),
+            'colorscale': 'RdBu',
+            'cmid': color_mid,
+            'colorbar': {'title': {'text': color_title}}
+        },
+        'hovertemplate': (
+            '<b>%{label}</b><br>NOC %{id}<br>Total: %{value:,}<br>Men: %{customdata[0]:,}<br>'
+            f'Women: %{{customdata[1]:,}}<br>{color_title}: %{{customdata[2]}}<extra></extra>'
+        )
+    }
+    return figure([trace], title, margin={'t': 60, 'l': 10, 'r': 10, 'b': 10})
+
+def serialize(fig):
+    """JSON text of a figure dict or plotly figure; plotly is only imported here, when first needed."""
+
+    from plotly.utils import PlotlyJSONEncoder
+
+    if hasattr(fig, 'to_plotly_json'):
+        import plotly.io as pio
+        return pio.to_json(fig, validate=False)
+    return json.dumps(fig, cls=PlotlyJSONEncoder)
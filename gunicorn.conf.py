@@ -0,0 +1,19 @@
+import gc
+import multiprocessing
+import os
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8050')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+wsgi_app = 'app:server'
+
+# Load the dataset once in the master; workers share its pages copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    # Objects created while preloading move to a generation the collector never
+    # scans, so garbage collection in the workers does not write to shared pages
+    gc.collect()
+    gc.freeze()
+    server.log.info("Froze %d objects from the preloaded app", gc.get_freeze_count())
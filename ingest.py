@@ -0,0 +1,271 @@
+import argparse
+import csv
+import io
+import itertools
+import logging
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from noc_index import CODE_PATTERN
+
+
+logger = logging.getLogger(__name__)
+
+COUNT_COLUMNS = ['Total', 'Men', 'Women']
+FIELDS = 1 + len(COUNT_COLUMNS)
+
+# Census footnote references trail the label: "All occupations 14"
+FOOTNOTE_PATTERN = re.compile(r'^(.*[^\d\s])\s+(\d{1,3}(?:\s+\d{1,3})*)$')
+
+OCCUPATION = 'occupation'
+TOTAL = 'total'
+NOT_APPLICABLE = 'not_applicable'
+AGGREGATE = 'aggregate'
+KINDS = [OCCUPATION, TOTAL, NOT_APPLICABLE, AGGREGATE]
+
+TOTAL_PATTERN = re.compile(r'^(?:all occupations|total)\b', re.IGNORECASE)
+NOT_APPLICABLE_PATTERN = re.compile(r'\bnot applicable\b', re.IGNORECASE)
+
+ROW_COLUMNS = ['Occupation', *COUNT_COLUMNS, 'Footnotes', 'Kind']
+REJECT_COLUMNS = ['line', 'reason', 'text']
+
+# Lines of a label and three plain numbers, each bare or wholly quoted, which the pandas C parser
+# reads as is. Matching a run of them at once is far cheaper than testing line by line. Any other
+# line (split labels, stray quotes, notes, suppressed counts, blank) goes through ``repair_lines``
+LABEL = r'(?:"[^"\r\n]*"|[^",\r\n]*)'
+COUNT = r'(?:"[\d,.\-]*"|[\d.\-]*)'
+WELL_FORMED_RUN = re.compile(f'(?:{LABEL}(?:,{COUNT}){{{FIELDS - 1}}}\n)*')
+# Stands in for a broken line, so the parsed rows stay aligned with the lines
+PLACEHOLDER = ',' * (FIELDS - 1) + '\n'
+
+
+def label_kind(label):
+    """
+    A NOC ``occupation``, the ``total`` over all occupations, the
+    ``not_applicable`` population, or some other ``aggregate`` row.
+    """
+
+    if CODE_PATTERN.match(label):
+        return OCCUPATION
+    if TOTAL_PATTERN.search(label):
+        return TOTAL
+    if NOT_APPLICABLE_PATTERN.search(label):
+        return NOT_APPLICABLE
+    return AGGREGATE
+
+def classify(labels):
+
+    # Nearly every label has a NOC code, so test for that inline before the other patterns
+    code = CODE_PATTERN.match
+    return [OCCUPATION if code(label) else label_kind(label) for label in labels]
+
+def split_footnotes(labels):
+    """``(labels, footnotes)`` arrays with trailing footnote numbers moved out of the labels."""
+
+    labels = np.array(labels, dtype=object)
+    footnotes = np.full(len(labels), '', dtype=object)
+    # Most labels end in a letter; only the rest need the pattern
+    for position in [position for position, label in enumerate(labels.tolist()) if label[-1:].isdigit()]:
+        match = FOOTNOTE_PATTERN.match(labels[position])
+        if match:
+            labels[position], footnotes[position] = match.groups()
+    return labels, footnotes
+
+def parse_count(text):
+    """A count with optional thousands separators; NaN for suppressed or missing values."""
+
+    try:
+        return float(text.replace(',', ''))
+    except ValueError:
+        return np.nan
+
+def split_fields(fields):
+    """
+    ``[label, total, men, women]`` from the fields of a data line, or None.
+
+    The counts are always the last three fields, so any fields left of them
+    are pieces of a label that was split at its commas.
+    """
+
+    if len(fields) < FIELDS:
+        return None
+    if len(fields) > FIELDS:
+        return [','.join(fields[:1 - FIELDS]), *fields[1 - FIELDS:]]
+    return fields
+
+def parse_well_formed(text):
+    """Labels and counts of every line of ``text``, parsed in one pass of the pandas C parser."""
+
+    frame = pd.read_csv(
+        io.StringIO(text),
+        header=None,
+        names=['Occupation', *COUNT_COLUMNS],
+        dtype={'Occupation': str},
+        thousands=',',
+        keep_default_na=False,
+        na_values={column: [''] for column in COUNT_COLUMNS},
+        engine='c'
+    )
+
+    counts = np.empty((len(frame), len(COUNT_COLUMNS)))
+    for position, column in enumerate(COUNT_COLUMNS):
+        values = frame[column]
+        if values.dtype == object:
+            # Shapes ``COUNT`` lets through that the C parser does not take as numbers, such as a lone '-'
+            values = [parse_count(value) if isinstance(value, str) else value for value in values]
+        counts[:, position] = values
+    return np.array([label.strip() for label in frame['Occupation'].tolist()], dtype=object), counts
+
+def repair_lines(lines, rejects):
+    """
+    ``(numbers, texts, labels, counts)`` of the ``(number, line)`` pairs that
+    are not well formed; lines beyond repair are appended to ``rejects``.
+    """
+
+    balanced = []
+    for number, line in lines:
+        if not line.strip():
+            continue
+        if line.count('"') % 2:
+            if not line.startswith('"'):
+                rejects.append((number, 'unbalanced quote', line))
+                continue
+            # The opening quote of a label that was never closed
+            line = line[1:]
+        balanced.append((number, line))
+
+    numbers, texts, records = [], [], []
+    # With balanced quotes no quoted field runs on into the next line, so one reader parses them all
+    for (number, line), fields in zip(balanced, csv.reader(line for _, line in balanced)):
+        fields = split_fields(fields)
+        if fields is None:
+            rejects.append((number, f'fewer than {FIELDS} fields', line))
+        else:
+            numbers.append(number)
+            texts.append(line)
+            records.append(fields)
+
+    labels, *columns = zip(*records) if records else [()] * FIELDS
+    labels = np.array([label.strip().strip('"').strip() for label in labels], dtype=object)
+    counts = np.array([[parse_count(value) for value in column] for column in columns], dtype=np.float64)
+    return numbers, texts, labels, counts.reshape(len(COUNT_COLUMNS), len(labels)).T
+
+def parse_lines(lines, first_line=1):
+    """
+    Parse census CSV data lines into ``(rows, rejects)``.
+
+    ``rows`` has the cleaned label, the counts as floats, the footnote numbers
+    stripped from the label and the kind of row. ``rejects`` lists the lines that
+    are not occupation rows (notes, footnote text, suppressed counts) with the
+    reason and their 1-based line number, counting from ``first_line``.
+    """
+
+    if not lines:
+        return pd.DataFrame(columns=ROW_COLUMNS), pd.DataFrame(columns=REJECT_COLUMNS)
+
+    text = '\n'.join(line.rstrip('\r\n') for line in lines) + '\n'
+    well_formed = np.ones(len(lines), dtype=bool)
+    pieces, broken, start, line = [], [], 0, 0
+    while True:
+        end = WELL_FORMED_RUN.match(text, start).end()
+        pieces.append(text[start:end])
+        if end == len(text):
+            break
+        line += text.count('\n', start, end)
+        start = text.index('\n', end) + 1
+        well_formed[line] = False
+        broken.append((first_line + line, text[end:start - 1]))
+        pieces.append(PLACEHOLDER)
+        line += 1
+
+    rejects = []
+    labels, counts = parse_well_formed(''.join(pieces))
+    repaired_numbers, repaired_texts, repaired_labels, repaired_counts = repair_lines(broken, rejects)
+
+    positions = np.flatnonzero(well_formed)
+    numbers = np.concatenate([positions + first_line, np.array(repaired_numbers, dtype=np.int64)])
+    texts = np.concatenate([np.array(lines, dtype=object)[positions], np.array(repaired_texts, dtype=object)])
+    labels = np.concatenate([labels[positions], repaired_labels])
+    counts = np.concatenate([counts[positions], repaired_counts])
+    order = np.argsort(numbers, kind='stable')
+    numbers, texts, labels, counts = numbers[order], texts[order], labels[order], counts[order]
+
+    missing = np.isnan(counts).sum(axis=1)
+    reasons = np.select(
+        [missing == len(COUNT_COLUMNS), missing > 0, labels == ''],
+        ['no counts', 'non-numeric count', 'empty label'],
+        ''
+    )
+    keep = reasons == ''
+    rejects.extend(
+        (int(numbers[position]), reasons[position], texts[position].rstrip('\r\n'))
+        for position in np.flatnonzero(~keep).tolist()
+    )
+
+    labels, footnotes = split_footnotes(labels[keep])
+    rows = pd.DataFrame(counts[keep], columns=COUNT_COLUMNS)
+    rows.insert(0, 'Occupation', labels)
+    rows['Footnotes'] = footnotes
+    rows['Kind'] = classify(labels)
+    rejects = pd.DataFrame(sorted(rejects), columns=REJECT_COLUMNS)
+    return rows, rejects
+
+def read_chunks(filepath, chunksize):
+    """Yield ``(rows, rejects)`` for ``filepath`` ``chunksize`` lines at a time, after the header."""
+
+    # utf-8-sig drops the byte order mark StatCan downloads start with
+    with open(filepath, encoding='utf-8-sig', errors='replace', newline='') as f:
+        next(f, None)
+        line = 2
+        while True:
+            lines = list(itertools.islice(f, chunksize))
+            if not lines:
+                break
+            yield parse_lines(lines, first_line=line)
+            line += len(lines)
+
+def read_census_csv(filepath, chunksize=100_000):
+    """The whole of ``filepath`` as ``(rows, rejects)``."""
+
+    chunks = list(read_chunks(filepath, chunksize))
+    if not chunks:
+        return parse_lines([])
+    rows, rejects = zip(*chunks)
+    return pd.concat(rows, ignore_index=True), pd.concat(rejects, ignore_index=True)
+
+def log_rejects(filepath, rejects):
+
+    if len(rejects):
+        reasons = rejects['reason'].value_counts()
+        logger.info(
+            "Skipped %d non-occupation lines of %s (%s)",
+            len(rejects), filepath, ', '.join(f"{count} {reason}" for reason, count in reasons.items())
+        )
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Parse a census occupation CSV and report the lines it rejects.")
+    parser.add_argument('source', nargs='?', default='data.csv')
+    parser.add_argument('--rejects', help="write the rejected lines to this CSV")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows, rejects = read_census_csv(args.source)
+    elapsed = time.perf_counter() - start
+
+    kinds = rows['Kind'].value_counts()
+    print(f"Parsed {len(rows)} rows in {elapsed:.2f}s ({len(rows) / elapsed:,.0f} rows/s): "
+          + ', '.join(f"{kinds.get(kind, 0)} {kind}" for kind in KINDS))
+    print(f"Rejected {len(rejects)} lines")
+    for reason, count in rejects['reason'].value_counts().items():
+        print(f"  {count:>6}  {reason}")
+    if args.rejects:
+        rejects.to_csv(args.rejects, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+import functools
+import os
+
+from dash import DiskcacheManager
+
+import metrics
+
+
+DEFAULT_PATH = os.path.join('.cache', 'jobs')
+# Seconds a finished result stays reusable after its last use
+DEFAULT_RESULT_TTL = 3600
+# Milliseconds between the browser's polls for a job's result; Dash defaults to a second,
+# which every call would wait at least once, cached results included
+DEFAULT_POLL_INTERVAL = 150
+
+# Job ids meaning "served from the result cache, no process started"
+NO_JOB = (None, 0, '0', 'None')
+
+# Set inside a background job process only; each job runs in its own process
+_progress = None
+_job_key = None
+
+
+class ReusingDiskcacheManager(DiskcacheManager):
+    """
+    DiskcacheManager that does not start a job when the result is already cached.
+
+    Dash starts a process for every request and only then finds the cached
+    result; here a cached key returns no job and the first poll gets the result.
+
+    Metrics observed in a job are stored next to its result and replayed in
+    the worker that delivers it, so ``/metrics`` of the web processes covers
+    background callbacks too.
+    """
+
+    def make_job_fn(self, fn, progress, key=None):
+
+        cache = self.handle
+        expire = self.expire
+
+        @functools.wraps(fn)
+        def recorded(*args, **kwargs):
+            with metrics.recording() as observations:
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    # Stored before the result, so the poll that finds the result finds these too
+                    cache.set(_metrics_key(_job_key), observations, expire=expire)
+
+        job_fn = super().make_job_fn(recorded, progress, key)
+
+        def job(result_key, *args):
+            global _job_key
+            _job_key = result_key
+            job_fn(result_key, *args)
+
+        job.callback_name = getattr(fn, 'callback_name', None)
+        return job
+
+    def call_job_fn(self, key, job_fn, args, context):
+        name = getattr(job_fn, 'callback_name', None)
+        if self.cache_by is not None and self.result_ready(key):
+            if name is not None:
+                metrics.callback_calls.inc(callback=name)
+                metrics.cache_lookups.inc(callback=name, cache='background', result='hit')
+            return None
+        if name is not None:
+            metrics.cache_lookups.inc(callback=name, cache='background', result='miss')
+        return super().call_job_fn(key, job_fn, args, context)
+
+    def get_result(self, key, job):
+        result = super().get_result(key, job)
+        if result is not self.UNDEFINED:
+            observations = self.handle.pop(_metrics_key(key), None)
+            if observations:
+                metrics.registry.replay(observations)
+        return result
+
+    def terminate_job(self, job):
+        # psutil reports pid 0 as existing; never signal it
+        if job in NO_JOB:
+            return
+        super().terminate_job(job)
+
+    def job_running(self, job):
+        return job not in NO_JOB and super().job_running(job)
+
+
+def _metrics_key(key):
+
+    return f'{key}-metrics'
+
+def background_manager_from_env(cache_by=None):
+    """
+    Disk-backed manager for Dash background callbacks, or None to run them in the request.
+
+    Jobs run in separate processes and results are kept in a diskcache
+    directory, so finished results are reused for identical inputs (and equal
+    ``cache_by`` values) by every worker on the host. BACKGROUND_CALLBACKS=0,
+    or a missing ``diskcache``, falls back to ordinary callbacks.
+    """
+
+    if os.environ.get('BACKGROUND_CALLBACKS', '1') == '0':
+        return None
+    try:
+        import diskcache
+    except ImportError:
+        return None
+
+    cache = diskcache.Cache(os.environ.get('BACKGROUND_CACHE_PATH', DEFAULT_PATH))
+    return ReusingDiskcacheManager(
+        cache,
+        cache_by=cache_by,
+        expire=int(os.environ.get('BACKGROUND_RESULT_TTL', DEFAULT_RESULT_TTL))
+    )
+
+def report_progress(done, total):
+    """Publish progress of the running background job; a no-op in ordinary callbacks."""
+
+    if _progress is not None:
+        _progress([done, total])
+
+def _with_progress(func):
+
+    @functools.wraps(func)
+    def job(set_progress, *args):
+        global _progress
+        _progress = set_progress
+        try:
+            return func(*args)
+        finally:
+            _progress = None
+
+    return job
+
+def callback(
+    app, manager, *dependencies, progress=None, cancel=None, running=None, interval=DEFAULT_POLL_INTERVAL, **kwargs
+):
+    """
+    ``app.callback`` that runs as a background job when ``manager`` is set.
+
+    ``progress`` outputs receive ``[done, total]`` from ``report_progress``;
+    the browser polls for the result every ``interval`` milliseconds.
+    Without a manager the callback is registered as usual and the background
+    options are ignored. The undecorated function is returned either way.
+    """
+
+    def decorator(func):
+        if manager is None:
+            app.callback(*dependencies, **kwargs)(func)
+            return func
+
+        app.callback(
+            *dependencies,
+            background=True,
+            manager=manager,
+            progress=progress,
+            cancel=cancel,
+            running=running,
+            interval=interval,
+            **kwargs
+        )(_with_progress(func) if progress else func)
+        return func
+
+    return decorator
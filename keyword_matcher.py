@@ -0,0 +1,179 @@
+import collections
+import threading
+
+import numpy as np
+
+
+# Keyword sets whose per-label hits are kept; user-defined categories can add any number
+HITS_CACHE_SIZE = 256
+
+
+def normalize_keyword(keyword):
+
+    return ' '.join(str(keyword).lower().split())
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a set of keywords.
+
+    One left-to-right pass over a text finds every keyword in it, however many
+    keywords there are. Matching is case-insensitive and a keyword only counts
+    when it starts a word, so "law" finds "lawyers" but not "outlaw". The fail
+    links are folded into full transition tables, so each character costs one
+    dict lookup.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = [normalize_keyword(keyword) for keyword in keywords]
+        goto = [{}]
+        fail = [0]
+        self.output = [()]
+
+        for keyword_id, keyword in enumerate(self.keywords):
+            state = 0
+            for character in keyword:
+                following = goto[state].get(character)
+                if following is None:
+                    following = len(goto)
+                    goto.append({})
+                    fail.append(0)
+                    self.output.append(())
+                    goto[state][character] = following
+                state = following
+            self.output[state] += (keyword_id,)
+
+        # Breadth-first, so the fail state's transitions are complete before they are copied
+        self.transitions = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = collections.deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self.transitions[state] = {**self.transitions[fail[state]], **goto[state]}
+            for character, following in goto[state].items():
+                fail[following] = self.transitions[fail[state]].get(character, 0)
+                self.output[following] += self.output[fail[following]]
+                queue.append(following)
+
+    def scan(self, texts):
+        """Boolean ``texts x keywords`` matrix of which keywords occur in which texts."""
+
+        hits = np.zeros((len(texts), len(self.keywords)), dtype=bool)
+        if not self.keywords:
+            return hits
+
+        transitions, output = self.transitions, self.output
+        lengths = [len(keyword) for keyword in self.keywords]
+        for text_id, text in enumerate(texts):
+            text = text.lower()
+            state = 0
+            for end, character in enumerate(text):
+                state = transitions[state].get(character, 0)
+                for keyword_id in output[state]:
+                    start = end - lengths[keyword_id] + 1
+                    if start == 0 or not text[start - 1].isalnum():
+                        hits[text_id, keyword_id] = True
+        return hits
+
+
+class KeywordMatrix:
+    """
+    Which occupation labels contain which filter keywords, as packed bits.
+
+    Labels are matched once per distinct label (the categories of the
+    Occupation column), so repeated labels cost nothing. A named category is a
+    bit mask over the keyword columns: a label is in the category when
+    ``bits & mask`` is non-zero, and combining categories is AND/OR over those
+    tests. Keywords outside the indexed vocabulary, such as those of
+    user-defined categories, are scanned when queried and never become
+    columns, so the matrix does not grow with what users type; only their
+    per-label hits are cached, in a bounded cache.
+    """
+
+    def __init__(self, labels, codes, keywords=(), categories=None):
+        self.labels = [str(label) for label in labels]
+        self.codes = np.asarray(codes)
+        self.categories = {}
+        self.lock = threading.Lock()
+        self._hits = {}
+        # Swapped as one tuple, so readers never see columns and bits out of step
+        self._state = ({}, np.zeros((len(self.labels), 0), dtype=np.uint8))
+
+        categories = categories or {}
+        # One scan for the whole built-in vocabulary
+        self.add_keywords([*keywords, *(keyword for group in categories.values() for keyword in group)])
+        for name, category_keywords in categories.items():
+            self.define(name, category_keywords)
+
+    @property
+    def keywords(self):
+        columns, _ = self._state
+        return sorted(columns, key=columns.get)
+
+    def add_keywords(self, keywords):
+        """Index ``keywords``, scanning the labels only for those not indexed already."""
+
+        with self.lock:
+            columns, bits = self._state
+            new = list(dict.fromkeys(
+                keyword for keyword in map(normalize_keyword, keywords) if keyword and keyword not in columns
+            ))
+            if not new:
+                return
+
+            hits = KeywordMatcher(new).scan(self.labels)
+            matrix = np.hstack([np.unpackbits(bits, axis=1, count=len(columns), bitorder='little'), hits])
+            columns = {**columns, **{keyword: len(columns) + offset for offset, keyword in enumerate(new)}}
+            self._state = (columns, np.packbits(matrix, axis=1, bitorder='little'))
+
+    def mask(self, keywords):
+        """Packed mask of the indexed ``keywords``, the bits it applies to, and the keywords not indexed."""
+
+        columns, bits = self._state
+        keywords = list(filter(None, map(normalize_keyword, keywords)))
+        selected = np.zeros(bits.shape[1] * 8, dtype=bool)
+        selected[[columns[keyword] for keyword in keywords if keyword in columns]] = True
+        return np.packbits(selected, bitorder='little'), bits, [keyword for keyword in keywords if keyword not in columns]
+
+    def define(self, name, keywords):
+        self.add_keywords(keywords)
+        self.categories[name] = [normalize_keyword(keyword) for keyword in keywords]
+
+    def label_hits(self, keywords):
+        """Per distinct label: does it contain any of ``keywords``."""
+
+        key = frozenset(filter(None, map(normalize_keyword, keywords)))
+        hits = self._hits.get(key)
+        if hits is None:
+            mask, bits, unindexed = self.mask(key)
+            hits = (bits & mask).any(axis=1)
+            if unindexed:
+                hits |= KeywordMatcher(unindexed).scan(self.labels).any(axis=1)
+            # Hits of a keyword never change, since the labels never do
+            if len(self._hits) >= HITS_CACHE_SIZE:
+                self._hits.clear()
+            self._hits[key] = hits
+        return hits
+
+    def rows(self, any_of=(), all_of=(), keywords=(), within=None):
+        """
+        Row positions in any of the ``any_of`` categories and in every ``all_of`` category.
+
+        ``keywords`` is an unnamed category of its own, combined with ``any_of``.
+        With ``within``, only those row positions are tested, which is cheaper
+        than testing every row when narrowing an existing subset.
+        """
+
+        groups = [self.categories[name] for name in any_of] + ([list(keywords)] if keywords else [])
+        hits = self.label_hits([keyword for group in groups for keyword in group]) if groups else None
+        for name in all_of:
+            category_hits = self.label_hits(self.categories[name])
+            hits = category_hits if hits is None else hits & category_hits
+
+        if hits is None:
+            return np.empty(0, dtype=np.intp)
+        # A trailing False for the -1 code of missing labels
+        hits = np.append(hits, False)
+        if within is not None:
+            within = np.asarray(within, dtype=np.intp)
+            return within[hits[self.codes[within]]]
+        return np.flatnonzero(hits[self.codes])
@@ -0,0 +1,275 @@
+import bisect
+import contextlib
+import functools
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds; chosen around the latencies the benchmark suite reports for callbacks
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Observations made while ``recording`` is active, to be replayed in another process
+_recorded = None
+
+
+def _format_labels(names, values, extra=()):
+
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    escaped = (
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+class Counter:
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        if _recorded is not None:
+            _recorded.append((self.name, 'inc', amount, labels))
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, key, (), value
+
+
+class Gauge(Counter):
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+        if _recorded is not None:
+            _recorded.append((self.name, 'set', value, labels))
+
+
+class Histogram:
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+        if _recorded is not None:
+            _recorded.append((self.name, 'observe', value, labels))
+
+    def samples(self):
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', key, (('le', bound),), cumulative
+            yield f'{self.name}_sum', key, (), total
+            yield f'{self.name}_count', key, (), count
+
+
+class Registry:
+    """
+    Metrics for this process, rendered in the Prometheus text format.
+
+    Every gunicorn worker keeps its own registry; samples carry a ``pid``
+    label so scrapes of different workers can be told apart.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def replay(self, observations):
+        """Apply observations captured by ``recording``, typically in a background job process."""
+
+        by_name = {metric.name: metric for metric in self._metrics}
+        for name, method, value, labels in observations:
+            getattr(by_name[name], method)(value, **labels)
+
+    def render(self):
+        pid = (('pid', os.getpid()),)
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, key, extra, value in metric.samples():
+                lines.append(f'{name}{_format_labels(metric.labelnames, key, (*extra, *pid))} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+callback_seconds = registry.histogram(
+    'dashboard_callback_seconds', "Wall time of a callback including cache lookups.", ['callback']
+)
+callback_phase_seconds = registry.histogram(
+    'dashboard_callback_phase_seconds', "Wall time of one phase of a callback.", ['callback', 'phase']
+)
+callback_calls = registry.counter(
+    'dashboard_callback_calls_total', "Callback invocations.", ['callback']
+)
+callback_errors = registry.counter(
+    'dashboard_callback_errors_total', "Callback invocations that raised.", ['callback']
+)
+cache_lookups = registry.counter(
+    'dashboard_cache_lookups_total', "Figure cache and precomputed-file lookups by result.", ['callback', 'cache', 'result']
+)
+figure_updates = registry.counter(
+    'dashboard_figure_updates_total', "Figure outputs sent whole or as a Patch of the previous one.", ['callback', 'update']
+)
+request_seconds = registry.histogram(
+    'dashboard_update_request_seconds', "Wall time of /_dash-update-component requests, serialization included.", ['output']
+)
+startup_stage_seconds = registry.gauge(
+    'dashboard_startup_stage_seconds', "Duration of the most recent run of each startup or reload stage.", ['stage']
+)
+
+
+class PhaseTimer:
+    """
+    Lap timer for the phases of one callback call.
+
+    ``lap(phase)`` records the time since the previous lap, so a callback
+    body only needs one call after each phase instead of nested blocks.
+    """
+
+    __slots__ = ('callback', 'last')
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        callback_phase_seconds.observe(now - self.last, callback=self.callback, phase=phase)
+        self.last = now
+
+
+def instrument(name):
+    """Count calls, errors and total wall time of a callback."""
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            callback_calls.inc(callback=name)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                callback_errors.inc(callback=name)
+                raise
+            finally:
+                callback_seconds.observe(time.perf_counter() - start, callback=name)
+
+        # Copied onto outer wrappers by functools.wraps; background jobs report under it
+        wrapper.callback_name = name
+        return wrapper
+
+    return decorator
+
+
+@contextlib.contextmanager
+def recording():
+    """Collect every observation made in the block, in the order made, into the yielded list."""
+
+    global _recorded
+    observations = _recorded = []
+    try:
+        yield observations
+    finally:
+        _recorded = None
+
+@contextlib.contextmanager
+def startup_stage(stage):
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_stage_seconds.set(time.perf_counter() - start, stage=stage)
+
+def startup_stages():
+
+    return {stage: seconds for _, (stage,), _, seconds in startup_stage_seconds.samples()}
+
+def startup_report(started):
+    """Record the time since ``started`` (a perf_counter reading) as the ``ready`` stage and log every stage."""
+
+    startup_stage_seconds.set(time.perf_counter() - started, stage='ready')
+    stages = startup_stages()
+    logger.info("Startup stages: %s", ', '.join(f"{stage} {seconds:.3f}s" for stage, seconds in stages.items()))
+    return stages
+
+
+def init_app(server, path='/metrics'):
+    """Expose the registry on ``path`` and time every Dash update request."""
+
+    from flask import Response, g, request
+
+    @server.before_request
+    def start_request_timer():
+        if request.path.endswith('/_dash-update-component'):
+            g.dashboard_request_start = time.perf_counter()
+
+    @server.after_request
+    def observe_request(response):
+        start = g.pop('dashboard_request_start', None)
+        if start is not None:
+            body = request.get_json(silent=True) or {}
+            request_seconds.observe(time.perf_counter() - start, output=body.get('output', 'unknown'))
+        return response
+
+    @server.route(path)
+    def metrics_endpoint():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    return server
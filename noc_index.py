@@ -0,0 +1,90 @@
+import re
+
+import numpy as np
+
+
+CODE_PATTERN = re.compile(r'^(\d{1,5})\s+(.*)$')
+
+MAX_LEVEL = 5
+
+
+class NocNode:
+
+    __slots__ = ('code', 'code_int', 'level', 'row', 'parent', 'children')
+
+    def __init__(self, code, row):
+        self.code = code
+        # '0', '00' and '000' share an integer value, so (level, code_int) is the key
+        self.code_int = int(code)
+        self.level = len(code)
+        self.row = row
+        self.parent = None
+        self.children = []
+
+    def __repr__(self):
+        return f'NocNode({self.code!r}, level={self.level}, row={self.row})'
+
+
+class NocIndex:
+    """
+    Parsed NOC hierarchy over the rows of a cleaned occupation frame.
+
+    Row numbers are positions into the frame the index was built from, so
+    lookups resolve to ``df.iloc[rows]`` without scanning the Occupation column.
+    """
+
+    def __init__(self, labels):
+        self.labels = [str(label) for label in labels]
+        self.nodes = {}
+        self.row_nodes = [None] * len(self.labels)
+        self.level_index = {level: [] for level in range(1, MAX_LEVEL + 1)}
+
+        for row, label in enumerate(self.labels):
+            match = CODE_PATTERN.match(label)
+            if match:
+                node = NocNode(match.group(1), row)
+                self.nodes[node.code] = node
+                self.row_nodes[row] = node
+                self.level_index[node.level].append(row)
+
+        for node in self.nodes.values():
+            # Walk up the code prefixes so a missing intermediate level still links to the nearest ancestor
+            for length in range(node.level - 1, 0, -1):
+                parent = self.nodes.get(node.code[:length])
+                if parent is not None:
+                    node.parent = parent
+                    parent.children.append(node)
+                    break
+
+    def __len__(self):
+        return len(self.labels)
+
+    def node(self, code):
+        return self.nodes.get(str(code))
+
+    def node_at(self, row):
+        return self.row_nodes[row]
+
+    def level_rows(self, level):
+        return np.asarray(self.level_index.get(level, []), dtype=np.intp)
+
+    def levels(self):
+        return np.array([node.level if node else 0 for node in self.row_nodes], dtype=np.int8)
+
+    def children_rows(self, code):
+        node = self.node(code)
+        if node is None:
+            return np.empty(0, dtype=np.intp)
+        return np.asarray([child.row for child in node.children], dtype=np.intp)
+
+    def descendant_rows(self, code):
+        node = self.node(code)
+        if node is None:
+            return np.empty(0, dtype=np.intp)
+        rows = []
+        stack = list(node.children)
+        while stack:
+            current = stack.pop()
+            rows.append(current.row)
+            stack.extend(current.children)
+        return np.sort(np.asarray(rows, dtype=np.intp))
@@ -0,0 +1,300 @@
+import argparse
+import functools
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import tempfile
+import time
+
+import metrics
+from figures import RENDER_BUDGET, gender_figure, serialize, top_n, with_other
+
+
+# view name -> (callback, key normalizer, input component ids) in app.py; the essential
+# services and engineering views export the data payloads their clientside callbacks render.
+# Every key normalizer returns the selected extract's digest first.
+FIGURE_VIEWS = {
+    'essential-services': (
+        'update_essential_services_data',
+        'essential_services_key',
+        ['service-type-dropdown', 'extract-dropdown']
+    ),
+    'gender-employment': (
+        'update_gender_employment_graph',
+        'gender_employment_key',
+        ['noc-dropdown', 'chart-type-radio', 'gender-employment-page', 'extract-dropdown']
+    ),
+    'engineering': (
+        'update_engineering_data',
+        'engineering_key',
+        ['engineering-checklist', 'extract-dropdown']
+    ),
+    'custom-insight': (
+        'update_custom_insight_graph',
+        'custom_insight_key',
+        [
+            'occupation-category-dropdown', 'analysis-type-radio', 'pin-occupations', 'custom-categories',
+            'custom-insight-page', 'extract-dropdown'
+        ]
+    )
+}
+
+MULTI_SELECT_IDS = {'engineering-checklist'}
+# Options of these come from a search callback, so only their layout value is exported
+TYPEAHEAD_IDS = {'pin-occupations'}
+# Stores the user fills in; only their initial data is exported
+STORE_IDS = {'custom-categories'}
+# Pagers over selections larger than the render budget; only the first page is exported
+PAGE_IDS = {'gender-employment-page', 'custom-insight-page'}
+
+AGGREGATES = 'noc_aggregates.json'
+MANIFEST = 'manifest.json'
+
+
+def figure_filename(name, inputs):
+
+    raw = json.dumps([name, inputs], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:20] + '.json'
+
+def _write_file(path, payload):
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def assemble_gender_figure(aggregates, selected_nocs, chart_type, page=1):
+    """
+    Build the gender employment figure for any category subset from per-category totals.
+
+    Mirrors update_gender_employment_graph without touching pandas, so every
+    subset of the top-level categories can be served from the exported
+    aggregates. Returns None when a searched occupation outside them is selected.
+    """
+
+    selected = set(selected_nocs)
+    if not selected <= set(aggregates['categories']):
+        return None
+    labels = [label for label in aggregates['order'] if label in selected]
+    values = aggregates['categories']
+
+    shown, rest, _ = top_n([values[label]['Total'] for label in labels], RENDER_BUDGET, page)
+    labels, (men, women) = with_other(
+        labels,
+        [[values[label]['Men'] for label in labels], [values[label]['Women'] for label in labels]],
+        shown,
+        rest
+    )
+    return gender_figure(labels, men, women, chart_type)
+
+
+class PrecomputedFigures:
+    """
+    Read side of an export directory: ``<directory>/<dataset digest>/<view>/<key>.json``.
+
+    With no directory configured ``serve`` is a pass-through, so callbacks can
+    always be decorated.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._aggregates = {}
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def root(self, digest):
+        return os.path.join(self.directory, digest)
+
+    def lookup(self, name, inputs, digest):
+
+        path = os.path.join(self.root(digest), name, figure_filename(name, inputs))
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def aggregates(self, digest):
+
+        if digest not in self._aggregates:
+            try:
+                with open(os.path.join(self.root(digest), AGGREGATES)) as f:
+                    self._aggregates[digest] = json.load(f)
+            except FileNotFoundError:
+                return None
+        return self._aggregates[digest]
+
+    def serve(self, name, normalize, assemble=None):
+        """
+        Decorate a figure callback to answer from the export directory first.
+
+        ``normalize`` must return the dataset digest followed by the figure inputs;
+        ``assemble(aggregates, *inputs)`` builds figures that were not exported
+        one by one (the multi-select NOC view) from the exported aggregates, or
+        returns None to fall through to the callback.
+        """
+
+        def decorator(func):
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            def wrapper(*args):
+                digest, *inputs = normalize(*args)
+
+                fig = self.lookup(name, inputs, digest)
+                if fig is not None:
+                    metrics.cache_lookups.inc(callback=name, cache='precomputed', result='hit')
+                    return fig
+
+                if assemble is not None:
+                    aggregates = self.aggregates(digest)
+                    fig = assemble(aggregates, *inputs) if aggregates is not None else None
+                    if fig is not None:
+                        metrics.cache_lookups.inc(callback=name, cache='precomputed', result='assembled')
+                        return fig
+
+                metrics.cache_lookups.inc(callback=name, cache='precomputed', result='miss')
+                return func(*args)
+
+            return wrapper
+
+        return decorator
+
+
+def precomputed_from_env():
+
+    return PrecomputedFigures(os.environ.get('PRECOMPUTED_DIR') or None)
+
+
+def _find_component(component, component_id):
+
+    if getattr(component, 'id', None) == component_id:
+        return component
+
+    children = getattr(component, 'children', None)
+    if children is None:
+        return None
+    if not isinstance(children, (list, tuple)):
+        children = [children]
+
+    for child in children:
+        found = _find_component(child, component_id)
+        if found is not None:
+            return found
+    return None
+
+def component_values(layout, component_id):
+    """All values a user can pick for ``component_id``; non-empty subsets for multi-selects."""
+
+    component = _find_component(layout, component_id)
+    if component is None:
+        raise LookupError(f"No component with id {component_id!r} in the layout")
+
+    if component_id in TYPEAHEAD_IDS:
+        return [[component.value]]
+    if component_id in STORE_IDS:
+        return [[component.data]]
+    if component_id in PAGE_IDS:
+        return [[component.active_page]]
+
+    values = [option['value'] if isinstance(option, dict) else option for option in component.options]
+    if component_id not in MULTI_SELECT_IDS:
+        return [[value] for value in values]
+
+    return [
+        [list(subset)]
+        for size in range(1, len(values) + 1)
+        for subset in itertools.combinations(values, size)
+    ]
+
+def noc_aggregates(dataset):
+
+    top_level = dataset.df.iloc[dataset.noc_top_level_rows].drop_duplicates('Occupation')
+    return {
+        'order': top_level['Occupation'].tolist(),
+        'categories': {
+            row.Occupation: {'Total': float(row.Total), 'Men': float(row.Men), 'Women': float(row.Women)}
+            for row in top_level.itertuples(index=False)
+        }
+    }
+
+def export(directory, views=None):
+    """Render every enumerable input combination of every view, for every extract, into ``directory``."""
+
+    import app
+
+    layout = app.serve_layout(rendered=app.TABS)
+    return [
+        export_extract(app, directory, layout, extract, views)
+        for [extract] in component_values(layout, 'extract-dropdown')
+    ]
+
+def export_extract(app, directory, layout, extract, views=None):
+
+    dataset = app.datasets.get(extract)
+    root = os.path.join(directory, dataset.digest)
+    os.makedirs(root, exist_ok=True)
+
+    _write_file(os.path.join(root, AGGREGATES), json.dumps(noc_aggregates(dataset)))
+
+    counts = {}
+    for name, (callback_name, key_name, component_ids) in FIGURE_VIEWS.items():
+        if views and name not in views:
+            continue
+
+        render = inspect.unwrap(getattr(app, callback_name))
+        normalize = getattr(app, key_name)
+        view_dir = os.path.join(root, name)
+        os.makedirs(view_dir, exist_ok=True)
+
+        if name == 'gender-employment':
+            # Subsets of the multi-select are assembled from the aggregates; only the default selection is rendered
+            grids = [
+                [[app.default_noc_selection(dataset)]],
+                component_values(layout, 'chart-type-radio'),
+                component_values(layout, 'gender-employment-page')
+            ]
+        else:
+            grids = [component_values(layout, component_id) for component_id in component_ids[:-1]]
+
+        written = 0
+        for combination in itertools.product(*grids, [[extract]]):
+            args = [value for values in combination for value in values]
+            _, *inputs = normalize(*args)
+            fig = render(*args)
+            _write_file(os.path.join(view_dir, figure_filename(name, inputs)), serialize(fig))
+            written += 1
+        counts[name] = written
+
+    _write_file(os.path.join(root, MANIFEST), json.dumps({
+        'digest': dataset.digest,
+        'source': dataset.source,
+        'created': time.time(),
+        'figures': counts
+    }, indent=2))
+
+    return root, counts
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Pre-render every dashboard view for the current dataset.")
+    parser.add_argument('directory', nargs='?', default='precomputed')
+    parser.add_argument('--view', action='append', choices=sorted(FIGURE_VIEWS), help="limit the export to these views")
+    args = parser.parse_args()
+
+    for root, counts in export(args.directory, views=args.view):
+        for name, written in counts.items():
+            print(f"{name}: {written} figures")
+        print(f"Exported to {root}")
+    print(f"Serve with PRECOMPUTED_DIR={args.directory}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from allocation import allocate_to_provinces, allocation_seed, province_arrays
+from data import get_province_data
+from noc_index import CODE_PATTERN
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLE_PATH = 'province_data.csv'
+
+# Variation of the fallback estimator around the population share
+DEFAULT_VARIATION = (0.7, 1.3)
+TECH_HUBS = ['Ontario', 'British Columbia', 'Quebec']
+# Tech hubs with more engineers
+TECH_HUB_VARIATION = (1.2, 1.8)
+OTHER_ENGINEERING_VARIATION = (0.5, 1.1)
+
+# Monte Carlo draws of the estimator behind each uncertainty band
+SIMULATION_SAMPLES = int(os.environ.get('SIMULATION_SAMPLES', 1000))
+# Large selections get fewer samples, down to MIN_SIMULATION_SAMPLES, so that
+# samples x occupations x provinces stays within this many values
+SIMULATION_MAX_VALUES = int(os.environ.get('SIMULATION_MAX_VALUES', 250_000))
+MIN_SIMULATION_SAMPLES = 100
+# Samples drawn at once, which bounds memory to chunk x occupations x provinces values
+SIMULATION_CHUNK = int(os.environ.get('SIMULATION_CHUNK', 250))
+BAND_PERCENTILES = (5, 95)
+BANDS_CACHE_SIZE = 256
+
+
+class ProvinceMatrix:
+    """
+    Occupation x province counts for every row of a cleaned frame.
+
+    Cells come from a real province table where it has them; the remaining
+    cells are estimated once, when the matrix is built, so every view is a
+    slice of the same stable numbers. ``per_10k`` and ``share`` (each
+    occupation's split across provinces) are precomputed alongside.
+    ``bands`` simulates the spread of the estimator behind those numbers.
+    """
+
+    __slots__ = (
+        'names', 'population', 'counts', 'observed', 'totals', 'engineering',
+        'per_10k', 'share', '_bands'
+    )
+
+    def __init__(self, names, population, counts, observed, totals, engineering):
+        self.names = names
+        self.population = population
+        self.counts = counts
+        self.observed = observed
+        self.totals = totals
+        self.engineering = engineering
+        self._bands = {}
+
+        self.per_10k = (counts / population[None, :] * 10000).astype(np.float32)
+        row_totals = counts.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.share = np.where(row_totals > 0, counts / row_totals, 0).astype(np.float32)
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def estimated(self):
+        return ~self.observed
+
+    def bands(self, rows, groups=None, seed=(), samples=None, chunk=SIMULATION_CHUNK):
+        """
+        Monte Carlo ``(mean, low, high)`` counts of ``rows`` summed by ``groups``.
+
+        ``groups`` numbers the group of each row (each row its own by default);
+        every result is groups x provinces, with ``low`` and ``high`` at
+        ``BAND_PERCENTILES``. Observed cells do not vary. Draws are seeded from
+        the ``seed`` labels, and results are cached per rows, groups and seed.
+        """
+
+        rows = np.asarray(rows, dtype=np.intp)
+        groups = np.arange(len(rows)) if groups is None else np.asarray(groups, dtype=np.intp)
+        samples = samples or simulation_samples(len(rows), len(self.names))
+        key = (rows.tobytes(), groups.tobytes(), tuple(seed), samples)
+        bands = self._bands.get(key)
+        if bands is None:
+            sums = np.concatenate([
+                group_sums(counts, groups)
+                for counts in simulate_counts(self, rows, allocation_seed(seed), samples, chunk)
+            ])
+            bands = (sums.mean(axis=0), *sample_percentiles(sums, BAND_PERCENTILES))
+            if len(self._bands) >= BANDS_CACHE_SIZE:
+                self._bands.clear()
+            self._bands[key] = bands
+        return bands
+
+
+def read_province_table(path, names):
+    """
+    Read a wide ``Occupation,<province>,...`` CSV into ``{label: counts}``.
+
+    Blank cells are missing; columns that are not known provinces are ignored.
+    """
+
+    table = pd.read_csv(path, thousands=',')
+    unknown = [column for column in table.columns[1:] if column not in set(names)]
+    if unknown:
+        logger.warning("Ignoring unknown province columns in %s: %s", path, ', '.join(unknown))
+
+    values = table.reindex(columns=list(names)).apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    return dict(zip(table.iloc[:, 0].astype(str).str.strip(), values))
+
+def estimator_bounds(n_rows, names, engineering_rows):
+
+    low = np.full((n_rows, len(names)), DEFAULT_VARIATION[0])
+    high = np.full((n_rows, len(names)), DEFAULT_VARIATION[1])
+
+    tech_hub = np.isin(names, TECH_HUBS)
+    low[engineering_rows] = np.where(tech_hub, TECH_HUB_VARIATION[0], OTHER_ENGINEERING_VARIATION[0])
+    high[engineering_rows] = np.where(tech_hub, TECH_HUB_VARIATION[1], OTHER_ENGINEERING_VARIATION[1])
+    return low, high
+
+def spread_remaining(totals, estimates, observed_counts, observed):
+    """
+    Estimates of the unobserved cells of partially observed rows, scaled to
+    what the observed cells leave of each total. ``estimates`` may carry
+    leading sample axes.
+    """
+
+    remaining = np.maximum(totals - np.nansum(observed_counts, axis=-1), 0)
+    missing_estimates = np.where(observed, 0, estimates)
+    estimated_sum = missing_estimates.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scaled = np.where(estimated_sum > 0, missing_estimates / estimated_sum * remaining[:, None], 0)
+    return np.floor(scaled)
+
+def simulation_samples(n_rows, n_provinces):
+
+    budget = SIMULATION_MAX_VALUES // max(n_rows * n_provinces, 1)
+    return int(min(SIMULATION_SAMPLES, max(budget, MIN_SIMULATION_SAMPLES)))
+
+def simulate_counts(matrix, rows, seed, samples, chunk):
+    """
+    Yield ``chunk x rows x provinces`` counts of ``rows`` from the estimator, ``samples`` in all.
+
+    Each sample is a fresh draw of the variation ``build_province_matrix``
+    drew once, with the same bounds and treatment of observed cells.
+    """
+
+    expected = matrix.totals[rows, None] * (matrix.population / matrix.population.sum())
+    low, high = estimator_bounds(len(rows), matrix.names, np.flatnonzero(matrix.engineering[rows]))
+    observed = matrix.observed[rows]
+    observed_counts = np.where(observed, matrix.counts[rows], np.nan)
+    partial = observed.any(axis=1) & ~observed.all(axis=1)
+
+    rng = np.random.default_rng(seed)
+    for start in range(0, samples, chunk):
+        variation = low + (high - low) * rng.random((min(chunk, samples - start), *expected.shape))
+        estimates = np.floor(expected * variation)
+        if partial.any():
+            estimates[:, partial] = spread_remaining(
+                matrix.totals[rows][partial], estimates[:, partial], observed_counts[partial], observed[partial]
+            )
+        yield np.where(observed, observed_counts, estimates)
+
+def group_sums(counts, groups):
+    """``samples x groups x provinces`` sums of the rows of ``counts`` in each of the groups ``0..max(groups)``."""
+
+    if np.array_equal(groups, np.arange(len(groups))):
+        return counts
+    order = np.argsort(groups, kind='stable')
+    starts = np.searchsorted(groups[order], np.arange(groups.max() + 1))
+    return np.add.reduceat(counts[:, order], starts, axis=1)
+
+def sample_percentiles(sums, percentiles):
+    """
+    ``np.percentile(sums, percentiles, axis=0)`` (linear interpolation) by
+    sorting each cell's samples as one contiguous row, which is the cheap order.
+    """
+
+    n = len(sums)
+    ordered = np.sort(np.ascontiguousarray(sums.reshape(n, -1).T), axis=1)
+    positions = np.asarray(percentiles, dtype=np.float64) / 100 * (n - 1)
+    below = np.floor(positions).astype(np.intp)
+    above = np.minimum(below + 1, n - 1)
+    fraction = positions - below
+    values = ordered[:, below] * (1 - fraction) + ordered[:, above] * fraction
+    return values.T.reshape(len(positions), *sums.shape[1:])
+
+def build_province_matrix(df, noc_index, engineering_rows=(), table_path=None, provinces=None):
+    """
+    Province matrix for ``df``: observed cells from ``table_path``, estimates elsewhere.
+
+    Table rows are matched by NOC code, then by exact label. A row with some
+    observed provinces spreads the rest of its national total over the
+    missing ones in proportion to their estimates.
+    """
+
+    names, population, share = province_arrays(provinces or get_province_data())
+    totals = df['Total'].to_numpy(dtype=np.float64)
+
+    low, high = estimator_bounds(len(df), names, np.asarray(engineering_rows, dtype=np.intp))
+    estimates = allocate_to_provinces(totals, share, low, high, allocation_seed(())).astype(np.float64)
+
+    observed_counts = np.full_like(estimates, np.nan)
+    if table_path:
+        label_rows = {label: row for row, label in enumerate(noc_index.labels)}
+        unmatched = 0
+        for label, values in read_province_table(table_path, names).items():
+            match = CODE_PATTERN.match(label)
+            node = noc_index.node(match.group(1)) if match else None
+            row = node.row if node is not None else label_rows.get(label)
+            if row is None:
+                unmatched += 1
+            else:
+                observed_counts[row] = values
+        if unmatched:
+            logger.warning("%d rows of %s match no occupation and were skipped", unmatched, table_path)
+
+    observed = ~np.isnan(observed_counts)
+    partial = observed.any(axis=1) & ~observed.all(axis=1)
+    if partial.any():
+        estimates[partial] = spread_remaining(
+            totals[partial], estimates[partial], observed_counts[partial], observed[partial]
+        )
+
+    counts = np.where(observed, observed_counts, estimates)
+    engineering = np.zeros(len(df), dtype=bool)
+    engineering[np.asarray(engineering_rows, dtype=np.intp)] = True
+    return ProvinceMatrix(names, population, counts, observed, totals, engineering)
+
+def province_table_from_env():
+
+    path = os.environ.get('PROVINCE_TABLE_PATH', DEFAULT_TABLE_PATH)
+    return path if os.path.exists(path) else None
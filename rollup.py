@@ -0,0 +1,139 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from data import COUNT_COLUMNS
+from noc_index import CODE_PATTERN
+
+
+logger = logging.getLogger(__name__)
+
+# Census counts are randomly rounded to a multiple of 5, so a parent may differ from
+# the sum of its children by up to this much for each count involved
+ROUNDING_BASE = 5
+
+
+class NocRollup:
+    """
+    Counts and gender measures of every NOC node, rolled up from the leaves.
+
+    Nodes are kept in code order, which is a depth-first preorder of the
+    hierarchy: the subtree of the node at ``position`` is the contiguous range
+    ``[position, ends[position])``. Rolling up is then one cumulative sum over
+    the leaves, and a drill-down is a slice of the precomputed arrays.
+    """
+
+    __slots__ = (
+        'codes', 'labels', 'levels', 'rows', 'parents', 'ends', 'positions',
+        'reported', 'values', 'children_sums', 'n_children', 'women_share', 'parity', 'gender_ratio'
+    )
+
+    def __init__(self, codes, labels, levels, rows, parents, reported):
+        self.codes = np.asarray(codes, dtype=str)
+        self.labels = np.asarray(labels, dtype=object)
+        self.levels = np.asarray(levels, dtype=np.int8)
+        self.rows = np.asarray(rows, dtype=np.intp)
+        self.parents = np.asarray(parents, dtype=np.intp)
+        self.positions = {code: position for position, code in enumerate(self.codes.tolist())}
+        self.reported = np.asarray(reported, dtype=np.float64)
+
+        n = len(self.codes)
+        positions = np.arange(n)
+        # Every descendant's code starts with the node's code, and codes are digits only
+        self.ends = np.searchsorted(self.codes, np.char.add(self.codes, '~')) if n else positions
+
+        leaf = self.ends == positions + 1
+        leaf_sums = np.zeros((n + 1, len(COUNT_COLUMNS)))
+        np.cumsum(np.where(leaf[:, None], self.reported, 0), axis=0, out=leaf_sums[1:])
+        self.values = leaf_sums[self.ends] - leaf_sums[positions]
+
+        has_parent = self.parents >= 0
+        self.n_children = np.bincount(self.parents[has_parent], minlength=n)
+        self.children_sums = np.column_stack([
+            np.bincount(self.parents[has_parent], weights=self.reported[has_parent, column], minlength=n)
+            for column in range(len(COUNT_COLUMNS))
+        ]) if n else np.zeros((0, len(COUNT_COLUMNS)))
+
+        total, men, women = self.values.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.women_share = women / total * 100
+            self.parity = women / men
+            self.gender_ratio = men / women
+
+    def __len__(self):
+        return len(self.codes)
+
+    def position(self, code):
+        return self.positions.get(str(code))
+
+    def parent_code(self, code):
+        """Code of the parent of ``code``; empty for top-level or unknown codes."""
+
+        position = self.position(code)
+        if position is None or self.parents[position] < 0:
+            return ''
+        return self.codes[self.parents[position]]
+
+    def subtree(self, code=None, depth=None):
+        """
+        Positions of ``code`` and its descendants down to ``depth`` levels below it.
+
+        The whole hierarchy for a missing or unknown code. Cost is a dict lookup
+        and a slice, whatever the size of the dataset.
+        """
+
+        position = self.position(code) if code else None
+        if position is None:
+            start, end, level = 0, len(self), 0
+        else:
+            start, end, level = position, self.ends[position], self.levels[position]
+
+        positions = np.arange(start, end)
+        if depth is not None:
+            positions = positions[self.levels[start:end] <= level + depth]
+        return positions
+
+    def inconsistencies(self):
+        """Parents whose reported counts differ from the sum of their children by more than rounding explains."""
+
+        parents = np.flatnonzero(self.n_children)
+        difference = self.reported[parents] - self.children_sums[parents]
+        tolerance = ROUNDING_BASE * (self.n_children[parents] + 1)
+        bad_parent, bad_column = np.nonzero(np.abs(difference) > tolerance[:, None])
+
+        positions = parents[bad_parent]
+        return pd.DataFrame({
+            'Code': self.codes[positions],
+            'Occupation': self.labels[positions],
+            'Column': np.asarray(COUNT_COLUMNS)[bad_column],
+            'Reported': self.reported[positions, bad_column],
+            'ChildrenSum': self.children_sums[positions, bad_column],
+            'Difference': difference[bad_parent, bad_column],
+            'Tolerance': tolerance[bad_parent]
+        })
+
+
+def build_rollup(df, noc_index):
+    """Rollup of the coded rows of ``df``, checked against each parent's reported counts."""
+
+    nodes = sorted(noc_index.nodes.values(), key=lambda node: node.code)
+    positions = {node.code: position for position, node in enumerate(nodes)}
+    rows = [node.row for node in nodes]
+
+    rollup = NocRollup(
+        [node.code for node in nodes],
+        [CODE_PATTERN.match(noc_index.labels[node.row]).group(2) for node in nodes],
+        [node.level for node in nodes],
+        rows,
+        [positions[node.parent.code] if node.parent is not None else -1 for node in nodes],
+        df[list(COUNT_COLUMNS)].to_numpy(dtype=np.float64)[rows]
+    )
+
+    inconsistent = rollup.inconsistencies()
+    if len(inconsistent):
+        logger.warning(
+            "%d NOC codes do not add up to their sub-codes beyond rounding, e.g. %s",
+            inconsistent['Code'].nunique(), ', '.join(inconsistent['Code'].unique()[:5])
+        )
+    return rollup
@@ -0,0 +1,122 @@
+import bisect
+import re
+
+import numpy as np
+
+
+DEFAULT_LIMIT = 20
+# Share of the query's trigrams a label must contain to be a candidate
+MIN_SIMILARITY = 0.5
+# Candidates re-ranked in Python per query, as a multiple of the limit
+RERANK_FACTOR = 10
+
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+
+    return ' '.join(WORD_PATTERN.findall(str(text).lower()))
+
+def label_trigrams(text):
+    """Trigrams of every word padded on both sides, so short words and word starts still produce grams."""
+
+    grams = set()
+    for word in text.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def query_trigrams(text):
+
+    # The last word may still be being typed, so it is only padded in front
+    words = text.split()
+    grams = set()
+    for position, word in enumerate(words):
+        padded = f'  {word} ' if position < len(words) - 1 else f'  {word}'
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SearchIndex:
+    """
+    Typeahead search over every occupation label and NOC code.
+
+    Text queries are matched on word-padded trigrams, so prefixes and small
+    typos both find candidates; candidates are scored with one ``bincount``
+    over the posting arrays, and only the best few are re-ranked in Python.
+    Numeric queries are code prefixes, answered by bisecting the sorted codes.
+    """
+
+    def __init__(self, labels, codes, levels):
+        self.labels = [str(label) for label in labels]
+        self.normalized = [normalize(label) for label in self.labels]
+        self.levels = np.asarray(levels, dtype=np.int8)
+        self.lengths = np.fromiter((len(label) for label in self.labels), dtype=np.int32, count=len(self.labels))
+
+        # Labels share a small vocabulary, so trigrams are taken per distinct word
+        # and a trigram's rows are the union of its words' rows
+        word_rows = {}
+        for row, text in enumerate(self.normalized):
+            for word in set(text.split()):
+                word_rows.setdefault(word, []).append(row)
+
+        gram_words = {}
+        for word, rows in word_rows.items():
+            rows = np.asarray(rows, dtype=np.int32)
+            for gram in label_trigrams(word):
+                gram_words.setdefault(gram, []).append(rows)
+
+        self.postings = {
+            gram: arrays[0] if len(arrays) == 1 else np.unique(np.concatenate(arrays))
+            for gram, arrays in gram_words.items()
+        }
+
+        code_rows = [
+            (f'{code:0{level}d}', row)
+            for row, (code, level) in enumerate(zip(np.asarray(codes).tolist(), self.levels.tolist()))
+            if level > 0
+        ]
+        code_rows.sort()
+        self.code_keys = [code for code, _ in code_rows]
+        self.code_rows = np.asarray([row for _, row in code_rows], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def search_codes(self, prefix, limit=DEFAULT_LIMIT):
+
+        start = bisect.bisect_left(self.code_keys, prefix)
+        end = bisect.bisect_left(self.code_keys, prefix + '\x7f')
+        rows = self.code_rows[start:end]
+        # Broader categories first, then code order
+        return rows[np.argsort(self.levels[rows], kind='stable')][:limit]
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Row positions of the best matches for ``query``, best first."""
+
+        text = normalize(query)
+        if not text:
+            return np.empty(0, dtype=np.int32)
+        if text.isdigit():
+            return self.search_codes(text, limit)
+
+        grams = query_trigrams(text)
+        postings = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not postings:
+            return np.empty(0, dtype=np.int32)
+
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.labels))
+        similarity = shared / len(grams)
+        candidates = np.flatnonzero(similarity >= MIN_SIMILARITY)
+        if candidates.size > limit * RERANK_FACTOR:
+            top = np.argpartition(-similarity[candidates], limit * RERANK_FACTOR)[:limit * RERANK_FACTOR]
+            candidates = candidates[top]
+
+        contains = np.fromiter((text in self.normalized[row] for row in candidates), dtype=bool, count=candidates.size)
+        order = np.lexsort((
+            self.lengths[candidates],
+            self.levels[candidates],
+            -similarity[candidates],
+            ~contains
+        ))
+        return candidates[order][:limit]
@@ -0,0 +1,245 @@
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+SNAPSHOT_DIR = '.snapshot'
+FORMAT_VERSION = 3
+MANIFEST = 'manifest.json'
+LOCK = '.lock'
+
+
+def snapshot_directory(source):
+
+    return os.path.join(os.path.dirname(os.path.abspath(source)), SNAPSHOT_DIR)
+
+def file_digest(filepath):
+
+    digest = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()[:16]
+
+def source_fingerprint(filepath):
+
+    stat = os.stat(filepath)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def read_manifest(directory):
+
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('format') != FORMAT_VERSION:
+        return None
+    return manifest
+
+def current_manifest(source, directory):
+    """
+    Return the manifest if the snapshot still matches ``source``, else None.
+
+    Size and mtime are checked first; only when they differ is the source
+    re-hashed, so a touched but unchanged file keeps its snapshot.
+    """
+
+    manifest = read_manifest(directory)
+    if manifest is None or manifest.get('source') != os.path.abspath(source):
+        return None
+
+    fingerprint = source_fingerprint(source)
+    if manifest['fingerprint'] == fingerprint:
+        return manifest
+
+    if manifest['digest'] != file_digest(source):
+        return None
+
+    manifest['fingerprint'] = fingerprint
+    _write_json(os.path.join(directory, MANIFEST), manifest)
+    return manifest
+
+@contextlib.contextmanager
+def locked(directory):
+    """
+    Hold an exclusive lock on the snapshot ``directory``.
+
+    Workers reload at the same moment, so without it several would build the
+    same snapshot at once and delete directories another is reading.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _write_json(path, payload):
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+def _write_strings(directory, name, values):
+
+    # Arrow-style string column: one UTF-8 buffer plus character offsets
+    text = ''.join(values)
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in values], out=offsets[1:])
+
+    np.save(os.path.join(directory, f'{name}.data.npy'), np.frombuffer(text.encode('utf-8'), dtype=np.uint8))
+    np.save(os.path.join(directory, f'{name}.offsets.npy'), offsets)
+
+def _read_strings(directory, name):
+
+    data = np.load(os.path.join(directory, f'{name}.data.npy'), mmap_mode='r')
+    offsets = np.load(os.path.join(directory, f'{name}.offsets.npy'), mmap_mode='r').tolist()
+    text = data.tobytes().decode('utf-8')
+
+    return [text[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+def write_snapshot(source, directory, df, subsets):
+    """
+    Write ``df`` column by column plus the row positions of each derived subset.
+
+    Columns go into a directory named after the source digest; the manifest is
+    swapped in last, so readers never observe a half-written snapshot. Callers
+    hold ``locked(directory)``.
+    """
+
+    digest = file_digest(source)
+    fingerprint = source_fingerprint(source)
+    os.makedirs(directory, exist_ok=True)
+
+    target = os.path.join(directory, digest)
+    staging = tempfile.mkdtemp(dir=directory, prefix=f'{digest}.')
+
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            _write_strings(staging, f'{column}.categories', values.cat.categories.astype(str).tolist())
+            np.save(os.path.join(staging, f'{column}.codes.npy'), values.cat.codes.to_numpy())
+            columns[column] = 'category'
+        elif values.dtype == object:
+            _write_strings(staging, column, values.astype(str).tolist())
+            columns[column] = 'string'
+        else:
+            np.save(os.path.join(staging, f'{column}.npy'), values.to_numpy())
+            columns[column] = str(values.dtype)
+
+    for name, rows in subsets.items():
+        np.save(os.path.join(staging, f'subset.{name}.npy'), np.asarray(rows, dtype=np.int64))
+
+    if os.path.isdir(target):
+        # Same digest, same columns: keep the directory readers may have open
+        shutil.rmtree(staging)
+    else:
+        os.replace(staging, target)
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'source': os.path.abspath(source),
+        'digest': digest,
+        'fingerprint': fingerprint,
+        'rows': len(df),
+        'columns': columns,
+        'subsets': sorted(subsets)
+    }
+    _write_json(os.path.join(directory, MANIFEST), manifest)
+
+    for entry in os.listdir(directory):
+        path = os.path.join(directory, entry)
+        if entry != digest and os.path.isdir(path) and not entry.startswith(f'{digest}.'):
+            shutil.rmtree(path, ignore_errors=True)
+
+    return manifest
+
+def load_snapshot(directory, manifest):
+    """
+    Load a snapshot written by ``write_snapshot``.
+
+    Numeric columns and categorical codes are memory-mapped and handed to
+    pandas without copying, so workers on the same host share the page cache.
+    """
+
+    path = os.path.join(directory, manifest['digest'])
+
+    data = {}
+    for column, dtype in manifest['columns'].items():
+        if dtype == 'category':
+            data[column] = pd.Categorical.from_codes(
+                np.load(os.path.join(path, f'{column}.codes.npy'), mmap_mode='r'),
+                categories=_read_strings(path, f'{column}.categories')
+            )
+        elif dtype == 'string':
+            data[column] = np.asarray(_read_strings(path, column), dtype=object)
+        else:
+            data[column] = np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r')
+    df = pd.DataFrame(data, copy=False)
+
+    subsets = {
+        name: np.load(os.path.join(path, f'subset.{name}.npy'), mmap_mode='r')
+        for name in manifest['subsets']
+    }
+
+    return df, subsets
+
+def load_or_build(source, build, directory=None):
+    """
+    Return ``(df, subsets, digest)`` for ``source``, rebuilding the snapshot when stale.
+
+    ``build(source)`` must return the cleaned frame and a dict of subset row positions.
+    The snapshot lives in a ``.snapshot`` directory next to the source by default.
+    """
+
+    directory = directory or snapshot_directory(source)
+    # Loading stays under the lock too, so no other process cleans up the directory mid-read;
+    # the columns are memory-mapped, so that is quick, and a waiting worker then finds the snapshot built
+    with locked(directory):
+        manifest = current_manifest(source, directory)
+        if manifest is None:
+            df, subsets = build(source)
+            manifest = write_snapshot(source, directory, df, subsets)
+
+        df, subsets = load_snapshot(directory, manifest)
+    return df, subsets, manifest['digest']
+
+
+def main():
+
+    from data import build_tables
+
+    parser = argparse.ArgumentParser(description="Build the columnar snapshot of a cleaned census extract.")
+    parser.add_argument('source', nargs='?', default='data.csv')
+    parser.add_argument('--directory', help="defaults to .snapshot next to the source")
+    parser.add_argument('--force', action='store_true', help="rebuild even if the snapshot is current")
+    args = parser.parse_args()
+    args.directory = args.directory or snapshot_directory(args.source)
+
+    with locked(args.directory):
+        manifest = None if args.force else current_manifest(args.source, args.directory)
+        if manifest is None:
+            df, subsets = build_tables(args.source)
+            manifest = write_snapshot(args.source, args.directory, df, subsets)
+            print(f"Wrote snapshot {manifest['digest']} ({manifest['rows']} rows) to {args.directory}")
+        else:
+            print(f"Snapshot {manifest['digest']} is current")
+
+
+if __name__ == '__main__':
+    main()
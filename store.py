@@ -0,0 +1,187 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from data import CHUNK_SIZE, clean_chunks
+from snapshot import file_digest, source_fingerprint
+
+
+DEFAULT_PATH = os.path.join('store', 'extracts.sqlite')
+
+CODE_PATTERN = r'^(\d{1,5})\s'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extracts (
+    id INTEGER PRIMARY KEY,
+    year INTEGER NOT NULL,
+    geography TEXT NOT NULL,
+    source TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    loaded_at REAL NOT NULL,
+    UNIQUE (year, geography)
+);
+CREATE TABLE IF NOT EXISTS occupations (
+    extract_id INTEGER NOT NULL REFERENCES extracts (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    code TEXT,
+    level INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    total REAL NOT NULL,
+    men REAL NOT NULL,
+    women REAL NOT NULL,
+    PRIMARY KEY (extract_id, position)
+);
+CREATE INDEX IF NOT EXISTS occupations_level ON occupations (extract_id, level);
+CREATE INDEX IF NOT EXISTS occupations_code ON occupations (extract_id, code);
+"""
+
+
+class ExtractStore:
+    """
+    On-disk store of many census extracts (year x geography).
+
+    Extracts are streamed in chunk by chunk, so ingesting never holds a whole
+    CSV in memory. Readers load one extract's full frame at a time; the NOC
+    rollups are computed from that frame when its ``Dataset`` is built.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def connect(self):
+        # sqlite connections must not cross a fork, so keep one per process and thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def fingerprint(self):
+        """Size and mtime of the store and its write-ahead log; changes with every committed ingest."""
+
+        wal = self.path + '-wal'
+        return source_fingerprint(self.path), source_fingerprint(wal) if os.path.exists(wal) else None
+
+    def ingest(self, source, year, geography, chunksize=CHUNK_SIZE):
+        """Load ``source`` as the extract for ``(year, geography)``, replacing any earlier load."""
+
+        digest = file_digest(source)
+        position = 0
+
+        with self.connect() as conn:
+            conn.execute("DELETE FROM extracts WHERE year = ? AND geography = ?", (year, geography))
+            extract_id = conn.execute(
+                "INSERT INTO extracts (year, geography, source, digest, loaded_at) VALUES (?, ?, ?, ?, ?)",
+                (year, geography, os.path.abspath(source), digest, time.time())
+            ).lastrowid
+
+            for chunk in clean_chunks(source, chunksize):
+                labels = chunk['Occupation'].astype(str)
+                codes = labels.str.extract(CODE_PATTERN, expand=False)
+                levels = codes.str.len().fillna(0).astype(int)
+                values = chunk[['Total', 'Men', 'Women']].astype(np.float64)
+
+                conn.executemany(
+                    "INSERT INTO occupations (extract_id, position, code, level, label, total, men, women) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    zip(
+                        [extract_id] * len(chunk),
+                        range(position, position + len(chunk)),
+                        codes.where(codes.notna(), None),
+                        levels,
+                        labels,
+                        values['Total'],
+                        values['Men'],
+                        values['Women']
+                    )
+                )
+                position += len(chunk)
+
+            conn.execute("UPDATE extracts SET rows = ? WHERE id = ?", (position, extract_id))
+
+        return extract_id
+
+    def extracts(self):
+
+        rows = self.connect().execute(
+            "SELECT id, year, geography, digest, rows FROM extracts ORDER BY year DESC, geography"
+        ).fetchall()
+        return [
+            {'id': row[0], 'year': row[1], 'geography': row[2], 'digest': row[3], 'rows': row[4]}
+            for row in rows
+        ]
+
+    def extract(self, extract_id):
+
+        row = self.connect().execute(
+            "SELECT id, year, geography, digest, rows FROM extracts WHERE id = ?", (extract_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'year': row[1], 'geography': row[2], 'digest': row[3], 'rows': row[4]}
+
+    def frame(self, extract_id):
+        """The cleaned ``Occupation, Total, Men, Women`` frame of one extract, in source order."""
+
+        return pd.read_sql_query(
+            "SELECT label AS Occupation, total AS Total, men AS Men, women AS Women "
+            "FROM occupations WHERE extract_id = ? ORDER BY position",
+            self.connect(),
+            params=(extract_id,)
+        )
+
+
+def extract_store_from_env():
+    """The configured store, or None when no extracts have been ingested."""
+
+    path = os.environ.get('EXTRACT_STORE_PATH', DEFAULT_PATH)
+    return ExtractStore(path) if os.path.exists(path) else None
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Manage the multi-year census extract store.")
+    parser.add_argument('--store', default=os.environ.get('EXTRACT_STORE_PATH', DEFAULT_PATH))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="stream a census CSV into the store")
+    ingest.add_argument('source')
+    ingest.add_argument('--year', type=int, required=True)
+    ingest.add_argument('--geography', required=True)
+    ingest.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+
+    commands.add_parser('list', help="list ingested extracts")
+
+    args = parser.parse_args()
+    store = ExtractStore(args.store)
+
+    if args.command == 'ingest':
+        start = time.perf_counter()
+        extract_id = store.ingest(args.source, args.year, args.geography, chunksize=args.chunksize)
+        extract = store.extract(extract_id)
+        print(f"Ingested {extract['rows']} rows as extract {extract_id} "
+              f"({args.year}, {args.geography}) in {time.perf_counter() - start:.2f}s")
+    else:
+        for extract in store.extracts():
+            print(f"{extract['id']:>4}  {extract['year']}  {extract['geography']:<30} {extract['rows']:>10} rows  {extract['digest']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='module')
+def dashboard(tmp_path_factory):
+    """The ``app`` module, imported against data.csv with a private figure cache and no watcher or background jobs."""
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(ROOT)
+        patch.setenv('FIGURE_CACHE_PATH', str(tmp_path_factory.mktemp('figures') / 'figures.sqlite'))
+        patch.setenv('DATASET_POLL_INTERVAL', '0')
+        patch.setenv('BACKGROUND_CALLBACKS', '0')
+        patch.delenv('PRECOMPUTED_DIR', raising=False)
+        import app
+        yield app
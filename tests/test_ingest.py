@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+import ingest
+
+
+def parse(*lines, first_line=2):
+
+    return ingest.parse_lines([f'{line}\n' for line in lines], first_line=first_line)
+
+def test_well_formed_lines_parse_thousands():
+
+    rows, rejects = parse(
+        '00010 Legislators,"9,385","5,370","4,020"',
+        '"10020 Insurance, real estate and financial brokerage managers","37,760","20,565","17,195"',
+        '10021 Banking managers,77720,37100,40615'
+    )
+
+    assert rows['Occupation'].tolist() == [
+        '00010 Legislators',
+        '10020 Insurance, real estate and financial brokerage managers',
+        '10021 Banking managers'
+    ]
+    np.testing.assert_array_equal(rows[ingest.COUNT_COLUMNS].to_numpy()[0], [9385, 5370, 4020])
+    np.testing.assert_array_equal(rows[ingest.COUNT_COLUMNS].to_numpy()[2], [77720, 37100, 40615])
+    assert rows['Kind'].tolist() == [ingest.OCCUPATION] * 3
+    assert rejects.empty
+
+def test_label_split_at_its_commas_is_rejoined():
+
+    rows, rejects = parse('10020 Insurance, real estate and financial brokerage managers,37760,20565,17195')
+
+    assert rows['Occupation'].tolist() == ['10020 Insurance, real estate and financial brokerage managers']
+    assert rows['Total'].tolist() == [37760]
+    assert rejects.empty
+
+def test_unclosed_quote_on_label_is_repaired():
+
+    rows, rejects = parse(
+        '"1 Business, finance and administration occupations,"3,557,055","1,135,350","2,421,705"',
+        '10 Specialized middle management occupations,"453,640","206,590","247,050"'
+    )
+
+    assert rows['Occupation'].tolist() == [
+        '1 Business, finance and administration occupations',
+        '10 Specialized middle management occupations'
+    ]
+    assert rows['Total'].tolist() == [3557055, 453640]
+    assert rejects.empty
+
+def test_stray_quote_inside_a_line_is_rejected():
+
+    rows, rejects = parse('Label "odd,1,2,3', '00010 Legislators,1,2,3')
+
+    assert rows['Occupation'].tolist() == ['00010 Legislators']
+    assert rejects[['line', 'reason']].values.tolist() == [[2, 'unbalanced quote']]
+
+@pytest.mark.parametrize('label, expected, footnotes', [
+    ('All occupations 14', 'All occupations', '14'),
+    ('00018 Seniors managers - public and private sector 15', '00018 Seniors managers - public and private sector', '15'),
+    ('Occupation - not applicable 13 7', 'Occupation - not applicable', '13 7'),
+    ('00010 Legislators', '00010 Legislators', '')
+])
+def test_footnotes_are_moved_out_of_the_label(label, expected, footnotes):
+
+    rows, _ = parse(f'{label},1,2,3')
+
+    assert rows['Occupation'].tolist() == [expected]
+    assert rows['Footnotes'].tolist() == [footnotes]
+
+def test_rows_are_classified():
+
+    rows, _ = parse(
+        'Occupation - not applicable 13,1,1,0',
+        'All occupations 14,9,5,4',
+        '0 Legislative and senior management occupations,3,2,1',
+        'Management occupations,2,1,1'
+    )
+
+    assert rows['Kind'].tolist() == [ingest.NOT_APPLICABLE, ingest.TOTAL, ingest.OCCUPATION, ingest.AGGREGATE]
+
+def test_rejects_report_reason_and_line_number():
+
+    rows, rejects = parse(
+        'Footnotes:,,,',
+        '00010 Legislators,"9,385","5,370","4,020"',
+        '14,Includes persons aged 15 years and over,,',
+        'Note: something',
+        '00011 Suppressed,x,2,3',
+        ',1,2,3',
+        '',
+        '00012 Kept,1,2,3',
+        first_line=10
+    )
+
+    assert rows['Occupation'].tolist() == ['00010 Legislators', '00012 Kept']
+    assert rejects.values.tolist() == [
+        [10, 'no counts', 'Footnotes:,,,'],
+        [12, 'no counts', '14,Includes persons aged 15 years and over,,'],
+        [13, 'fewer than 4 fields', 'Note: something'],
+        [14, 'non-numeric count', '00011 Suppressed,x,2,3'],
+        [15, 'empty label', ',1,2,3']
+    ]
+
+def test_no_lines():
+
+    rows, rejects = ingest.parse_lines([])
+
+    assert rows.empty and list(rows.columns) == ingest.ROW_COLUMNS
+    assert rejects.empty
+
+def test_read_census_csv_handles_bom_and_crlf(tmp_path):
+
+    path = tmp_path / 'data.csv'
+    path.write_bytes(
+        '\ufeffOccupation,Total,Men,Women\r\n'
+        'All occupations 14,"20,630,520","10,690,035","9,940,485"\r\n'
+        '"1 Business, finance and administration occupations,"3,557,055","1,135,350","2,421,705"\r\n'
+        'Footnotes:,,,\r\n'
+        '00010 Legislators,9385,5370,4020'.encode('utf-8')
+    )
+
+    rows, rejects = ingest.read_census_csv(str(path), chunksize=2)
+
+    assert rows['Occupation'].tolist() == [
+        'All occupations', '1 Business, finance and administration occupations', '00010 Legislators'
+    ]
+    assert rows['Total'].tolist() == [20630520, 3557055, 9385]
+    assert rejects[['line', 'reason', 'text']].values.tolist() == [[4, 'no counts', 'Footnotes:,,,']]
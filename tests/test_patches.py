@@ -0,0 +1,90 @@
+import inspect
+import json
+import random
+
+import dash
+import pytest
+
+
+def plain(value):
+
+    return json.loads(json.dumps(value, default=str))
+
+def apply_patch(target, patch):
+    """Apply a ``dash.Patch`` to ``target`` the way the renderer does."""
+
+    for operation in patch.to_plotly_json()['operations']:
+        *path, last = operation['location']
+        parent = target
+        for key in path:
+            parent = parent[key]
+
+        params = operation['params']
+        if operation['operation'] == 'Assign':
+            parent[last] = params['value']
+        elif operation['operation'] == 'Delete':
+            del parent[last]
+        elif operation['operation'] == 'Insert':
+            parent[last].insert(params['index'], params['value'])
+        else:
+            raise AssertionError(f"unexpected patch operation {operation['operation']}")
+    return target
+
+@pytest.fixture(scope='module')
+def dataset(dashboard):
+
+    return dashboard.datasets.current()
+
+def test_gender_patches_match_full_renders(dashboard, dataset):
+
+    rng = random.Random(1)
+    categories = dataset.noc_categories()
+    labels = list(dataset.df['Occupation'].array.categories)
+    incremental = inspect.unwrap(dashboard.gender_employment_graph)
+    full = inspect.unwrap(dashboard.update_gender_employment_graph)
+
+    figure, state = incremental(None, 'stack', 1, None, None, None)
+    figure = plain(figure)
+    patches = 0
+    for step in range(300):
+        selected, chart_type = list(state['selected']), state['chart_type']
+        roll = rng.random()
+        if roll < 0.15:
+            chart_type = rng.choice(['stack', 'group', 'ratio'])
+        elif roll < 0.6 or not selected:
+            selected.append(rng.choice(categories + labels))
+        elif roll < 0.9:
+            selected.remove(rng.choice(selected))
+        else:
+            selected = rng.sample(categories, rng.randint(0, len(categories)))
+
+        update, state = incremental(selected, chart_type, 1, None, None, state)
+        if isinstance(update, dash.Patch):
+            patches += 1
+            figure = apply_patch(figure, update)
+        else:
+            figure = plain(update)
+        assert figure == plain(full(state['selected'], chart_type, 1, None, None)), f'step {step}'
+
+    assert patches > 0
+
+def test_engineering_patches_match_full_renders(dashboard):
+
+    rng = random.Random(2)
+    incremental = inspect.unwrap(dashboard.engineering_data)
+    full = inspect.unwrap(dashboard.update_engineering_data)
+
+    data, state = incremental(None, None, None, None)
+    data = plain(data)
+    patches = 0
+    for step in range(60):
+        types = rng.sample(['computer', 'mechanical', 'electrical'], rng.randint(0, 3))
+        update, state = incremental(types, None, None, state)
+        if isinstance(update, dash.Patch):
+            patches += 1
+            data = apply_patch(data, update)
+        else:
+            data = plain(update)
+        assert data == plain(full(types, None, None)), f'step {step}'
+
+    assert patches > 0
@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data import build_noc_index, compact_frame
+from province_matrix import build_province_matrix
+
+
+TABLE = os.path.join(os.path.dirname(__file__), 'fixtures', 'province_table.csv')
+
+
+@pytest.fixture
+def frame():
+
+    return compact_frame(pd.DataFrame({
+        'Occupation': [
+            '00010 Legislators',
+            '21311 Computer engineers (except software engineers and designers)',
+            '31301 Registered nurses and registered psychiatric nurses'
+        ],
+        'Total': [9385, 21020, 301480],
+        'Men': [5370, 18250, 36000],
+        'Women': [4020, 2770, 265480]
+    }))
+
+def province(matrix, name):
+
+    return list(matrix.names).index(name)
+
+def test_observed_cells_come_from_the_table(frame):
+
+    matrix = build_province_matrix(frame, build_noc_index(frame), table_path=TABLE)
+
+    assert matrix.observed[0].all()
+    assert matrix.counts[0].sum() == 9385
+    assert matrix.counts[0, province(matrix, 'Ontario')] == 3650
+    observed = [province(matrix, name) for name in ('Alberta', 'Ontario', 'Quebec')]
+    assert sorted(np.flatnonzero(matrix.observed[1])) == sorted(observed)
+    assert matrix.counts[1, observed].tolist() == [2400, 9800, 4100]
+    assert not matrix.observed[2].any()
+
+def test_missing_cells_use_the_estimator(frame):
+
+    estimated = build_province_matrix(frame, build_noc_index(frame))
+    matrix = build_province_matrix(frame, build_noc_index(frame), table_path=TABLE)
+
+    np.testing.assert_array_equal(matrix.counts[2], estimated.counts[2])
+    # A partially observed row spreads what its observed provinces leave over the missing ones
+    missing = ~matrix.observed[1]
+    remaining = 21020 - (2400 + 9800 + 4100)
+    assert (matrix.counts[1, missing] > 0).all()
+    assert remaining - missing.sum() <= matrix.counts[1, missing].sum() <= remaining
+
+def test_bands_vary_only_estimated_cells(frame):
+
+    matrix = build_province_matrix(frame, build_noc_index(frame), table_path=TABLE)
+    mean, low, high = matrix.bands([0, 1, 2], samples=200)
+
+    np.testing.assert_array_equal(low[matrix.observed[[0, 1, 2]]], high[matrix.observed[[0, 1, 2]]])
+    np.testing.assert_array_equal(mean[0], matrix.counts[0])
+    assert (high[2] > low[2]).all()